@@ -0,0 +1,145 @@
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+
+import grpc
+
+# Add the parent directory to the path so Python can find the 'server' module
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "server", "grpc_generated"))
+
+from server.grpc_generated import mom_pb2, mom_pb2_grpc
+from utils.utils import decode_batch
+
+
+class Consumer:
+    """Prefetching consumer for a MOM topic over gRPC.
+
+    A background thread keeps a local buffer of up to max_buffered messages
+    per partition filled with ReceiveBatch long polls, so poll() and iteration
+    are served from memory while the next batches are fetched. Messages come
+    out in order within a partition, taking partitions in turn. With a group,
+    only the partitions assigned to this consumer are read.
+
+    Receiving removes messages from the topic, so messages still buffered when
+    the consumer closes are not delivered to anyone else; keep max_buffered
+    small when that matters.
+
+        with Consumer("localhost:50051", "orders", group="billing") as consumer:
+            for message in consumer:
+                handle(message)
+    """
+
+    def __init__(self, bootstrap, topic, group=None, consumer_id=None, partitions=None, max_buffered=500,
+                 fetch_max_messages=500, fetch_max_wait_ms=500, request_timeout_ms=10000, retry_backoff_ms=500):
+        self.bootstrap = bootstrap
+        self.topic = topic
+        self.group = group or ""
+        self.consumer_id = consumer_id or (uuid.uuid4().hex if group else "")
+        self.max_buffered = max_buffered
+        self.fetch_max_messages = fetch_max_messages
+        self.fetch_max_wait_ms = fetch_max_wait_ms
+        self.request_timeout_ms = request_timeout_ms
+        self.retry_backoff_ms = retry_backoff_ms
+
+        self._condition = threading.Condition()
+        # partition -> messages fetched but not polled yet
+        self._buffers = {}
+        # Partitions to fetch: the ones asked for, else what the server last reported (None = all)
+        self._partitions = list(partitions) if partitions is not None else None
+        self._fixed_partitions = partitions is not None
+        self._next = deque()
+        self._closed = False
+        self._channel = grpc.insecure_channel(bootstrap)
+        self._stub = mom_pb2_grpc.MessageServiceStub(self._channel)
+        self._fetcher = threading.Thread(target=self._fetcher_worker, name="consumer-fetcher", daemon=True)
+        self._fetcher.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __iter__(self):
+        while not self._closed:
+            message = self.poll(1.0)
+            if message is not None:
+                yield message
+
+    def poll(self, timeout=None):
+        """Return the next message, waiting up to timeout seconds (None = forever); None if there is none."""
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._next or self._closed, timeout) or not self._next:
+                return None
+            partition = self._next[0]
+            buffer = self._buffers[partition]
+            message = buffer.popleft()
+            # Take partitions in turn; a partition whose buffer ran dry waits for its next batch
+            self._next.rotate(-1)
+            if not buffer:
+                self._next.remove(partition)
+            if len(buffer) + 1 >= self.max_buffered:
+                self._condition.notify_all()
+            return message
+
+    def close(self, timeout=None):
+        """Stop fetching; messages still buffered are dropped."""
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            self._condition.notify_all()
+        # Cancels a long poll in flight
+        self._channel.close()
+        self._fetcher.join(timeout)
+
+    def _fetch_plan(self):
+        """Return (partitions, max messages each) to fetch now, or None while every buffer is full."""
+        if self._partitions is None:
+            return [], min(self.fetch_max_messages, self.max_buffered)
+        rooms = {p: self.max_buffered - len(self._buffers.get(p, ())) for p in self._partitions}
+        partitions = [p for p, room in rooms.items() if room > 0]
+        if not partitions and self._partitions:
+            return None
+        return partitions, min([self.fetch_max_messages] + [rooms[p] for p in partitions])
+
+    def _fetcher_worker(self):
+        while True:
+            with self._condition:
+                plan = self._fetch_plan()
+                while plan is None and not self._closed:
+                    self._condition.wait()
+                    plan = self._fetch_plan()
+                if self._closed:
+                    return
+            partitions, max_messages = plan
+            request = mom_pb2.ReceiveBatchRequest(
+                topic=self.topic, partitions=partitions, group=self.group, consumer_id=self.consumer_id,
+                max_messages=max_messages, max_wait_ms=self.fetch_max_wait_ms)
+            try:
+                response = self._stub.ReceiveBatch(
+                    request, timeout=(self.fetch_max_wait_ms + self.request_timeout_ms) / 1000)
+            except grpc.RpcError as e:
+                if self._closed:
+                    return
+                print(f"[Consumer] ⚠️ Error fetching from '{self.topic}': {e.code()} {e.details()}")
+                time.sleep(self.retry_backoff_ms / 1000)
+                continue
+            except ValueError:
+                # The channel was closed by close()
+                return
+
+            with self._condition:
+                if not self._fixed_partitions:
+                    self._partitions = list(response.assigned)
+                for batch in response.batches:
+                    buffer = self._buffers.setdefault(batch.partition, deque())
+                    if not buffer:
+                        self._next.append(batch.partition)
+                    buffer.extend(decode_batch(batch.payload, batch.compressed))
+                if response.batches:
+                    self._condition.notify_all()
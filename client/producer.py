@@ -0,0 +1,299 @@
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import deque, namedtuple
+from concurrent.futures import Future
+
+import grpc
+
+# Add the parent directory to the path so Python can find the 'server' module
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "server", "grpc_generated"))
+
+from server.grpc_generated import mom_pb2, mom_pb2_grpc
+from utils.utils import encode_batch, jump_consistent_hash, stable_hash
+
+# Result of a send() future: where the message was stored
+RecordMetadata = namedtuple("RecordMetadata", ["topic", "partition"])
+
+# Failures worth sending the batch again for (the sequence number makes retries safe)
+RETRIABLE_CODES = (
+    grpc.StatusCode.UNAVAILABLE,
+    grpc.StatusCode.DEADLINE_EXCEEDED,
+    grpc.StatusCode.RESOURCE_EXHAUSTED,
+    grpc.StatusCode.ABORTED,
+    # Unhandled server errors, e.g. a dropped Redis connection
+    grpc.StatusCode.UNKNOWN,
+)
+
+
+class _Batch:
+    __slots__ = ("topic", "partition", "priority", "messages", "futures", "size", "created", "sequence", "attempts", "retry_at")
+
+    def __init__(self, topic, partition, priority=0):
+        self.topic = topic
+        self.partition = partition
+        self.priority = priority
+        self.messages = []
+        self.futures = []
+        self.size = 0
+        self.created = time.monotonic()
+        self.sequence = None
+        self.attempts = 0
+        self.retry_at = 0
+
+
+class Producer:
+    """Batching producer for MOM topics over gRPC.
+
+    send() returns right away with a Future. Messages are grouped per topic
+    partition and a background thread sends a partition's batch with the
+    SendBatch RPC once it is batch_size bytes or its first message has waited
+    linger_ms, straight to the instance owning the partition (from
+    GetTopicMetadata). Batches carry this producer's id and a per-partition
+    sequence number, so a retried batch is stored once. At most one batch per
+    partition is in flight, which keeps each partition in send order, and at
+    most max_in_flight overall; send() blocks for up to max_block_ms once
+    buffer_memory bytes are waiting.
+
+        with Producer("localhost:50051") as producer:
+            futures = [producer.send("orders", f"order {i}") for i in range(100000)]
+        print(futures[-1].result())
+    """
+
+    def __init__(self, bootstrap, linger_ms=5, batch_size=64 * 1024, max_in_flight=16,
+                 buffer_memory=32 * 1024 * 1024, max_block_ms=60000, retries=5, retry_backoff_ms=100,
+                 request_timeout_ms=10000, compression=True, default_partitions=3, metadata_max_age_ms=5000):
+        self.bootstrap = bootstrap
+        self.linger_ms = linger_ms
+        self.batch_size = batch_size
+        self.max_in_flight = max_in_flight
+        self.buffer_memory = buffer_memory
+        self.max_block_ms = max_block_ms
+        self.retries = retries
+        self.retry_backoff_ms = retry_backoff_ms
+        self.request_timeout_ms = request_timeout_ms
+        self.compression = compression
+        # Partitions of topics this producer creates because they did not exist
+        self.default_partitions = default_partitions
+        # Topic metadata is fetched again after this long, so added partitions and new leaders are picked up
+        self.metadata_max_age_ms = metadata_max_age_ms
+        self.producer_id = uuid.uuid4().hex
+
+        self._condition = threading.Condition()
+        # (topic, partition) -> batches waiting to be sent, oldest first
+        self._queues = {}
+        self._sequences = {}
+        self._in_flight = set()
+        self._buffered = 0
+        self._flushing = 0
+        self._closed = False
+        # topic -> (partition count, {partition: leader address}, fetched at (monotonic))
+        self._metadata = {}
+        self._metadata_lock = threading.Lock()
+        self._channels = {}
+        self._channels_lock = threading.Lock()
+        self._sender = threading.Thread(target=self._sender_worker, name="producer-sender", daemon=True)
+        self._sender.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def send(self, topic, message, key=None, partition=None, priority=0):
+        """Queue a message; the returned Future resolves to its RecordMetadata once it is stored.
+
+        The partition is chosen from the key (or the message) exactly as the
+        servers do, unless given. Messages with a higher priority (0-9) are
+        consumed first.
+        """
+        if self._closed:
+            raise RuntimeError("Producer is closed")
+        if partition is None:
+            partition_count = self._topic_metadata(topic)[0]
+            partition = jump_consistent_hash(stable_hash(key if key is not None else message), partition_count)
+        size = len(message)
+        future = Future()
+        deadline = time.monotonic() + self.max_block_ms / 1000
+        with self._condition:
+            # Block while the buffer is full (a message larger than the buffer goes through alone)
+            while self._buffered and self._buffered + size > self.buffer_memory:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(f"Producer buffer stayed full for {self.max_block_ms}ms")
+                self._condition.wait(remaining)
+            queue = self._queues.setdefault((topic, partition), deque())
+            if not queue or queue[-1].size >= self.batch_size or queue[-1].sequence is not None \
+                    or queue[-1].priority != priority:
+                queue.append(_Batch(topic, partition, priority))
+                # A batch is only waited on by the sender once it exists
+                self._condition.notify_all()
+            batch = queue[-1]
+            batch.messages.append(message)
+            batch.futures.append(future)
+            batch.size += size
+            self._buffered += size
+            if batch.size >= self.batch_size:
+                self._condition.notify_all()
+        return future
+
+    def flush(self, timeout=None):
+        """Send every queued message now and wait until all of them are acknowledged or failed."""
+        with self._condition:
+            self._flushing += 1
+            self._condition.notify_all()
+            try:
+                return self._condition.wait_for(lambda: not self._queues and not self._in_flight, timeout)
+            finally:
+                self._flushing -= 1
+
+    def close(self, timeout=None):
+        """Flush pending messages and stop the producer."""
+        if self._closed:
+            return
+        self.flush(timeout)
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._sender.join(timeout)
+        for channel in self._channels.values():
+            channel.close()
+
+    def _stub(self, address):
+        with self._channels_lock:
+            channel = self._channels.get(address)
+            if channel is None:
+                channel = self._channels[address] = grpc.insecure_channel(address)
+        return mom_pb2_grpc.MessageServiceStub(channel)
+
+    def _topic_metadata(self, topic):
+        """Return (partition count, {partition: leader address}), creating the topic if needed."""
+        metadata = self._metadata.get(topic)
+        if metadata and time.monotonic() - metadata[2] < self.metadata_max_age_ms / 1000:
+            return metadata[:2]
+        with self._metadata_lock:
+            metadata = self._metadata.get(topic)
+            if metadata and time.monotonic() - metadata[2] < self.metadata_max_age_ms / 1000:
+                return metadata[:2]
+            stub = self._stub(self.bootstrap)
+            timeout = self.request_timeout_ms / 1000
+            try:
+                response = stub.GetTopicMetadata(mom_pb2.TopicMetadataRequest(topic=topic), timeout=timeout)
+            except grpc.RpcError as e:
+                if metadata and e.code() != grpc.StatusCode.NOT_FOUND:
+                    # Keep sending with what we know; the next send tries again
+                    print(f"[Producer] ⚠️ Could not refresh metadata of '{topic}': {e.code()}")
+                    return metadata[:2]
+                if e.code() != grpc.StatusCode.NOT_FOUND:
+                    raise
+                # Like SendMessage, sending to a missing topic creates it
+                stub.CreateTopic(mom_pb2.TopicRequest(topic_name=topic, partitions=self.default_partitions),
+                                 timeout=timeout)
+                response = stub.GetTopicMetadata(mom_pb2.TopicMetadataRequest(topic=topic), timeout=timeout)
+            metadata = (len(response.partitions),
+                        {p.partition: p.address for p in response.partitions if p.address}, time.monotonic())
+            self._metadata[topic] = metadata
+            return metadata[:2]
+
+    def _ready_batches(self):
+        """Take the batches that can be sent now; returns (batches, seconds until the next one is due)."""
+        now = time.monotonic()
+        ready = []
+        next_due = None
+        for key, queue in self._queues.items():
+            if key in self._in_flight:
+                continue
+            if len(self._in_flight) + len(ready) >= self.max_in_flight:
+                break
+            batch = queue[0]
+            if batch.attempts:
+                due = batch.retry_at
+            elif len(queue) > 1 or batch.size >= self.batch_size or self._flushing or self._closed:
+                due = now
+            else:
+                due = batch.created + self.linger_ms / 1000
+            if due <= now:
+                ready.append(key)
+            elif next_due is None or due < next_due:
+                next_due = due
+        batches = []
+        for key in ready:
+            queue = self._queues[key]
+            batch = queue.popleft()
+            if not queue:
+                del self._queues[key]
+            if batch.sequence is None:
+                batch.sequence = self._sequences[key] = self._sequences.get(key, 0) + 1
+            self._in_flight.add(key)
+            batches.append(batch)
+        return batches, None if next_due is None else next_due - now
+
+    def _sender_worker(self):
+        while True:
+            with self._condition:
+                while True:
+                    if self._closed and not self._queues and not self._in_flight:
+                        return
+                    batches, wait = self._ready_batches()
+                    if batches:
+                        break
+                    self._condition.wait(wait)
+            for batch in batches:
+                self._dispatch(batch)
+
+    def _dispatch(self, batch):
+        """Send a batch to the owner of its partition without waiting for the answer."""
+        try:
+            address = self._topic_metadata(batch.topic)[1].get(batch.partition, self.bootstrap)
+            request = mom_pb2.MessageBatch(
+                topic=batch.topic, partition=batch.partition, producer_id=self.producer_id,
+                sequence=batch.sequence, count=len(batch.messages), priority=batch.priority,
+                payload=encode_batch(batch.messages, self.compression), compressed=self.compression)
+            call = self._stub(address).SendBatch.future(request, timeout=self.request_timeout_ms / 1000)
+        except Exception as e:
+            self._on_error(batch, e)
+            return
+        call.add_done_callback(lambda call: self._on_response(batch, call))
+
+    def _on_response(self, batch, call):
+        try:
+            response = call.result()
+        except Exception as e:
+            self._on_error(batch, e)
+            return
+        if response.status != "Success":
+            self._complete(batch, RuntimeError(response.message))
+        else:
+            self._complete(batch)
+
+    def _on_error(self, batch, error):
+        code = error.code() if isinstance(error, grpc.RpcError) else None
+        if batch.attempts < self.retries and code in RETRIABLE_CODES:
+            batch.attempts += 1
+            print(f"[Producer] ⚠️ Batch for '{batch.topic}' partition {batch.partition} failed "
+                  f"({code or error}), retry {batch.attempts}/{self.retries}")
+            # The partition may have moved to another instance
+            self._metadata.pop(batch.topic, None)
+            with self._condition:
+                batch.retry_at = time.monotonic() + self.retry_backoff_ms * batch.attempts / 1000
+                self._queues.setdefault((batch.topic, batch.partition), deque()).appendleft(batch)
+                self._in_flight.discard((batch.topic, batch.partition))
+                self._condition.notify_all()
+            return
+        self._complete(batch, error)
+
+    def _complete(self, batch, error=None):
+        with self._condition:
+            self._in_flight.discard((batch.topic, batch.partition))
+            self._buffered -= batch.size
+            self._condition.notify_all()
+        result = RecordMetadata(batch.topic, batch.partition)
+        for future in batch.futures:
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
@@ -1,18 +1,28 @@
+import asyncio
 import os
 import sys
+import threading
 import time
 import grpc
 # Add the parent directory to the path so Python can find the 'server' module
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from typing import Optional
+
 import jwt
-from fastapi import Depends, FastAPI, Form, HTTPException
+from fastapi import Depends, FastAPI, Form, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from pydantic import BaseModel
 
-from server.auth import (ALGORITHM, SECRET_KEY, authenticate_user,
+from server.auth import (ALGORITHM, DEBUG_USERS, SECRET_KEY, authenticate_user,
                          create_access_token, fake_users_db, hash_password)
-from server.global_topic import GlobalTopicRegistry
+from server import deadline, tracing
+from server.global_topic import LIST_TOPICS_MAX_LIMIT, get_registry
+from server.consumer_group import ConsumerGroupCoordinator
+from server.topic_stats import TopicStats
+from server.profiling import (PROFILE_DEFAULT_DURATION_MS, PROFILE_MAX_CONCURRENT, PROFILE_MAX_DURATION_MS,
+                              run_profile)
 from server.master_node import MasterNode
 from server.grpc_generated import mom_pb2, mom_pb2_grpc
 
@@ -71,13 +81,103 @@ if not initialize_master_node():
     print("⚠️ Some functionality may be limited")
     print("⚠️ Start a master node with: python -m server.master_node_server")
 
-global_registry = GlobalTopicRegistry()
+tracing.set_service_name("mom-rest")
+
+
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    """Trace each request (sampled at TRACE_SAMPLE_RATE, or as decided by the caller's traceparent)."""
+    with tracing.span(f"{request.method} {request.url.path}", tracing.SPAN_KIND_SERVER,
+                      request.headers.get(tracing.TRACEPARENT),
+                      **{"http.method": request.method, "http.target": request.url.path}) as current:
+        response = await call_next(request)
+        if current is not None:
+            current.set_attribute("http.status_code", response.status_code)
+            if response.status_code >= 500:
+                current.set_error(f"HTTP {response.status_code}")
+            response.headers[tracing.TRACEPARENT] = current.traceparent
+        return response
+
+
+class DeadlineMiddleware:
+    """Serve each request under a deadline, cancelled as soon as the client disconnects.
+
+    Clients set the budget in milliseconds with the X-Request-Timeout-Ms header
+    or the timeout_ms query parameter (default REQUEST_TIMEOUT_MS). The master,
+    the instances and Redis see what is left of it as their own timeouts.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        request = Request(scope)
+        try:
+            timeout_ms = deadline.parse_timeout_ms(
+                request.headers.get(deadline.TIMEOUT_HEADER) or request.query_params.get("timeout_ms"))
+        except ValueError as e:
+            await JSONResponse({"detail": str(e)}, status_code=400)(scope, receive, send)
+            return
+
+        # The watcher reads the request for the app and keeps reading to notice a disconnect
+        messages = asyncio.Queue()
+        state = {"disconnected": False, "finished": False}
+
+        async def receive_request():
+            if state["disconnected"] and messages.empty():
+                return {"type": "http.disconnect"}
+            return await messages.get()
+
+        async def send_response(message):
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                state["finished"] = True
+            await send(message)
+
+        with deadline.within(timeout_ms / 1000) as current:
+            async def watch_client():
+                while True:
+                    message = await receive()
+                    messages.put_nowait(message)
+                    if message["type"] == "http.disconnect":
+                        state["disconnected"] = True
+                        if not state["finished"]:
+                            print(f"[REST] Client disconnected, cancelling {request.method} {request.url.path}")
+                            current.cancel()
+                        return
+
+            watcher = asyncio.create_task(watch_client())
+            try:
+                await self.app(scope, receive_request, send_response)
+            finally:
+                watcher.cancel()
+
+
+app.add_middleware(DeadlineMiddleware)
+
+
+@app.exception_handler(deadline.DeadlineExceeded)
+async def deadline_exceeded(request: Request, exc: deadline.DeadlineExceeded):
+    """Answer requests that ran out of time (or whose client left) with 504."""
+    return JSONResponse({"detail": str(exc)}, status_code=504)
+
+
+global_registry = get_registry()
+consumer_groups = ConsumerGroupCoordinator(global_registry.redis)
+topic_stats = TopicStats(global_registry)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 
 
 class MessageRequest(BaseModel):
     topic_name: str
     message: str
+    # Optional delayed delivery: relative delay or absolute Unix time in ms
+    delay_ms: Optional[int] = None
+    deliver_at: Optional[int] = None
+    # 0 (default) to 9: higher priorities are consumed first
+    priority: int = 0
 
 @app.post("/signup")
 def signup(username: str = Form(...), password: str = Form(...)):
@@ -103,7 +203,8 @@ def login(form_data: OAuth2PasswordRequestForm = Depends()):
 def get_current_user(token: str = Depends(oauth2_scheme)):
     """Get the current authenticated user."""
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        with tracing.child_span("auth.decode_jwt"):
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username = payload.get("sub")
         if username is None or username not in fake_users_db:
             raise HTTPException(
@@ -118,6 +219,13 @@ def get_current_user(token: str = Depends(oauth2_scheme)):
         )
 
 
+def get_debug_user(current_user: str = Depends(get_current_user)):
+    """Get the current user if they may call the /debug endpoints (DEBUG_USERS)."""
+    if current_user not in DEBUG_USERS:
+        raise HTTPException(status_code=403, detail="Debug endpoints are restricted to the users in DEBUG_USERS")
+    return current_user
+
+
 @app.post("/node/register")
 def register_node(ip: str = Form(None)):
     """Register a MOM node in the cluster."""
@@ -149,6 +257,7 @@ def remove_instance(
 def create_topic(
     topic_name: str,
     num_partitions: int = 3,
+    storage: str = "redis",
     current_user: str = Depends(get_current_user),
 ):
     """Create a new topic (authenticated)."""
@@ -156,22 +265,94 @@ def create_topic(
     if master_node is None:
         raise HTTPException(status_code=500,
                             detail="Master Node is not initialized.")
+    deletion = global_registry.get_deletion_status(topic_name)
+    if deletion and deletion["state"] != "done":
+        raise HTTPException(status_code=409,
+                            detail=f"Topic {topic_name} is still being deleted")
     try:
-        master_node.create_topic(topic_name, num_partitions)
+        master_node.create_topic(topic_name, num_partitions, storage)
         return {
             "status": "Success",
-            "message": f"Topic {topic_name} created with {num_partitions} partitions by {current_user}",
+            "message": f"Topic {topic_name} created with {num_partitions} partitions ({storage} storage) by {current_user}",
         }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         print(f"Error creating topic: {e}")
         raise HTTPException(status_code=500,
                             detail=f"Error creating topic: {str(e)}")
 
 
+@app.post("/topic/{topic_name}/alter")
+def alter_topic(
+    topic_name: str,
+    num_partitions: int,
+    current_user: str = Depends(get_current_user),
+):
+    """Add partitions to a topic while it stays online (authenticated)."""
+    if not global_registry.redis.sismember("topics", topic_name):
+        raise HTTPException(status_code=404, detail=f"Topic {topic_name} does not exist")
+    try:
+        previous = global_registry.alter_topic(topic_name, num_partitions)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {
+        "status": "Success",
+        "message": f"Topic {topic_name} altered from {previous} to {num_partitions} partitions by {current_user}",
+        "previous_partitions": previous,
+        "partition_count": num_partitions,
+    }
+
+
+@app.post("/topic/{topic_name}/delete")
+def delete_topic(
+        topic_name: str,
+        current_user: str = Depends(get_current_user)):
+    """Delete a topic (authenticated); its data is freed in the background."""
+    deletion = global_registry.delete_topic(topic_name)
+    if deletion is None:
+        raise HTTPException(status_code=404, detail=f"Topic {topic_name} does not exist")
+    return {
+        "status": "Success",
+        "message": f"Topic {topic_name} deleted by {current_user}; its data is being reclaimed",
+        "deletion": deletion,
+    }
+
+
+@app.post("/topic/{topic_name}/deletion")
+def get_deletion_status(
+        topic_name: str,
+        current_user: str = Depends(get_current_user)):
+    """Get the progress of a topic deletion."""
+    deletion = global_registry.get_deletion_status(topic_name)
+    if deletion is None:
+        raise HTTPException(status_code=404, detail=f"No deletion of topic {topic_name} is known")
+    return {"status": "Success", "topic_name": topic_name, "deletion": deletion}
+
+
 @app.post("/list/topics")
-def list_topics():
-    topics = global_registry.list_topics()
-    return {"status": "Success", "topics": topics}
+def list_topics(prefix: str = "", limit: Optional[int] = None, cursor: int = 0, details: bool = False):
+    """List topic names, one page at a time when limit is given; details adds their partition count,
+    storage and depth."""
+    if limit is not None and limit < 1:
+        raise HTTPException(status_code=400, detail="limit must be at least 1")
+    topics, metadata = [], []
+    # Without a limit, every page (as before paging existed)
+    while True:
+        cursor, page = global_registry.list_topics_page(
+            prefix, limit or LIST_TOPICS_MAX_LIMIT, cursor, metadata=details)
+        if details:
+            metadata += page
+            page = [topic["name"] for topic in page]
+        topics += page
+        if limit is not None or not cursor:
+            break
+    response = {"status": "Success", "topics": topics, "next_cursor": cursor}
+    if details:
+        response["details"] = metadata
+    return response
 
 
 @app.post("/list/instances")
@@ -194,11 +375,16 @@ def send_message(
     if master_node is None:
         raise HTTPException(status_code=500,
                             detail="Master Node is not initialized.")
-    response = master_node.send_message_to_topic(
-        request.topic_name, request.message)
+    try:
+        response = master_node.send_message_to_topic(
+            request.topic_name, request.message,
+            delay_ms=request.delay_ms, deliver_at=request.deliver_at, priority=request.priority)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     return {
         "status": "Success",
         "message": f"Message sent to topic {request.topic_name} via {response.status}",
+        "detail": response.message,
     }
 
 
@@ -208,23 +394,161 @@ def get_topic_info(
         current_user: str = Depends(get_current_user)):
     """Get information about a topic and its partitions."""
     partition_count = global_registry.get_partition_count(topic_name)
+    readable_partitions = global_registry.get_readable_partition_count(topic_name)
     partition_stats = global_registry.get_partition_stats(topic_name)
+    delayed_count = global_registry.get_delayed_count(topic_name)
 
     return {
         "status": "Success",
         "topic_name": topic_name,
         "partition_count": partition_count,
+        # Lower than partition_count while partitions added by an alteration wait for the older ones to drain
+        "readable_partitions": readable_partitions,
         "partition_stats": partition_stats,
+        "delayed_count": delayed_count,
     }
 
 
+@app.post("/stats")
+def get_stats(current_user: str = Depends(get_current_user)):
+    """Get the counters, depth and enqueue/dequeue rates of every topic and partition."""
+    try:
+        topics = topic_stats.collect()
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Error reading topic stats: {e}")
+
+    return {
+        "status": "Success",
+        "timestamp_ms": int(time.time() * 1000),
+        "windows": [f"{window}s" for window in topic_stats.windows],
+        "topics": topics,
+    }
+
+
+# Nodes being profiled through this process, and the slots left for profiles (see PROFILE_MAX_CONCURRENT)
+_profiling_nodes = set()
+_profiling_lock = threading.Lock()
+_profile_slots = threading.BoundedSemaphore(PROFILE_MAX_CONCURRENT)
+
+
+def _profile_node(node, kind, duration_ms=0, interval_ms=0, output="", top=0):
+    """Profile a node, one profile per node and at most PROFILE_MAX_CONCURRENT at a time."""
+    if kind == "threads":
+        return _run_node_profile(node, kind)
+    with _profiling_lock:
+        if node in _profiling_nodes:
+            raise HTTPException(status_code=409, detail=f"A profile of '{node}' is already running")
+        if not _profile_slots.acquire(blocking=False):
+            raise HTTPException(
+                status_code=429, detail=f"{PROFILE_MAX_CONCURRENT} profiles are already running; try again later")
+        _profiling_nodes.add(node)
+    try:
+        return _run_node_profile(node, kind, duration_ms, interval_ms, output, top)
+    finally:
+        with _profiling_lock:
+            _profiling_nodes.discard(node)
+            _profile_slots.release()
+
+
+def _run_node_profile(node, kind, duration_ms=0, interval_ms=0, output="", top=0):
+    """Profile the REST process ("rest"), the master ("master") or a MOM instance by name."""
+    if kind != "threads":
+        duration_ms = max(1, min(duration_ms or PROFILE_DEFAULT_DURATION_MS, PROFILE_MAX_DURATION_MS))
+        left = deadline.remaining()
+        if left is not None and duration_ms / 1000 >= left:
+            raise HTTPException(
+                status_code=400,
+                detail=f"A {duration_ms} ms profile does not fit in the request's {int(left * 1000)} ms budget; "
+                       f"raise it with the {deadline.TIMEOUT_HEADER} header or timeout_ms")
+    if node == "rest":
+        try:
+            output, data = run_profile(kind, duration_ms, interval_ms, output, top)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except RuntimeError as e:
+            raise HTTPException(status_code=409, detail=str(e))
+    else:
+        if master_node is None:
+            raise HTTPException(status_code=500, detail="Master Node is not initialized.")
+        if node == "master":
+            address = master_node.redis.get("master_node")
+        else:
+            address = master_node.membership.instances.get(node)
+        if not address:
+            raise HTTPException(status_code=404, detail=f"Node '{node}' not found")
+        request = mom_pb2.ProfileRequest(
+            kind=kind, duration_ms=duration_ms, interval_ms=interval_ms, format=output, top=top)
+        # The node caps the duration; leave it time to answer, within the request's deadline
+        timeout = deadline.timeout(duration_ms / 1000 + 10)
+        with grpc.insecure_channel(address, options=[
+            ('grpc.max_receive_message_length', 64 * 1024 * 1024),
+        ]) as channel:
+            try:
+                response = mom_pb2_grpc.MessageServiceStub(channel).Profile(request, timeout=timeout)
+            except grpc.RpcError as e:
+                status_code = {grpc.StatusCode.INVALID_ARGUMENT: 400,
+                               grpc.StatusCode.FAILED_PRECONDITION: 409}.get(e.code(), 502)
+                raise HTTPException(status_code=status_code, detail=e.details() or str(e.code()))
+        output, data = response.format, response.data
+
+    if output == "pstats":
+        return Response(data, media_type="application/octet-stream",
+                        headers={"Content-Disposition": f'attachment; filename="{node}.pstats"'})
+    return PlainTextResponse(data.decode())
+
+
+@app.post("/debug/profile")
+def profile_cpu(
+        node: str = "rest",
+        duration_ms: int = 5000,
+        interval_ms: int = 5,
+        output: str = Query("collapsed", alias="format"),
+        current_user: str = Depends(get_debug_user)):
+    """Sample the stacks of every thread of a node; collapsed stacks (flame graphs) or pstats."""
+    return _profile_node(node, "cpu", duration_ms, interval_ms, output)
+
+
+@app.post("/debug/memory")
+def profile_memory(
+        node: str = "rest",
+        duration_ms: int = 5000,
+        top: int = 50,
+        current_user: str = Depends(get_debug_user)):
+    """Show where a node's memory grew most over duration_ms (tracemalloc snapshot diff)."""
+    return _profile_node(node, "memory", duration_ms, top=top)
+
+
+@app.post("/debug/threads")
+def dump_threads(node: str = "rest", current_user: str = Depends(get_debug_user)):
+    """Dump the current stack of every thread of a node."""
+    return _profile_node(node, "threads")
+
+
+def _read_log_topic(topic_name, partitions=None):
+    """Take a message from the given partitions of a log storage topic, or without partitions list them all.
+
+    The master node keeps the messages of log storage topics, not Redis.
+    """
+    if master_node is None:
+        raise HTTPException(status_code=500, detail="Master Node is not initialized.")
+    try:
+        if partitions is None:
+            return master_node.peek_log_messages(topic_name)
+        return master_node.dequeue_log_message(topic_name, partitions)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
 @app.post("/message/{topic_name}/{partition_id}")
 def get_message_from_partition(
         topic_name: str,
         partition_id: int,
         current_user: str = Depends(get_current_user)):
     """Get a message from a specific partition."""
-    message = global_registry.get_message_from_partition(topic_name, partition_id)
+    if global_registry.get_topic_storage(topic_name) == "log":
+        message = _read_log_topic(topic_name, [partition_id])
+    else:
+        message = global_registry.get_message_from_partition(topic_name, partition_id)
 
     if message:
         return {
@@ -242,6 +566,62 @@ def get_message_from_partition(
         }
 
 
+@app.post("/topic/{topic_name}/group/{group_name}/poll")
+def poll_consumer_group(
+        topic_name: str,
+        group_name: str,
+        consumer_id: str = Form(...),
+        current_user: str = Depends(get_current_user)):
+    """Get a message from the partitions assigned to a consumer group member."""
+    partition_count = global_registry.get_readable_partition_count(topic_name)
+    partitions = consumer_groups.heartbeat(
+        topic_name, group_name, consumer_id, partition_count)
+    if global_registry.get_topic_storage(topic_name) == "log":
+        message = _read_log_topic(topic_name, partitions)
+    else:
+        message = global_registry.dequeue_from_partitions(topic_name, partitions)
+
+    return {
+        "status": "Success" if message else "Empty",
+        "topic_name": topic_name,
+        "group_name": group_name,
+        "consumer_id": consumer_id,
+        "partitions": partitions,
+        "message": message or "No messages available in the assigned partitions",
+    }
+
+
+@app.post("/topic/{topic_name}/group/{group_name}/leave")
+def leave_consumer_group(
+        topic_name: str,
+        group_name: str,
+        consumer_id: str = Form(...),
+        current_user: str = Depends(get_current_user)):
+    """Remove a consumer from a group, rebalancing its partitions."""
+    if not consumer_groups.leave(topic_name, group_name, consumer_id):
+        raise HTTPException(
+            status_code=404,
+            detail=f"Consumer {consumer_id} is not a member of group {group_name}")
+    return {
+        "status": "Success",
+        "message": f"Consumer {consumer_id} left group {group_name}",
+    }
+
+
+@app.post("/topic/{topic_name}/group/{group_name}/info")
+def get_consumer_group_info(
+        topic_name: str,
+        group_name: str,
+        current_user: str = Depends(get_current_user)):
+    """Get the members of a consumer group and their partition assignment."""
+    return {
+        "status": "Success",
+        "topic_name": topic_name,
+        "group_name": group_name,
+        **consumer_groups.describe(topic_name, group_name),
+    }
+
+
 @app.get("/connect")
 def get_connection_info():
     """Get connection information for remote machines to join the cluster."""
@@ -294,7 +674,10 @@ def get_connection_info():
 @app.post("/topic/{topic_name}/subscribe")
 def subscribe_to_topic(topic_name: str, current_user: str = Depends(get_current_user)):
     """Get all messages from a topic (authenticated)."""
-    messages = global_registry.get_all_messages_from_topic(topic_name)
+    if global_registry.get_topic_storage(topic_name) == "log":
+        messages = _read_log_topic(topic_name)
+    else:
+        messages = global_registry.get_all_messages_from_topic(topic_name)
     
     return {
         "status": "Success",
@@ -380,10 +763,12 @@ def main():
             print(f"✅ Topic '{topic}' created with {partitions} partitions.")
         # List topics
         elif choice == "6":
-            topics = global_registry.list_topics()
             print("📋 Topics:")
-            for t in topics:
-                print(f" - {t}")
+            cursor = None
+            while cursor != 0:
+                cursor, topics = global_registry.list_topics_page(cursor=cursor or 0)
+                for t in topics:
+                    print(f" - {t['name']} ({t['partitions']} partitions, {t['depth']} messages)")
         # List nodes
         elif choice == "7":
             instances = master_node.list_instances()
@@ -409,7 +794,10 @@ def main():
                 continue
             topic = input("Enter topic name: ")
             pid = int(input("Enter partition ID: "))
-            msg = global_registry.get_message_from_partition(topic, pid)
+            if global_registry.get_topic_storage(topic) == "log":
+                msg = master_node.dequeue_log_message(topic, [pid])
+            else:
+                msg = global_registry.get_message_from_partition(topic, pid)
             if msg:
                 print(f"📬 Message from {topic}[{pid}]: {msg}")
             else:
@@ -435,7 +823,10 @@ def main():
             topic = input("Enter topic name to subscribe to: ")
             
             print(f"\n📬 Subscription to topic '{topic}' active. Showing all messages:")
-            messages = global_registry.get_all_messages_from_topic(topic)
+            if global_registry.get_topic_storage(topic) == "log":
+                messages = master_node.peek_log_messages(topic)
+            else:
+                messages = global_registry.get_all_messages_from_topic(topic)
             
             if messages:
                 print(f"📚 {len(messages)} messages found in topic '{topic}':")
@@ -452,7 +843,10 @@ def main():
                         while True:
                             import time
                             time.sleep(2)  # Check every 2 seconds
-                            new_messages = global_registry.get_all_messages_from_topic(topic)
+                            if global_registry.get_topic_storage(topic) == "log":
+                                new_messages = master_node.peek_log_messages(topic)
+                            else:
+                                new_messages = global_registry.get_all_messages_from_topic(topic)
                             if len(new_messages) > last_count:
                                 # Only display new messages
                                 for i, msg in enumerate(new_messages[last_count:], last_count+1):
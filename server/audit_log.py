@@ -0,0 +1,202 @@
+import atexit
+import collections
+import glob
+import os
+import struct
+import threading
+import time
+
+import dotenv
+
+dotenv.load_dotenv()
+
+# Record every message sent and received by a node, not only the events passed to log_message
+AUDIT_LOG_MESSAGES = os.getenv("AUDIT_LOG_MESSAGES", "false").lower() == "true"
+AUDIT_LOG_DIR = os.getenv("AUDIT_LOG_DIR", "log")
+# "text": one readable line per event; "binary": length-prefixed records, see read_records
+AUDIT_LOG_FORMAT = os.getenv("AUDIT_LOG_FORMAT", "text")
+# A file is rotated once it reaches AUDIT_LOG_MAX_BYTES or is AUDIT_LOG_ROTATE_S old (0 = never)
+AUDIT_LOG_MAX_BYTES = int(os.getenv("AUDIT_LOG_MAX_BYTES", 100 * 1024 * 1024))
+AUDIT_LOG_ROTATE_S = int(os.getenv("AUDIT_LOG_ROTATE_S", 86400))
+# Rotated files kept next to the current one
+AUDIT_LOG_BACKUPS = int(os.getenv("AUDIT_LOG_BACKUPS", 10))
+# Events waiting for the writer; further events are dropped (and counted) until it catches up
+AUDIT_LOG_QUEUE_SIZE = int(os.getenv("AUDIT_LOG_QUEUE_SIZE", 100000))
+AUDIT_LOG_FLUSH_MS = int(os.getenv("AUDIT_LOG_FLUSH_MS", 200))
+
+AUDIT_LOG_FORMATS = ("text", "binary")
+# First bytes of a binary audit log file
+BINARY_MAGIC = b"MOMAUDIT1\n"
+# timestamp ms, partition (-1 if unknown), then the lengths of action, topic and message
+BINARY_RECORD = struct.Struct(">QiBHI")
+
+
+def read_records(path):
+    """Yield (timestamp_ms, action, topic, partition, message) from a binary audit log file."""
+    with open(path, "rb") as f:
+        if f.read(len(BINARY_MAGIC)) != BINARY_MAGIC:
+            raise ValueError(f"{path} is not a binary audit log")
+        while True:
+            header = f.read(BINARY_RECORD.size)
+            if len(header) < BINARY_RECORD.size:
+                return
+            timestamp_ms, partition, action_len, topic_len, message_len = BINARY_RECORD.unpack(header)
+            body = f.read(action_len + topic_len + message_len)
+            if len(body) < action_len + topic_len + message_len:
+                # Truncated by a crash in the middle of a write
+                return
+            yield (timestamp_ms, body[:action_len].decode(), body[action_len:action_len + topic_len].decode(),
+                   partition, body[action_len + topic_len:].decode())
+
+
+class AuditLog:
+    """Append audit events to a file from a background thread.
+
+    log() only appends the event to a bounded in-memory queue, so it can be
+    called on the publish path of every message. A writer thread drains the
+    queue every flush_ms (or sooner once it fills up) and writes the whole
+    batch with a single write call, rotating the file when it grows past
+    max_bytes or gets older than rotate_s.
+    """
+
+    def __init__(self, name, directory=AUDIT_LOG_DIR, fmt=AUDIT_LOG_FORMAT, max_bytes=AUDIT_LOG_MAX_BYTES,
+                 rotate_s=AUDIT_LOG_ROTATE_S, backups=AUDIT_LOG_BACKUPS, queue_size=AUDIT_LOG_QUEUE_SIZE,
+                 flush_ms=AUDIT_LOG_FLUSH_MS):
+        if fmt not in AUDIT_LOG_FORMATS:
+            raise ValueError(f"Unknown audit log format '{fmt}'. Use one of: {', '.join(AUDIT_LOG_FORMATS)}")
+        self.format = fmt
+        self.directory = directory
+        self.path = os.path.join(directory, f"{name}.{'txt' if fmt == 'text' else 'bin'}")
+        self.max_bytes = max_bytes
+        self.rotate_s = rotate_s
+        self.backups = backups
+        self.queue_size = queue_size
+        self.flush_ms = flush_ms
+        # (timestamp, action, topic, partition, message)
+        self._queue = collections.deque()
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()
+        self._writer = None
+        self._file = None
+        self._size = 0
+        self._opened_at = 0
+        self.stats = {"written": 0, "dropped": 0, "bytes": 0, "rotations": 0}
+
+    def log(self, action, topic, message, partition=-1):
+        """Queue an event; never blocks on the disk."""
+        if self._writer is None:
+            self._start()
+        if len(self._queue) >= self.queue_size:
+            self.stats["dropped"] += 1
+            return
+        self._queue.append((time.time(), action, topic, partition, message))
+        if len(self._queue) >= self.queue_size // 2:
+            self._wakeup.set()
+
+    def log_many(self, action, topic, messages, partition=-1):
+        """Queue one event per message, all with the same timestamp."""
+        if self._writer is None:
+            self._start()
+        room = self.queue_size - len(self._queue)
+        if room < len(messages):
+            self.stats["dropped"] += len(messages) - max(room, 0)
+            messages = messages[:max(room, 0)]
+        now = time.time()
+        self._queue.extend((now, action, topic, partition, message) for message in messages)
+        if len(self._queue) >= self.queue_size // 2:
+            self._wakeup.set()
+
+    def _encode(self, events):
+        if self.format == "binary":
+            chunks = []
+            for timestamp, action, topic, partition, message in events:
+                action, topic, message = action.encode(), topic.encode(), message.encode()
+                chunks.append(BINARY_RECORD.pack(
+                    int(timestamp * 1000), partition, len(action), len(topic), len(message)))
+                chunks += (action, topic, message)
+            return b"".join(chunks)
+        lines = []
+        for timestamp, action, topic, partition, message in events:
+            stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(timestamp)) + f".{int(timestamp * 1000) % 1000:03d}"
+            where = f", Partition: {partition}" if partition >= 0 else ""
+            message = message.replace("\\", "\\\\").replace("\n", "\\n")
+            lines.append(f"{stamp} [{action}] Topic: {topic}{where}, Message: {message}\n")
+        return "".join(lines).encode()
+
+    def _open(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self._file = open(self.path, "ab")
+        self._size = self._file.tell()
+        self._opened_at = time.time()
+        if self.format == "binary" and not self._size:
+            self._file.write(BINARY_MAGIC)
+            self._size = len(BINARY_MAGIC)
+
+    def _rotate(self):
+        """Move the current file aside and drop the oldest rotated files beyond the backup count."""
+        self._file.close()
+        self._file = None
+        base, ext = os.path.splitext(self.path)
+        rotated = f"{base}.{time.strftime('%Y%m%d-%H%M%S')}{ext}"
+        suffix = 1
+        while os.path.exists(rotated):
+            rotated = f"{base}.{time.strftime('%Y%m%d-%H%M%S')}-{suffix}{ext}"
+            suffix += 1
+        os.replace(self.path, rotated)
+        self.stats["rotations"] += 1
+        old = sorted(glob.glob(f"{glob.escape(base)}.*{ext}"), key=os.path.getmtime)
+        for path in old[:max(0, len(old) - self.backups)]:
+            os.remove(path)
+        self._open()
+
+    def flush(self):
+        """Write the queued events; returns how many were written."""
+        with self._lock:
+            events = []
+            while self._queue:
+                events.append(self._queue.popleft())
+            if not events:
+                return 0
+            if self._file is None:
+                self._open()
+            elif self._size >= self.max_bytes or (self.rotate_s and time.time() - self._opened_at >= self.rotate_s):
+                self._rotate()
+            data = self._encode(events)
+            self._file.write(data)
+            self._file.flush()
+            self._size += len(data)
+            self.stats["written"] += len(events)
+            self.stats["bytes"] += len(data)
+            return len(events)
+
+    def close(self):
+        """Write what is still queued and close the file."""
+        self.flush()
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def _start(self):
+        with self._lock:
+            if self._writer is not None:
+                return
+
+            def audit_writer_worker():
+                dropped = 0
+                while True:
+                    self._wakeup.wait(self.flush_ms / 1000)
+                    self._wakeup.clear()
+                    try:
+                        self.flush()
+                    except Exception as e:
+                        print(f"[AuditLog] ⚠️ Could not write to {self.path}: {e}")
+                    if self.stats["dropped"] > dropped:
+                        print(f"[AuditLog] ⚠️ Queue full, dropped {self.stats['dropped'] - dropped} events "
+                              f"for {self.path}")
+                        dropped = self.stats["dropped"]
+
+            self._writer = threading.Thread(target=audit_writer_worker, name="audit-log-writer", daemon=True)
+            self._writer.start()
+            # Events of the last requests before a shutdown
+            atexit.register(self.close)
@@ -12,6 +12,8 @@ dotenv.load_dotenv()
 SECRET_KEY = os.getenv("SECRET_KEY", "default_secret_key")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+# Users allowed to call the /debug endpoints (comma separated); none by default, as anyone can sign up
+DEBUG_USERS = {user.strip() for user in os.getenv("DEBUG_USERS", "").split(",") if user.strip()}
 
 # In-memory user database (replace with a real database in production)
 fake_users_db = {}
@@ -0,0 +1,144 @@
+import time
+
+# Keys kept per group, as group:{topic}:{group}:{suffix}
+GROUP_KEY_SUFFIXES = ("members", "generation", "partitions", "assignment", "lock")
+
+
+def groups_key(topic_name):
+    """Set of the groups that joined a topic, so its group state can be freed with it."""
+    return f"groups:{topic_name}"
+
+
+def group_key(topic_name, group_name, suffix):
+    return f"group:{topic_name}:{group_name}:{suffix}"
+
+
+class ConsumerGroupCoordinator:
+    """Assign topic partitions to the live members of named consumer groups.
+
+    Membership is kept as leases in Redis (a sorted set scored by lease
+    expiry), so members that stop polling drop out once their lease runs out.
+    Every membership change triggers a sticky rebalance: partitions stay with
+    their current owner whenever that owner is still alive and within its
+    quota, so consumers keep draining the same partitions across rebalances.
+    """
+
+    def __init__(self, redis_client, lease_ms=10000):
+        self.redis = redis_client
+        self.lease_ms = lease_ms
+        # (topic, group) -> (generation, {member: [partitions]})
+        self._assignments = {}
+
+    def _key(self, topic_name, group_name, suffix):
+        return group_key(topic_name, group_name, suffix)
+
+    def heartbeat(self, topic_name, group_name, consumer_id, num_partitions):
+        """Renew a member's lease and return the partitions assigned to it."""
+        now_ms = int(time.time() * 1000)
+        members_key = self._key(topic_name, group_name, "members")
+
+        pipe = self.redis.pipeline()
+        pipe.zadd(members_key, {consumer_id: now_ms + self.lease_ms})
+        pipe.zremrangebyscore(members_key, "-inf", now_ms)
+        pipe.get(self._key(topic_name, group_name, "generation"))
+        pipe.get(self._key(topic_name, group_name, "partitions"))
+        pipe.sadd(groups_key(topic_name), group_name)
+        joined, expired, generation, assigned_count, _ = pipe.execute()
+
+        if joined or expired or assigned_count != str(num_partitions):
+            if expired:
+                print(f"[ConsumerGroup] {expired} member(s) of '{group_name}' on '{topic_name}' expired")
+            generation = self.rebalance(topic_name, group_name, num_partitions)
+
+        return self._get_assignment(topic_name, group_name, generation).get(consumer_id, [])
+
+    def leave(self, topic_name, group_name, consumer_id):
+        """Remove a member from the group and hand its partitions to the others."""
+        removed = self.redis.zrem(self._key(topic_name, group_name, "members"), consumer_id)
+        if removed:
+            num_partitions = int(self.redis.get(self._key(topic_name, group_name, "partitions")) or 0)
+            self.rebalance(topic_name, group_name, num_partitions)
+        return bool(removed)
+
+    def describe(self, topic_name, group_name):
+        """Return the live members of a group and their assigned partitions."""
+        generation = self.redis.get(self._key(topic_name, group_name, "generation"))
+        members = self.redis.zrangebyscore(
+            self._key(topic_name, group_name, "members"), int(time.time() * 1000), "+inf")
+        assignment = self._get_assignment(topic_name, group_name, generation)
+        return {
+            "generation": int(generation or 0),
+            "members": {member: assignment.get(member, []) for member in members},
+        }
+
+    def rebalance(self, topic_name, group_name, num_partitions):
+        """Recompute the partition assignment for a group and bump its generation."""
+        lock = self.redis.lock(self._key(topic_name, group_name, "lock"), timeout=5)
+        with lock:
+            now_ms = int(time.time() * 1000)
+            members_key = self._key(topic_name, group_name, "members")
+            assignment_key = self._key(topic_name, group_name, "assignment")
+
+            members = sorted(self.redis.zrangebyscore(members_key, now_ms, "+inf"))
+            current = self.redis.hgetall(assignment_key)
+            new_assignment = self._sticky_assign(members, current, num_partitions)
+
+            pipe = self.redis.pipeline()
+            pipe.delete(assignment_key)
+            if new_assignment:
+                pipe.hset(assignment_key, mapping=new_assignment)
+            pipe.set(self._key(topic_name, group_name, "partitions"), num_partitions)
+            pipe.incr(self._key(topic_name, group_name, "generation"))
+            generation = pipe.execute()[-1]
+
+        print(f"[ConsumerGroup] Rebalanced '{group_name}' on '{topic_name}': "
+              f"{len(members)} member(s), {num_partitions} partition(s), generation {generation}")
+        return str(generation)
+
+    def _sticky_assign(self, members, current, num_partitions):
+        """Spread partitions over members, keeping existing owners where possible."""
+        if not members:
+            return {}
+
+        owned = {member: [] for member in members}
+        unassigned = []
+        for partition in range(num_partitions):
+            owner = current.get(str(partition))
+            if owner in owned:
+                owned[owner].append(partition)
+            else:
+                unassigned.append(partition)
+
+        # Members already holding the most partitions get the extra slots,
+        # which minimises the number of partitions that change hands.
+        base, extra = divmod(num_partitions, len(members))
+        by_load = sorted(members, key=lambda m: (-len(owned[m]), m))
+        quota = {member: base + (1 if i < extra else 0) for i, member in enumerate(by_load)}
+
+        for member in members:
+            while len(owned[member]) > quota[member]:
+                unassigned.append(owned[member].pop())
+
+        unassigned.sort()
+        for member in members:
+            while len(owned[member]) < quota[member] and unassigned:
+                owned[member].append(unassigned.pop(0))
+
+        return {str(p): member for member, partitions in owned.items() for p in partitions}
+
+    def _get_assignment(self, topic_name, group_name, generation):
+        """Return {member: [partitions]} for a generation, using the local cache when current."""
+        cache_key = (topic_name, group_name)
+        cached = self._assignments.get(cache_key)
+        if cached and generation is not None and cached[0] == str(generation):
+            return cached[1]
+
+        by_member = {}
+        for partition, member in self.redis.hgetall(
+                self._key(topic_name, group_name, "assignment")).items():
+            by_member.setdefault(member, []).append(int(partition))
+        for partitions in by_member.values():
+            partitions.sort()
+
+        self._assignments[cache_key] = (str(generation), by_member)
+        return by_member
@@ -0,0 +1,198 @@
+import contextlib
+import contextvars
+import inspect
+import math
+import os
+import time
+
+import dotenv
+import grpc
+
+from .interceptors import wrap_rpc_handler
+
+dotenv.load_dotenv()
+
+# Time budget of a REST request whose client asks for none, and the largest one a client may ask for
+REQUEST_TIMEOUT_MS = int(os.getenv("REQUEST_TIMEOUT_MS", 10000))
+REQUEST_MAX_TIMEOUT_MS = int(os.getenv("REQUEST_MAX_TIMEOUT_MS", 60000))
+# HTTP header (or timeout_ms query parameter) carrying the budget of a REST request
+TIMEOUT_HEADER = "x-request-timeout-ms"
+# RPC deadlines further away than this are how grpc reports calls without one
+_NO_DEADLINE_S = 365 * 24 * 3600
+
+
+class DeadlineExceeded(Exception):
+    """The request ran out of time, or its caller went away, before the work was done."""
+
+
+class Deadline:
+    """The time by which a request must be done; cancelled early if its caller goes away.
+
+    A deadline nested in another never outlives it.
+    """
+
+    __slots__ = ("expires_at", "parent", "cancelled")
+
+    def __init__(self, timeout_s=None, parent=None):
+        self.expires_at = math.inf if timeout_s is None else time.monotonic() + timeout_s
+        if parent is not None:
+            self.expires_at = min(self.expires_at, parent.expires_at)
+        self.parent = parent
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    def is_cancelled(self):
+        return self.cancelled or (self.parent is not None and self.parent.is_cancelled())
+
+    def remaining(self):
+        """Seconds left; 0 once the deadline passed or was cancelled."""
+        if self.is_cancelled():
+            return 0.0
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def check(self):
+        """Raise DeadlineExceeded if no time is left."""
+        if self.is_cancelled():
+            raise DeadlineExceeded("Request cancelled by the caller")
+        if time.monotonic() >= self.expires_at:
+            raise DeadlineExceeded("Request deadline exceeded")
+
+
+_current_deadline = contextvars.ContextVar("mom_deadline", default=None)
+
+
+@contextlib.contextmanager
+def within(timeout_s=None):
+    """Run the block under a deadline timeout_s from now (None: only the enclosing one, if any)."""
+    parent = _current_deadline.get()
+    current = Deadline(timeout_s, parent)
+    token = _current_deadline.set(current)
+    try:
+        yield current
+    finally:
+        try:
+            _current_deadline.reset(token)
+        except ValueError:
+            # A streaming handler finished in another context than it started in
+            _current_deadline.set(parent)
+
+
+def current():
+    """Return the deadline of the request being served, or None."""
+    return _current_deadline.get()
+
+
+def remaining():
+    """Seconds left for the request being served, or None without a deadline."""
+    current = _current_deadline.get()
+    if current is None:
+        return None
+    left = current.remaining()
+    return None if left == math.inf else left
+
+
+def timeout(default):
+    """Timeout for a blocking call: default, cut to the time the request has left.
+
+    Raises DeadlineExceeded when none is left, so no call starts that cannot finish.
+    """
+    current = _current_deadline.get()
+    if current is None:
+        return default
+    current.check()
+    return min(default, current.remaining())
+
+
+def check():
+    """Raise DeadlineExceeded if the request being served ran out of time or was cancelled."""
+    current = _current_deadline.get()
+    if current is not None:
+        current.check()
+
+
+def parse_timeout_ms(value):
+    """Return the budget of a REST request from its header or query value (default when empty)."""
+    if value in (None, ""):
+        return REQUEST_TIMEOUT_MS
+    try:
+        timeout_ms = int(value)
+    except ValueError:
+        raise ValueError(f"Invalid request timeout '{value}': expected milliseconds")
+    if timeout_ms <= 0:
+        raise ValueError("The request timeout must be positive")
+    return min(timeout_ms, REQUEST_MAX_TIMEOUT_MS)
+
+
+def _rpc_timeout(context):
+    """Seconds the caller of an RPC gave it, or None (grpc reports no deadline as a far-future one)."""
+    left = context.time_remaining()
+    return None if left is None or left > _NO_DEADLINE_S else left
+
+
+class ServerInterceptor(grpc.ServerInterceptor):
+    """Serve every RPC of a grpc.server under the caller's deadline, cancelled when the RPC ends."""
+
+    def intercept_service(self, continuation, handler_call_details):
+        handler = continuation(handler_call_details)
+
+        def wrap_unary(behavior):
+            def bounded(request, context):
+                with within(_rpc_timeout(context)) as current:
+                    context.add_callback(current.cancel)
+                    try:
+                        return behavior(request, context)
+                    except DeadlineExceeded as e:
+                        context.abort(grpc.StatusCode.DEADLINE_EXCEEDED, str(e))
+            return bounded
+
+        def wrap_stream(behavior):
+            def bounded(request, context):
+                with within(_rpc_timeout(context)) as current:
+                    context.add_callback(current.cancel)
+                    try:
+                        yield from behavior(request, context)
+                    except DeadlineExceeded as e:
+                        context.abort(grpc.StatusCode.DEADLINE_EXCEEDED, str(e))
+            return bounded
+
+        return wrap_rpc_handler(handler, wrap_unary, wrap_stream)
+
+
+class AioServerInterceptor(grpc.aio.ServerInterceptor):
+    """Serve every RPC of a grpc.aio server under the caller's deadline, cancelled when the RPC ends."""
+
+    async def intercept_service(self, continuation, handler_call_details):
+        handler = await continuation(handler_call_details)
+
+        def wrap_unary(behavior):
+            async def bounded(request, context):
+                with within(_rpc_timeout(context)) as current:
+                    context.add_done_callback(lambda _: current.cancel())
+                    try:
+                        response = behavior(request, context)
+                        if inspect.isawaitable(response):
+                            response = await response
+                        return response
+                    except DeadlineExceeded as e:
+                        await context.abort(grpc.StatusCode.DEADLINE_EXCEEDED, str(e))
+            return bounded
+
+        def wrap_stream(behavior):
+            async def bounded(request, context):
+                with within(_rpc_timeout(context)) as current:
+                    context.add_done_callback(lambda _: current.cancel())
+                    try:
+                        responses = behavior(request, context)
+                        if inspect.isasyncgen(responses):
+                            async for response in responses:
+                                yield response
+                        else:
+                            for response in (await responses if inspect.isawaitable(responses) else responses) or ():
+                                yield response
+                    except DeadlineExceeded as e:
+                        await context.abort(grpc.StatusCode.DEADLINE_EXCEEDED, str(e))
+            return bounded
+
+        return wrap_rpc_handler(handler, wrap_unary, wrap_stream)
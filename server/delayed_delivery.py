@@ -0,0 +1,143 @@
+import os
+import threading
+import time
+
+import dotenv
+
+from .topic_stats import stats_key
+
+dotenv.load_dotenv()
+
+DELAYED_MOVER_INTERVAL_MS = int(os.getenv("DELAYED_MOVER_INTERVAL_MS", 100))
+DELAYED_MOVER_BATCH = int(os.getenv("DELAYED_MOVER_BATCH", 500))
+
+# Moves up to ARGV[2] due timers from the sorted set KEYS[1] into the partition
+# list KEYS[2] in one atomic step (1000 per command, within Lua's unpack limit),
+# counting them in the partition stats KEYS[3].
+# Members are "<id>:<message>", scored by the delivery time in ms.
+# Returns {moved, total skew ms, max skew ms}.
+MOVE_DUE_SCRIPT = """
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'WITHSCORES', 'LIMIT', 0, ARGV[2])
+if #due == 0 then
+  return {0, 0, 0}
+end
+local now = tonumber(ARGV[1])
+local members, messages = {}, {}
+local total_skew, max_skew, size = 0, 0, 0
+for i = 1, #due, 2 do
+  local member = due[i]
+  local separator = string.find(member, ':', 1, true)
+  members[#members + 1] = member
+  messages[#messages + 1] = string.sub(member, separator + 1)
+  size = size + #messages[#messages]
+  local skew = now - tonumber(due[i + 1])
+  total_skew = total_skew + skew
+  if skew > max_skew then
+    max_skew = skew
+  end
+end
+for i = 1, #messages, 1000 do
+  local last = math.min(i + 999, #messages)
+  redis.call('RPUSH', KEYS[2], unpack(messages, i, last))
+  redis.call('ZREM', KEYS[1], unpack(members, i, last))
+end
+redis.call('HINCRBY', KEYS[3], 'enqueued', #messages)
+redis.call('HINCRBY', KEYS[3], 'bytes', size)
+redis.call('HSET', KEYS[3], 'last_write_ms', ARGV[1])
+return {#messages, total_skew, max_skew}
+"""
+
+
+class DelayedDeliveryMover:
+    """Move due delayed messages from the per-partition timer index into the partitions.
+
+    Each tick peeks the earliest timer of every partition that has pending
+    timers (one pipelined round trip per shard), so the cost does not grow with
+    the number of pending timers. Due partitions are drained in batches by a
+    Lua script that pushes and removes the messages atomically.
+    """
+
+    def __init__(self, registry, interval_ms=DELAYED_MOVER_INTERVAL_MS, batch_size=DELAYED_MOVER_BATCH):
+        self.registry = registry
+        self.interval_ms = interval_ms
+        self.batch_size = batch_size
+        self.move_due = registry.redis.register_script(MOVE_DUE_SCRIPT)
+        self._stop = None
+
+    def run_once(self):
+        """Move every due message once; returns the number of messages moved."""
+        entries = list(self.registry.redis.smembers("delayed_partitions"))
+        if not entries:
+            return 0
+
+        now_ms = int(time.time() * 1000)
+        by_client = {}
+        for entry in entries:
+            topic_name, partition = entry.rsplit(":", 1)
+            client = self.registry.shards.client_for(topic_name, partition)
+            by_client.setdefault(id(client), (client, []))[1].append((entry, topic_name, int(partition)))
+
+        moved = skew_total = skew_max = 0
+        for client, partitions in by_client.values():
+            pipe = client.pipeline(transaction=False)
+            for _, topic_name, partition in partitions:
+                pipe.zrange(self.registry.timer_key(topic_name, partition), 0, 0, withscores=True)
+            earliest = pipe.execute()
+
+            for (entry, topic_name, partition), first in zip(partitions, earliest):
+                if not first:
+                    # No timers left. Re-check after removing the entry in case a
+                    # message was scheduled in between (schedulers add the timer first).
+                    self.registry.redis.srem("delayed_partitions", entry)
+                    if client.zcard(self.registry.timer_key(topic_name, partition)):
+                        self.registry.redis.sadd("delayed_partitions", entry)
+                    continue
+                if first[0][1] > now_ms:
+                    continue
+                while True:
+                    count, total, maximum = self.move_due(
+                        keys=[self.registry.timer_key(topic_name, partition),
+                              f"{topic_name}:partition{partition}", stats_key(topic_name, partition)],
+                        args=[now_ms, self.batch_size],
+                        client=client)
+                    moved += count
+                    skew_total += total
+                    skew_max = max(skew_max, maximum)
+                    if count < self.batch_size:
+                        break
+
+        if moved:
+            pipe = self.registry.redis.pipeline()
+            pipe.hincrby("delayed_delivery_stats", "moved", moved)
+            pipe.hincrby("delayed_delivery_stats", "skew_total_ms", skew_total)
+            pipe.hset("delayed_delivery_stats", "last_skew_max_ms", skew_max)
+            pipe.execute()
+            print(f"[DelayedDelivery] Moved {moved} due messages "
+                  f"(avg skew {skew_total / moved:.1f} ms, max {skew_max} ms)")
+        return moved
+
+    def start(self):
+        """Run the mover in a background thread until stop()."""
+        if self._stop is not None:
+            return None
+        stop = self._stop = threading.Event()
+
+        def mover_worker():
+            while not stop.is_set():
+                try:
+                    self.run_once()
+                except Exception as e:
+                    print(f"[DelayedDelivery] Error moving due messages: {e}")
+                stop.wait(self.interval_ms / 1000)
+
+        thread = threading.Thread(target=mover_worker, name="delayed-delivery-mover", daemon=True)
+        thread.start()
+        print(f"[DelayedDelivery] Started delayed delivery mover (interval: {self.interval_ms}ms)")
+        return thread
+
+    def stop(self):
+        """Stop the background thread after its current pass."""
+        if self._stop is not None:
+            self._stop.set()
+            self._stop = None
+            print("[DelayedDelivery] Stopped delayed delivery mover")
@@ -1,38 +1,159 @@
-import redis
+import os
+import re
+import threading
+import time
+import uuid
 
-from .state_manager import StateManager
+import dotenv
+
+from utils.utils import jump_consistent_hash, stable_hash
+
+from . import tracing
+from .redis_pool import get_redis
+from .shard_map import ShardMap
+from .state_manager import CATALOG_EPOCH_KEY, StateManager
+from .topic_reclaimer import TOPIC_RECLAIM_INTERVAL_MS, tombstone_key
+from .topic_stats import record_enqueued, stats_key
+
+
+dotenv.load_dotenv()
+
+STORAGE_ENGINES = ("redis", "log")
+# New partitions of an altered topic stay unreadable at least this long, so producers
+# still sending with the old partition count (metadata_max_age_ms) have switched over
+PARTITION_FENCE_GRACE_MS = int(os.getenv("PARTITION_FENCE_GRACE_MS", 10000))
+# How often a process checks whether the old partitions of an altered topic have drained
+PARTITION_FENCE_CHECK_MS = 100
+# Messages carry a priority from 0 (default) to PRIORITY_MAX (most urgent); consumers
+# always take the most urgent message of a partition first
+PRIORITY_MAX = 9
+# How long a partition remembers the last batch sequence of an idle producer
+PRODUCER_STATE_TTL_MS = 24 * 3600 * 1000
+# Largest page list_topics_page returns, and how many SSCAN calls it makes to fill one
+LIST_TOPICS_MAX_LIMIT = 1000
+LIST_TOPICS_MAX_SCANS = 10
+# How long a process trusts its cached storage engine of a topic
+TOPIC_STORAGE_CACHE_TTL_S = TOPIC_RECLAIM_INTERVAL_MS / 1000
+
+# Appends ARGV[5..] to the partition list KEYS[1] unless producer ARGV[1] already
+# stored batch ARGV[2] or a later one (last sequences in the hash KEYS[2], kept
+# ARGV[3] ms), and counts them in the partition stats KEYS[3] at time ARGV[4].
+# Returns 1 if the batch was stored, 0 if it was a duplicate.
+ENQUEUE_BATCH_SCRIPT = """
+if ARGV[1] ~= '' then
+  local last = tonumber(redis.call('HGET', KEYS[2], ARGV[1]) or '0')
+  if tonumber(ARGV[2]) <= last then
+    return 0
+  end
+  redis.call('HSET', KEYS[2], ARGV[1], ARGV[2])
+  redis.call('PEXPIRE', KEYS[2], ARGV[3])
+end
+local size = 0
+for i = 5, #ARGV do
+  size = size + #ARGV[i]
+end
+for i = 5, #ARGV, 1000 do
+  redis.call('RPUSH', KEYS[1], unpack(ARGV, i, math.min(i + 999, #ARGV)))
+end
+if #ARGV >= 5 then
+  redis.call('HINCRBY', KEYS[3], 'enqueued', #ARGV - 4)
+  redis.call('HINCRBY', KEYS[3], 'bytes', size)
+  redis.call('HSET', KEYS[3], 'last_write_ms', ARGV[4])
+end
+return 1
+"""
+
+# Pops up to ARGV[1] messages from the partition lists KEYS[2..], draining each
+# list before the next (most urgent first), and counts them as dequeued in the
+# partition stats KEYS[1]. Returns the messages in the order they were taken.
+DEQUEUE_SCRIPT = """
+local wanted = tonumber(ARGV[1])
+local messages = {}
+for i = 2, #KEYS do
+  local popped = redis.call('LPOP', KEYS[i], wanted - #messages)
+  if popped then
+    for _, message in ipairs(popped) do
+      messages[#messages + 1] = message
+    end
+    if #messages >= wanted then
+      break
+    end
+  end
+end
+if #messages > 0 then
+  redis.call('HINCRBY', KEYS[1], 'dequeued', #messages)
+end
+return messages
+"""
+
+
+def partition_key(topic_name, partition, priority=0):
+    """List holding a partition's messages of one priority; priority 0 is the plain partition list."""
+    if priority:
+        return f"{topic_name}:partition{partition}:priority{priority}"
+    return f"{topic_name}:partition{partition}"
+
+
+def partition_queues(topic_name, partition):
+    """Every list of a partition, in the order consumers drain them (most urgent first)."""
+    return [partition_key(topic_name, partition, priority) for priority in range(PRIORITY_MAX, -1, -1)]
+
+
+def dequeue_keys(topic_name, partition):
+    """KEYS of DEQUEUE_SCRIPT for a partition."""
+    return [stats_key(topic_name, partition)] + partition_queues(topic_name, partition)
 
 
 class GlobalTopicRegistry:
-    def __init__(self, redis_host="localhost", redis_port=6379):
+    def __init__(self, redis_host=None, redis_port=None, redis_client=None, state_manager=None):
         """Initialize the global topic registry and restore state if needed. """
-        self.redis = redis.StrictRedis(
-            host=redis_host, port=redis_port, decode_responses=True
-        )
-        self.state_manager = StateManager()
+        self.redis = redis_client or get_redis(redis_host, redis_port)
+        self.state_manager = state_manager or StateManager()
+        # Partition data may live on other Redis instances than the catalog
+        self.shards = ShardMap(self.redis)
+        # topic -> (expires_at, storage engine); a deleted topic's name may come back with another engine
+        self._topic_storage = {}
+        self._enqueue_batch = self.redis.register_script(ENQUEUE_BATCH_SCRIPT)
+        self._dequeue = self.redis.register_script(DEQUEUE_SCRIPT)
+
+        # topic -> next time (monotonic) this process checks the topic's partition fence
+        self._fence_checks = {}
 
         # Intentamos restaurar el estado desde el archivo JSON
-        self.state_manager.restore_state(self.redis)
+        self.state_manager.restore_state(self.redis, self.shards)
 
-    def create_topic(self, topic_name, num_partitions=3):
-        if not self.redis.exists(topic_name):
+    def create_topic(self, topic_name, num_partitions=3, storage="redis"):
+        if storage not in STORAGE_ENGINES:
+            raise ValueError(f"Unknown storage engine '{storage}'. Use one of: {', '.join(STORAGE_ENGINES)}")
+        if self.redis.sismember("topic_tombstones", topic_name):
+            raise RuntimeError(f"Topic '{topic_name}' is still being deleted; try again once it is reclaimed")
+        if not self.redis.sismember("topics", topic_name):
             self.redis.sadd("topics", topic_name)
+            self.redis.hset("topic_partitions", topic_name, num_partitions)
+            if storage != "redis":
+                self.redis.hset("topic_storage", topic_name, storage)
             for partition in range(num_partitions):
                 partition_key = f"{topic_name}:partition{partition}"
                 # Instead of creating and immediately emptying,
                 # use Redis SET to ensure the key exists
                 self.redis.set(f"{topic_name}:partition_exists:{partition}", "1")
+                self.shards.assign(topic_name, partition)
+                partition_redis = self.shards.client_for(topic_name, partition)
                 # Initialize the partition key as an empty list
                 # We need to make sure this key exists even if empty
-                self.redis.delete(partition_key)
+                partition_redis.delete(partition_key)
                 # We need to ensure the partition key exists even if it's empty
-                self.redis.rpush(partition_key, "__init__")
-                self.redis.ltrim(partition_key, 1, 0)  # Remove the initialization message
+                partition_redis.rpush(partition_key, "__init__")
+                partition_redis.ltrim(partition_key, 1, 0)  # Remove the initialization message
                 
-            self.state_manager.add_topic(topic_name, num_partitions)
+            epoch = self.redis.incr(CATALOG_EPOCH_KEY)
+            self.state_manager.add_topic(topic_name, num_partitions, storage, epoch)
             print(
-                f"Topic '{topic_name}' created with {num_partitions} partitions.")
+                f"Topic '{topic_name}' created with {num_partitions} partitions ({storage} storage).")
         else:
+            # Keep this node's checkpoint complete for topics created by other nodes
+            if topic_name not in self.state_manager.state:
+                self.state_manager.add_topic(topic_name, num_partitions, storage)
             print(f"Topic '{topic_name}' already exists.")
 
     def list_topics(self):
@@ -40,74 +161,424 @@ class GlobalTopicRegistry:
         topics = self.redis.smembers("topics")
         return list(topics)
 
+    def list_topics_page(self, prefix="", limit=100, cursor=0, metadata=True):
+        """Return (next cursor, topics) for one page of the topics set.
+
+        Pages are walked with SSCAN, so a page costs the same however many
+        topics exist; pass the returned cursor to get the next page, which is 0
+        after the last one. With metadata, each topic comes with its partition
+        count, storage engine and depth (messages waiting), read with one
+        pipeline on the catalog and one per shard; without it, topics are just
+        names. A page may hold a few more topics than limit (SSCAN returns
+        whole buckets), or fewer when prefix matches few topics.
+        """
+        limit = max(1, min(int(limit), LIST_TOPICS_MAX_LIMIT))
+        match = re.sub(r"([*?\[\]\\])", r"\\\1", prefix) + "*" if prefix else None
+        names = {}
+        for _ in range(LIST_TOPICS_MAX_SCANS):
+            cursor, batch = self.redis.sscan("topics", cursor, match=match, count=limit)
+            names.update(dict.fromkeys(batch))
+            if not cursor or len(names) >= limit:
+                break
+        names = sorted(names)
+        if not names or not metadata:
+            return cursor, names
+
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.hmget("topic_partitions", names)
+        pipe.hmget("topic_storage", names)
+        counts, storages = pipe.execute()
+        topics = []
+        for topic_name, count, storage in zip(names, counts, storages):
+            # Topics created before the partition counts were recorded
+            count = int(count) if count is not None else self.get_partition_count(topic_name)
+            topics.append({"name": topic_name, "partitions": count, "storage": storage or "redis", "depth": 0})
+
+        # Segment logs live on the nodes, so only Redis partitions report a depth
+        locations = self.shards.locate_many(
+            (topic["name"], partition) for topic in topics if topic["storage"] == "redis"
+            for partition in range(topic["partitions"]))
+        reads = {}
+        for (topic_name, partition), (endpoint, migrating_from) in locations.items():
+            for source in filter(None, (migrating_from, endpoint)):
+                reads.setdefault(source, []).append((topic_name, partition))
+        by_name = {topic["name"]: topic for topic in topics}
+        for endpoint, partitions in reads.items():
+            for (topic_name, _), depth in zip(partitions, self._depths(self.shards.client(endpoint), partitions)):
+                by_name[topic_name]["depth"] += depth
+        for topic in topics:
+            if topic["storage"] != "redis":
+                topic["depth"] = None
+        return cursor, topics
+
+    def alter_topic(self, topic_name, num_partitions):
+        """Grow a topic to num_partitions partitions while it stays online.
+
+        Keys keep their partition unless jump consistent hashing moves them to
+        one of the new partitions. To keep each key in order, the new
+        partitions are written at once but only read once the old ones have
+        drained what they held when every producer had switched over (see
+        get_readable_partition_count). Returns the previous partition count.
+        """
+        if self.get_topic_storage(topic_name) != "redis":
+            raise ValueError("Only topics using the redis storage engine can be altered")
+        current = self.get_partition_count(topic_name)
+        if num_partitions <= current:
+            raise ValueError(f"Topic '{topic_name}' has {current} partitions; partitions can only be added")
+        # Taking the fence also keeps two alterations of a topic from running at once
+        if not self.redis.hsetnx("topic_fences", topic_name, current):
+            raise RuntimeError(f"Topic '{topic_name}' is still expanding; "
+                               f"try again once its new partitions are readable")
+
+        for partition in range(current, num_partitions):
+            self.redis.set(f"{topic_name}:partition_exists:{partition}", "1")
+            self.shards.assign(topic_name, partition)
+        pipe = self.redis.pipeline()
+        pipe.delete(self._fence_key(topic_name))
+        pipe.hset(self._fence_key(topic_name), "switched_at_ms", int(time.time() * 1000))
+        pipe.hset("topic_partitions", topic_name, num_partitions)
+        pipe.incr(CATALOG_EPOCH_KEY)
+        epoch = pipe.execute()[-1]
+
+        self.state_manager.add_topic(topic_name, num_partitions, "redis", epoch)
+        print(f"Topic '{topic_name}' altered from {current} to {num_partitions} partitions "
+              f"(new partitions readable once partitions 0-{current - 1} drain).")
+        return current
+
+    def _fence_key(self, topic_name):
+        """Hash of a topic expansion: switched_at_ms, then the depth and dequeued
+        counter of each old partition ("<p>:depth", "<p>:dequeued") once captured."""
+        return f"partition_fence:{topic_name}"
+
+    def get_readable_partition_count(self, topic_name):
+        """Return how many partitions consumers may read: all of them unless the topic is expanding."""
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.hget("topic_partitions", topic_name)
+        pipe.hget("topic_fences", topic_name)
+        count, fenced = pipe.execute()
+        count = int(count) if count is not None else self.get_partition_count(topic_name)
+        if fenced is None:
+            return count
+        if self._fence_lifted(topic_name, int(fenced)):
+            return count
+        return int(fenced)
+
+    def _fence_lifted(self, topic_name, old_count):
+        """Open the new partitions of an expanding topic once its old partitions have drained."""
+        now = time.monotonic()
+        if self._fence_checks.get(topic_name, 0) > now:
+            return False
+        self._fence_checks[topic_name] = now + PARTITION_FENCE_CHECK_MS / 1000
+
+        fence = self.redis.hgetall(self._fence_key(topic_name))
+        if int(time.time() * 1000) < int(fence.get("switched_at_ms", 0)) + PARTITION_FENCE_GRACE_MS:
+            return False
+        counters = self._partition_counters(topic_name, range(old_count))
+        if "0:depth" not in fence:
+            # Every producer uses the new count by now: whatever the old partitions hold
+            # must be read before the new ones. HSETNX keeps the first capture.
+            pipe = self.redis.pipeline()
+            for partition, (depth, dequeued) in counters.items():
+                pipe.hsetnx(self._fence_key(topic_name), f"{partition}:depth", depth)
+                pipe.hsetnx(self._fence_key(topic_name), f"{partition}:dequeued", dequeued)
+            pipe.hgetall(self._fence_key(topic_name))
+            fence = pipe.execute()[-1]
+        if any(dequeued - int(fence[f"{partition}:dequeued"]) < int(fence[f"{partition}:depth"])
+               for partition, (_, dequeued) in counters.items()):
+            return False
+
+        pipe = self.redis.pipeline()
+        pipe.hdel("topic_fences", topic_name)
+        pipe.delete(self._fence_key(topic_name))
+        lifted = pipe.execute()[0]
+        if lifted:
+            print(f"Topic '{topic_name}' drained partitions 0-{old_count - 1}; all partitions are readable.")
+        return True
+
+    def _partition_counters(self, topic_name, partitions):
+        """Return {partition: (depth, dequeued)} with one pipeline per shard."""
+        reads = {}
+        for (_, partition), (endpoint, migrating_from) in self.shards.locate_many(
+                (topic_name, partition) for partition in partitions).items():
+            for source in filter(None, (migrating_from, endpoint)):
+                reads.setdefault(source, []).append(partition)
+        counters = {partition: (0, 0) for partition in partitions}
+        for endpoint, sources in reads.items():
+            # Atomic, so that no message is popped between reading its list and the dequeued counter
+            pipe = self.shards.client(endpoint).pipeline(transaction=True)
+            for partition in sources:
+                pipe.hget(stats_key(topic_name, partition), "dequeued")
+                for key in partition_queues(topic_name, partition):
+                    pipe.llen(key)
+            results = pipe.execute()
+            step = PRIORITY_MAX + 2
+            for i, partition in enumerate(sources):
+                dequeued, depths = results[i * step], results[i * step + 1:(i + 1) * step]
+                counters[partition] = (counters[partition][0] + sum(depths),
+                                       counters[partition][1] + int(dequeued or 0))
+        return counters
+
+    def _depths(self, client, partitions):
+        """Return the number of messages in each (topic, partition) held by one shard, in one pipeline."""
+        pipe = client.pipeline(transaction=False)
+        for topic_name, partition in partitions:
+            for key in partition_queues(topic_name, partition):
+                pipe.llen(key)
+        lengths = pipe.execute()
+        levels = PRIORITY_MAX + 1
+        return [sum(lengths[i:i + levels]) for i in range(0, len(lengths), levels)]
+
     def delete_topic(self, topic_name):
-        """Delete a topic and its partitions."""
-        if self.redis.exists(topic_name):
-            self.redis.srem("topics", topic_name)
-            for key in self.redis.keys(f"{topic_name}:partition*"):
-                self.redis.delete(key)
-            self.state_manager.delete_topic(topic_name)
-            print(f"Topic '{topic_name}' and its partitions deleted.")
-        else:
+        """Delete a topic: tombstone it in the catalog now and free its data in the background.
+
+        The topic is gone for producers and consumers as soon as this returns;
+        the master's TopicReclaimer then unlinks its partitions in bounded
+        chunks. Returns the tombstone (see get_deletion_status), or None if the
+        topic does not exist.
+        """
+        if not self.redis.sismember("topics", topic_name):
             print(f"Topic '{topic_name}' does not exist.")
+            return None
+
+        num_partitions = self.get_partition_count(topic_name)
+        tombstone = {
+            "partitions": num_partitions,
+            "storage": self.get_topic_storage(topic_name),
+            "deleted_at_ms": int(time.time() * 1000),
+            "state": "pending",
+            "reclaimed_partitions": 0,
+            "keys_unlinked": 0,
+        }
+        pipe = self.redis.pipeline()
+        pipe.srem("topics", topic_name)
+        pipe.hdel("topic_partitions", topic_name)
+        pipe.hdel("topic_storage", topic_name)
+        pipe.hdel("topic_fences", topic_name)
+        pipe.delete(f"partition_leaders:{topic_name}", self._fence_key(topic_name))
+        if num_partitions:
+            pipe.srem("delayed_partitions", *(f"{topic_name}:{p}" for p in range(num_partitions)))
+        pipe.delete(tombstone_key(topic_name))
+        pipe.hset(tombstone_key(topic_name), mapping=tombstone)
+        pipe.sadd("topic_tombstones", topic_name)
+        pipe.incr(CATALOG_EPOCH_KEY)
+        epoch = pipe.execute()[-1]
 
-    def enqueue_message(self, topic_name, message):
-        """Add a message to a topic's partition."""
+        self.forget_topic_storage(topic_name)
+        self.state_manager.delete_topic(topic_name, epoch)
+        print(f"Topic '{topic_name}' deleted; its {num_partitions} partitions are reclaimed in the background.")
+        return tombstone
+
+    def get_deletion_status(self, topic_name):
+        """Return the progress of a topic deletion, or None if none is known."""
+        tombstone = self.redis.hgetall(tombstone_key(topic_name))
+        if not tombstone:
+            return None
+        return {name: value if name in ("state", "storage") else int(value)
+                for name, value in tombstone.items()}
+
+    def enqueue_message(self, topic_name, message, partition=None, priority=0):
+        """Add a message to a topic's partition (chosen from the message unless given)."""
         # First check if topic exists
         if not self.redis.sismember("topics", topic_name):
             print(f"Topic '{topic_name}' does not exist.")
             return
             
-        # Count partitions based on marker keys
-        partition_markers = self.redis.keys(f"{topic_name}:partition_exists:*")
-        
-        if partition_markers:
+        partition_count = self.get_partition_count(topic_name)
+        if partition_count:
             # Get partition number
-            partition_num = hash(message) % len(partition_markers)
-            partition_key = f"{topic_name}:partition{partition_num}"
-            self.redis.rpush(partition_key, message)
-            print(f"Message enqueued to {partition_key}: {message}")
+            partition_num = partition
+            if partition_num is None:
+                partition_num = self.choose_partition(message, partition_count)
+            key = partition_key(topic_name, partition_num, priority)
+            with tracing.child_span("redis.enqueue_message", topic=topic_name, partition=partition_num):
+                pipe = self.shards.client_for(topic_name, partition_num).pipeline(transaction=False)
+                pipe.rpush(key, message)
+                record_enqueued(pipe, topic_name, partition_num, [message])
+                pipe.execute()
+            print(f"Message enqueued to {key}: {message}")
         else:
             print(f"Topic '{topic_name}' exists but has no partitions.")
 
+    def producers_key(self, topic_name, partition):
+        """Hash of the last batch sequence each producer stored in a partition."""
+        return f"{topic_name}:partition{partition}:producers"
+
+    def enqueue_batch(self, topic_name, partition, messages, producer_id="", sequence=0, priority=0):
+        """Append a producer's batch to a partition atomically.
+
+        Returns False without storing anything when the producer already
+        stored this sequence (a retry); an empty producer_id disables the check.
+        """
+        with tracing.child_span("redis.enqueue_batch", topic=topic_name, partition=partition,
+                                messages=len(messages)):
+            return bool(self._enqueue_batch(
+                keys=[partition_key(topic_name, partition, priority), self.producers_key(topic_name, partition),
+                      stats_key(topic_name, partition)],
+                args=[producer_id, sequence, PRODUCER_STATE_TTL_MS, int(time.time() * 1000), *messages],
+                client=self.shards.client_for(topic_name, partition)))
+
+    def choose_partition(self, key, num_partitions):
+        """Map a message (or message key) to a partition, identically in every process."""
+        return jump_consistent_hash(stable_hash(key), num_partitions)
+
+    def get_topic_storage(self, topic_name):
+        """Return the storage engine of a topic: 'redis' or 'log' (node-local segment files)."""
+        storage = self.cached_topic_storage(topic_name)
+        if storage is None:
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.sismember("topics", topic_name)
+            pipe.hget("topic_storage", topic_name)
+            exists, storage = pipe.execute()
+            storage = storage or "redis"
+            # A deleted topic's name is only reused once it is reclaimed, at least
+            # TOPIC_RECLAIM_INTERVAL_MS later, so no entry outlives the topic it describes
+            if exists:
+                self._topic_storage[topic_name] = (time.monotonic() + TOPIC_STORAGE_CACHE_TTL_S, storage)
+        return storage
+
+    def cached_topic_storage(self, topic_name):
+        """Return the storage engine of a topic if this process already knows it, else None."""
+        cached = self._topic_storage.get(topic_name)
+        if cached is None or cached[0] < time.monotonic():
+            return None
+        return cached[1]
+
+    def forget_topic_storage(self, topic_name):
+        """Drop the cached storage engine of a deleted topic."""
+        self._topic_storage.pop(topic_name, None)
+
+    def timer_key(self, topic_name, partition):
+        """Sorted set of a partition's delayed messages, scored by delivery time (ms)."""
+        return f"{topic_name}:partition{partition}:delayed"
+
+    def schedule_message(self, topic_name, message, deliver_at_ms, partition=None):
+        """Store a message in the timer index of a partition (chosen from the message unless given)
+        until it is due for delivery."""
+        if not self.redis.sismember("topics", topic_name):
+            print(f"Topic '{topic_name}' does not exist.")
+            return
+        if partition is None:
+            partition = self.choose_partition(message, self.get_partition_count(topic_name))
+        # The timer lives on the partition's shard so the mover can move it atomically
+        self.shards.client_for(topic_name, partition).zadd(
+            self.timer_key(topic_name, partition), {f"{uuid.uuid4().hex}:{message}": deliver_at_ms})
+        self.redis.sadd("delayed_partitions", f"{topic_name}:{partition}")
+        print(f"Message scheduled to {topic_name}:partition{partition} at {deliver_at_ms}: {message}")
+
+    def get_delayed_count(self, topic_name):
+        """Count the messages of a topic still waiting for their delivery time."""
+        return sum(
+            self.shards.client_for(topic_name, partition).zcard(self.timer_key(topic_name, partition))
+            for partition in range(self.get_partition_count(topic_name)))
+
     def dequeue_message(self, topic_name, partition):
         """Dequeue a message from a topic's partition."""
-        partition_key = f"{topic_name}:partition{partition}"
-        if self.redis.exists(partition_key):
-            message = self.redis.lpop(partition_key)
-            if message:
-                print(f"Message dequeued from {partition_key}: {message}")
+        # While a partition migrates, the source shard holds the oldest messages
+        for partition_redis in self.shards.clients_for_read(topic_name, partition):
+            with tracing.child_span("redis.dequeue_message", topic=topic_name, partition=partition):
+                messages = self._dequeue(keys=dequeue_keys(topic_name, partition), args=[1], client=partition_redis)
+            if messages:
+                message = messages[0]
+                print(f"Message dequeued from {topic_name}:partition{partition}: {message}")
                 return message
-            else:
-                print(f"No messages in {partition_key}.")
-                return None
-        else:
-            print(f"Partition '{partition_key}' does not exist.")
-            return None
+        print(f"No messages in {topic_name}:partition{partition}.")
+        return None
+
+    def dequeue_batch(self, topic_name, partitions, max_messages):
+        """Dequeue up to max_messages from each of the given partitions: {partition: [messages]}."""
+        batches = {}
+        by_client = {}
+        for partition in partitions:
+            readers = self.shards.clients_for_read(topic_name, partition)
+            if len(readers) == 1:
+                by_client.setdefault(id(readers[0]), (readers[0], []))[1].append(partition)
+                continue
+            # While a partition migrates, the source shard holds the oldest messages
+            messages = []
+            for partition_redis in readers:
+                messages += self._dequeue(keys=dequeue_keys(topic_name, partition),
+                                          args=[max_messages - len(messages)], client=partition_redis)
+                if len(messages) >= max_messages:
+                    break
+            if messages:
+                batches[partition] = messages
+
+        for client, client_partitions in by_client.values():
+            pipe = client.pipeline(transaction=False)
+            for partition in client_partitions:
+                self._dequeue(keys=dequeue_keys(topic_name, partition), args=[max_messages], client=pipe)
+            with tracing.child_span("redis.dequeue_batch", topic=topic_name, partitions=len(client_partitions)):
+                results = pipe.execute()
+            for partition, messages in zip(client_partitions, results):
+                if messages:
+                    batches[partition] = messages
+        return batches
 
     def get_partition_count(self, topic_name):
         """ Obtain the number of partitions for a topic. """
-        partitions = self.redis.keys(f"{topic_name}:partition*")
-        return len(partitions)
+        count = self.redis.hget("topic_partitions", topic_name)
+        if count is not None:
+            return int(count)
+        # Topics created before the counts were recorded: probe the existence markers
+        # (empty partition lists are not stored by Redis), numbered from 0, a
+        # pipeline of EXISTS at a time instead of a KEYS scan, and remember the result
+        if not self.redis.sismember("topics", topic_name):
+            return 0
+        partitions = 0
+        while True:
+            pipe = self.redis.pipeline(transaction=False)
+            for partition in range(partitions, partitions + 64):
+                pipe.exists(f"{topic_name}:partition_exists:{partition}")
+            found = pipe.execute()
+            if all(found):
+                partitions += len(found)
+                continue
+            partitions += found.index(0)
+            break
+        if partitions:
+            self.redis.hset("topic_partitions", topic_name, partitions)
+        return partitions
+
+    def dequeue_from_partitions(self, topic_name, partitions):
+        """Dequeue the first available message from the given partitions."""
+        for partition in partitions:
+            message = self.dequeue_message(topic_name, partition)
+            if message:
+                return message
+        return None
+
+    def peek_batch(self, topic_name, partitions, max_messages):
+        """Read up to max_messages from each of the given partitions without removing them: {partition: [messages]}."""
+        batches = {}
+        for partition in partitions:
+            messages = []
+            # The source shard first while the partition migrates, most urgent first on each
+            for partition_redis in self.shards.clients_for_read(topic_name, partition):
+                for key in partition_queues(topic_name, partition):
+                    if len(messages) < max_messages:
+                        messages.extend(partition_redis.lrange(key, 0, max_messages - len(messages) - 1))
+            if messages:
+                batches[partition] = messages
+        return batches
 
     def get_partition_stats(self, topic_name):
         """Get statistics about the partitions of a topic. """
+        by_client = {}
+        for partition in range(self.get_partition_count(topic_name)):
+            for partition_redis in self.shards.clients_for_read(topic_name, partition):
+                by_client.setdefault(id(partition_redis), (partition_redis, []))[1].append(partition)
+        # One pipeline of LLENs per shard instead of one round trip per partition
         partition_stats = {}
-        partitions = self.redis.keys(f"{topic_name}:partition*")
-        for partition in partitions:
-            # Skip the existence markers
-            if "exists" in partition:
-                continue
-            partition_id = partition.split("partition")[1]
-            message_count = self.redis.llen(partition)
-            partition_stats[partition_id] = message_count
+        for partition_redis, partitions in by_client.values():
+            depths = self._depths(partition_redis, [(topic_name, partition) for partition in partitions])
+            for partition, message_count in zip(partitions, depths):
+                if message_count:
+                    partition_stats[str(partition)] = partition_stats.get(str(partition), 0) + message_count
         return partition_stats
 
     def get_message_from_partition(self, topic_name, partition_id):
         """Obtain a message from a specific partition."""
-        partition_key = f"{topic_name}:partition{partition_id}"
-        message = self.redis.lpop(partition_key)
-        return message
+        return self.dequeue_message(topic_name, partition_id)
 
 
     def get_all_messages_from_topic(self, topic_name):
@@ -119,24 +590,40 @@ class GlobalTopicRegistry:
             print(f"Topic '{topic_name}' does not exist.")
             return all_messages
         
-        # First, get all actual partition keys that match our pattern
-        actual_partition_keys = self.redis.keys(f"{topic_name}:partition[0-9]*")
-        print(f"DEBUG: Actual partition keys found: {actual_partition_keys}")
-        
-        if not actual_partition_keys:
+        partition_count = self.get_partition_count(topic_name)
+        if not partition_count:
             print(f"Topic '{topic_name}' has no partition data.")
             return all_messages
         
-        # Directly use the actual keys we found
-        for partition_key in actual_partition_keys:
+        for partition in range(partition_count):
+            partition_key = f"{topic_name}:partition{partition}"
             try:
-                # Get all messages from the partition without removing them
-                partition_messages = self.redis.lrange(partition_key, 0, -1)
-                print(f"DEBUG: Messages from {partition_key}: {partition_messages}")
-                
-                if partition_messages:
-                    all_messages.extend(partition_messages)
+                # Get all messages from the partition without removing them, most urgent first
+                for partition_redis in self.shards.clients_for_read(topic_name, partition):
+                    for key in partition_queues(topic_name, partition):
+                        partition_messages = partition_redis.lrange(key, 0, -1)
+                        print(f"DEBUG: Messages from {key}: {partition_messages}")
+
+                        if partition_messages:
+                            all_messages.extend(partition_messages)
             except Exception as e:
                 print(f"Error retrieving messages from partition '{partition_key}': {e}")
         
         return all_messages
+
+
+_registries = {}
+_registries_lock = threading.Lock()
+
+
+def get_registry(redis_host=None, redis_port=None):
+    """Return the process-wide registry for a Redis endpoint, creating it on first use."""
+    key = (redis_host, redis_port)
+    registry = _registries.get(key)
+    if registry is None:
+        with _registries_lock:
+            registry = _registries.get(key)
+            if registry is None:
+                registry = GlobalTopicRegistry(redis_host, redis_port)
+                _registries[key] = registry
+    return registry
@@ -24,7 +24,7 @@ _sym_db = _symbol_database.Default()
 
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\tmom.proto\x12\x03mom\"6\n\x0cTopicRequest\x12\x12\n\ntopic_name\x18\x01 \x01(\t\x12\x12\n\npartitions\x18\x02 \x01(\x05\"0\n\x0eMessageRequest\x12\r\n\x05topic\x18\x01 \x01(\t\x12\x0f\n\x07message\x18\x02 \x01(\t\"2\n\x0fMessageResponse\x12\x0e\n\x06status\x18\x01 \x01(\t\x12\x0f\n\x07message\x18\x02 \x01(\t\"\x07\n\x05\x45mpty\"1\n\x10InstanceResponse\x12\x0c\n\x04name\x18\x01 \x01(\t\x12\x0f\n\x07\x61\x64\x64ress\x18\x02 \x01(\t\"S\n\x1eMOMInstanceRegistrationRequest\x12\x11\n\tnode_name\x18\x01 \x01(\t\x12\x10\n\x08hostname\x18\x02 \x01(\t\x12\x0c\n\x04port\x18\x03 \x01(\x05\x32\xbf\x01\n\x0eMessageService\x12\x38\n\x0bSendMessage\x12\x13.mom.MessageRequest\x1a\x14.mom.MessageResponse\x12;\n\x0eReceiveMessage\x12\x13.mom.MessageRequest\x1a\x14.mom.MessageResponse\x12\x36\n\x0b\x43reateTopic\x12\x11.mom.TopicRequest\x1a\x14.mom.MessageResponse2\x97\x01\n\rMasterService\x12\x34\n\x0fGetNextInstance\x12\n.mom.Empty\x1a\x15.mom.InstanceResponse\x12P\n\x13RegisterMOMInstance\x12#.mom.MOMInstanceRegistrationRequest\x1a\x14.mom.MessageResponseb\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\tmom.proto\x12\x03mom\"G\n\x0cTopicRequest\x12\x12\n\ntopic_name\x18\x01 \x01(\t\x12\x12\n\npartitions\x18\x02 \x01(\x05\x12\x0f\n\x07storage\x18\x03 \x01(\t\"\x8a\x01\n\x0ePartitionChunk\x12\r\n\x05topic\x18\x01 \x01(\t\x12\x11\n\tpartition\x18\x02 \x01(\x05\x12\x0e\n\x06source\x18\x03 \x01(\t\x12\x14\n\x0cstart_offset\x18\x04 \x01(\x03\x12\r\n\x05\x63ount\x18\x05 \x01(\x05\x12\x0f\n\x07payload\x18\x06 \x01(\x0c\x12\x10\n\x08priority\x18\x07 \x01(\x05\"L\n\x18ReplicationOffsetRequest\x12\r\n\x05topic\x18\x01 \x01(\t\x12\x11\n\tpartition\x18\x02 \x01(\x05\x12\x0e\n\x06source\x18\x03 \x01(\t\"F\n\x0eReplicationAck\x12\x0e\n\x06status\x18\x01 \x01(\t\x12\x0f\n\x07message\x18\x02 \x01(\t\x12\x13\n\x0bnext_offset\x18\x03 \x01(\x03\"%\n\x14TopicMetadataRequest\x12\r\n\x05topic\x18\x01 \x01(\t\"G\n\x11PartitionMetadata\x12\x11\n\tpartition\x18\x01 \x01(\x05\x12\x0e\n\x06leader\x18\x02 \x01(\t\x12\x0f\n\x07\x61\x64\x64ress\x18\x03 \x01(\t\"|\n\rTopicMetadata\x12\x0e\n\x06status\x18\x01 \x01(\t\x12\x0f\n\x07message\x18\x02 \x01(\t\x12\r\n\x05topic\x18\x03 \x01(\t\x12\x0f\n\x07storage\x18\x04 \x01(\t\x12*\n\npartitions\x18\x05 \x03(\x0b\x32\x16.mom.PartitionMetadata\"\x9d\x01\n\x0cMessageBatch\x12\r\n\x05topic\x18\x01 \x01(\t\x12\x11\n\tpartition\x18\x02 \x01(\x05\x12\x13\n\x0bproducer_id\x18\x03 \x01(\t\x12\x10\n\x08sequence\x18\x04 \x01(\x03\x12\r\n\x05\x63ount\x18\x05 \x01(\x05\x12\x0f\n\x07payload\x18\x06 \x01(\x0c\x12\x12\n\ncompressed\x18\x07 \x01(\x08\x12\x10\n\x08priority\x18\x08 \x01(\x05\">\n\x08\x42\x61tchAck\x12\x0e\n\x06status\x18\x01 \x01(\t\x12\x0f\n\x07message\x18\x02 \x01(\t\x12\x11\n\tduplicate\x18\x03 \x01(\x08\"\x95\x01\n\x13ReceiveBatchRequest\x12\r\n\x05topic\x18\x01 \x01(\t\x12\x12\n\npartitions\x18\x02 \x03(\x05\x12\r\n\x05group\x18\x03 \x01(\t\x12\x13\n\x0b\x63onsumer_id\x18\x04 \x01(\t\x12\x14\n\x0cmax_messages\x18\x05 \x01(\x05\x12\x13\n\x0bmax_wait_ms\x18\x06 \x01(\x05\x12\x0c\n\x04peek\x18\x07 \x01(\x08\"m\n\x14ReceiveBatchResponse\x12\x0e\n\x06status\x18\x01 \x01(\t\x12\x0f\n\x07message\x18\x02 \x01(\t\x12\"\n\x07\x62\x61tches\x18\x03 \x03(\x0b\x32\x11.mom.MessageBatch\x12\x10\n\x08\x61ssigned\x18\x04 \x03(\x05\"\xb2\x01\n\x0eMessageRequest\x12\r\n\x05topic\x18\x01 \x01(\t\x12\x0f\n\x07message\x18\x02 \x01(\t\x12\r\n\x05group\x18\x03 \x01(\t\x12\x13\n\x0b\x63onsumer_id\x18\x04 \x01(\t\x12\x10\n\x08\x64\x65lay_ms\x18\x05 \x01(\x03\x12\x12\n\ndeliver_at\x18\x06 \x01(\x03\x12\x16\n\tpartition\x18\x07 \x01(\x05H\x00\x88\x01\x01\x12\x10\n\x08priority\x18\x08 \x01(\x05\x42\x0c\n\n_partition\"2\n\x0fMessageResponse\x12\x0e\n\x06status\x18\x01 \x01(\t\x12\x0f\n\x07message\x18\x02 \x01(\t\"\x07\n\x05\x45mpty\"1\n\x10InstanceResponse\x12\x0c\n\x04name\x18\x01 \x01(\t\x12\x0f\n\x07\x61\x64\x64ress\x18\x02 \x01(\t\"S\n\x1eMOMInstanceRegistrationRequest\x12\x11\n\tnode_name\x18\x01 \x01(\t\x12\x10\n\x08hostname\x18\x02 \x01(\t\x12\x0c\n\x04port\x18\x03 \x01(\x05\"e\n\x0eProfileRequest\x12\x0c\n\x04kind\x18\x01 \x01(\t\x12\x13\n\x0b\x64uration_ms\x18\x02 \x01(\x05\x12\x13\n\x0binterval_ms\x18\x03 \x01(\x05\x12\x0e\n\x06\x66ormat\x18\x04 \x01(\t\x12\x0b\n\x03top\x18\x05 \x01(\x05\"P\n\x0fProfileResponse\x12\x0e\n\x06status\x18\x01 \x01(\t\x12\x0f\n\x07message\x18\x02 \x01(\t\x12\x0e\n\x06\x66ormat\x18\x03 \x01(\t\x12\x0c\n\x04\x64\x61ta\x18\x04 \x01(\x0c\x32\xf1\x04\n\x0eMessageService\x12\x38\n\x0bSendMessage\x12\x13.mom.MessageRequest\x1a\x14.mom.MessageResponse\x12;\n\x0eReceiveMessage\x12\x13.mom.MessageRequest\x1a\x14.mom.MessageResponse\x12\x36\n\x0b\x43reateTopic\x12\x11.mom.TopicRequest\x1a\x14.mom.MessageResponse\x12\x35\n\nAlterTopic\x12\x11.mom.TopicRequest\x1a\x14.mom.MessageResponse\x12@\n\x12ReplicatePartition\x12\x13.mom.PartitionChunk\x1a\x13.mom.ReplicationAck(\x01\x12J\n\x14GetReplicationOffset\x12\x1d.mom.ReplicationOffsetRequest\x1a\x13.mom.ReplicationAck\x12\x41\n\x10GetTopicMetadata\x12\x19.mom.TopicMetadataRequest\x1a\x12.mom.TopicMetadata\x12-\n\tSendBatch\x12\x11.mom.MessageBatch\x1a\r.mom.BatchAck\x12\x43\n\x0cReceiveBatch\x12\x18.mom.ReceiveBatchRequest\x1a\x19.mom.ReceiveBatchResponse\x12\x34\n\x07Profile\x12\x13.mom.ProfileRequest\x1a\x14.mom.ProfileResponse2\x97\x01\n\rMasterService\x12\x34\n\x0fGetNextInstance\x12\n.mom.Empty\x1a\x15.mom.InstanceResponse\x12P\n\x13RegisterMOMInstance\x12#.mom.MOMInstanceRegistrationRequest\x1a\x14.mom.MessageResponseb\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
@@ -32,19 +32,43 @@ _builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'mom_pb2', _globals)
 if not _descriptor._USE_C_DESCRIPTORS:
   DESCRIPTOR._loaded_options = None
   _globals['_TOPICREQUEST']._serialized_start=18
-  _globals['_TOPICREQUEST']._serialized_end=72
-  _globals['_MESSAGEREQUEST']._serialized_start=74
-  _globals['_MESSAGEREQUEST']._serialized_end=122
-  _globals['_MESSAGERESPONSE']._serialized_start=124
-  _globals['_MESSAGERESPONSE']._serialized_end=174
-  _globals['_EMPTY']._serialized_start=176
-  _globals['_EMPTY']._serialized_end=183
-  _globals['_INSTANCERESPONSE']._serialized_start=185
-  _globals['_INSTANCERESPONSE']._serialized_end=234
-  _globals['_MOMINSTANCEREGISTRATIONREQUEST']._serialized_start=236
-  _globals['_MOMINSTANCEREGISTRATIONREQUEST']._serialized_end=319
-  _globals['_MESSAGESERVICE']._serialized_start=322
-  _globals['_MESSAGESERVICE']._serialized_end=513
-  _globals['_MASTERSERVICE']._serialized_start=516
-  _globals['_MASTERSERVICE']._serialized_end=667
+  _globals['_TOPICREQUEST']._serialized_end=89
+  _globals['_PARTITIONCHUNK']._serialized_start=92
+  _globals['_PARTITIONCHUNK']._serialized_end=230
+  _globals['_REPLICATIONOFFSETREQUEST']._serialized_start=232
+  _globals['_REPLICATIONOFFSETREQUEST']._serialized_end=308
+  _globals['_REPLICATIONACK']._serialized_start=310
+  _globals['_REPLICATIONACK']._serialized_end=380
+  _globals['_TOPICMETADATAREQUEST']._serialized_start=382
+  _globals['_TOPICMETADATAREQUEST']._serialized_end=419
+  _globals['_PARTITIONMETADATA']._serialized_start=421
+  _globals['_PARTITIONMETADATA']._serialized_end=492
+  _globals['_TOPICMETADATA']._serialized_start=494
+  _globals['_TOPICMETADATA']._serialized_end=618
+  _globals['_MESSAGEBATCH']._serialized_start=621
+  _globals['_MESSAGEBATCH']._serialized_end=778
+  _globals['_BATCHACK']._serialized_start=780
+  _globals['_BATCHACK']._serialized_end=842
+  _globals['_RECEIVEBATCHREQUEST']._serialized_start=845
+  _globals['_RECEIVEBATCHREQUEST']._serialized_end=994
+  _globals['_RECEIVEBATCHRESPONSE']._serialized_start=996
+  _globals['_RECEIVEBATCHRESPONSE']._serialized_end=1105
+  _globals['_MESSAGEREQUEST']._serialized_start=1108
+  _globals['_MESSAGEREQUEST']._serialized_end=1286
+  _globals['_MESSAGERESPONSE']._serialized_start=1288
+  _globals['_MESSAGERESPONSE']._serialized_end=1338
+  _globals['_EMPTY']._serialized_start=1340
+  _globals['_EMPTY']._serialized_end=1347
+  _globals['_INSTANCERESPONSE']._serialized_start=1349
+  _globals['_INSTANCERESPONSE']._serialized_end=1398
+  _globals['_MOMINSTANCEREGISTRATIONREQUEST']._serialized_start=1400
+  _globals['_MOMINSTANCEREGISTRATIONREQUEST']._serialized_end=1483
+  _globals['_PROFILEREQUEST']._serialized_start=1485
+  _globals['_PROFILEREQUEST']._serialized_end=1586
+  _globals['_PROFILERESPONSE']._serialized_start=1588
+  _globals['_PROFILERESPONSE']._serialized_end=1668
+  _globals['_MESSAGESERVICE']._serialized_start=1671
+  _globals['_MESSAGESERVICE']._serialized_end=2296
+  _globals['_MASTERSERVICE']._serialized_start=2299
+  _globals['_MASTERSERVICE']._serialized_end=2450
 # @@protoc_insertion_point(module_scope)
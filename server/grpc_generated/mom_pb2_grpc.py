@@ -49,6 +49,41 @@ class MessageServiceStub(object):
                 request_serializer=mom__pb2.TopicRequest.SerializeToString,
                 response_deserializer=mom__pb2.MessageResponse.FromString,
                 _registered_method=True)
+        self.AlterTopic = channel.unary_unary(
+                '/mom.MessageService/AlterTopic',
+                request_serializer=mom__pb2.TopicRequest.SerializeToString,
+                response_deserializer=mom__pb2.MessageResponse.FromString,
+                _registered_method=True)
+        self.ReplicatePartition = channel.stream_unary(
+                '/mom.MessageService/ReplicatePartition',
+                request_serializer=mom__pb2.PartitionChunk.SerializeToString,
+                response_deserializer=mom__pb2.ReplicationAck.FromString,
+                _registered_method=True)
+        self.GetReplicationOffset = channel.unary_unary(
+                '/mom.MessageService/GetReplicationOffset',
+                request_serializer=mom__pb2.ReplicationOffsetRequest.SerializeToString,
+                response_deserializer=mom__pb2.ReplicationAck.FromString,
+                _registered_method=True)
+        self.GetTopicMetadata = channel.unary_unary(
+                '/mom.MessageService/GetTopicMetadata',
+                request_serializer=mom__pb2.TopicMetadataRequest.SerializeToString,
+                response_deserializer=mom__pb2.TopicMetadata.FromString,
+                _registered_method=True)
+        self.SendBatch = channel.unary_unary(
+                '/mom.MessageService/SendBatch',
+                request_serializer=mom__pb2.MessageBatch.SerializeToString,
+                response_deserializer=mom__pb2.BatchAck.FromString,
+                _registered_method=True)
+        self.ReceiveBatch = channel.unary_unary(
+                '/mom.MessageService/ReceiveBatch',
+                request_serializer=mom__pb2.ReceiveBatchRequest.SerializeToString,
+                response_deserializer=mom__pb2.ReceiveBatchResponse.FromString,
+                _registered_method=True)
+        self.Profile = channel.unary_unary(
+                '/mom.MessageService/Profile',
+                request_serializer=mom__pb2.ProfileRequest.SerializeToString,
+                response_deserializer=mom__pb2.ProfileResponse.FromString,
+                _registered_method=True)
 
 
 class MessageServiceServicer(object):
@@ -75,6 +110,55 @@ class MessageServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def AlterTopic(self, request, context):
+        """Adds partitions to a topic while it stays online (storage is ignored)
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def ReplicatePartition(self, request_iterator, context):
+        """Streams a partition from another node in compressed chunks
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def GetReplicationOffset(self, request, context):
+        """Returns the offset a partition replication stream should resume from
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def GetTopicMetadata(self, request, context):
+        """Returns the partitions of a topic and the instance owning writes to each
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def SendBatch(self, request, context):
+        """Stores a compressed batch of messages in one partition of a topic
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def ReceiveBatch(self, request, context):
+        """Receives batches of messages from several partitions, waiting for messages if there are none
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def Profile(self, request, context):
+        """Profiles the serving process for a while: CPU samples, allocation growth or thread stacks
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
 
 def add_MessageServiceServicer_to_server(servicer, server):
     rpc_method_handlers = {
@@ -93,6 +177,41 @@ def add_MessageServiceServicer_to_server(servicer, server):
                     request_deserializer=mom__pb2.TopicRequest.FromString,
                     response_serializer=mom__pb2.MessageResponse.SerializeToString,
             ),
+            'AlterTopic': grpc.unary_unary_rpc_method_handler(
+                    servicer.AlterTopic,
+                    request_deserializer=mom__pb2.TopicRequest.FromString,
+                    response_serializer=mom__pb2.MessageResponse.SerializeToString,
+            ),
+            'ReplicatePartition': grpc.stream_unary_rpc_method_handler(
+                    servicer.ReplicatePartition,
+                    request_deserializer=mom__pb2.PartitionChunk.FromString,
+                    response_serializer=mom__pb2.ReplicationAck.SerializeToString,
+            ),
+            'GetReplicationOffset': grpc.unary_unary_rpc_method_handler(
+                    servicer.GetReplicationOffset,
+                    request_deserializer=mom__pb2.ReplicationOffsetRequest.FromString,
+                    response_serializer=mom__pb2.ReplicationAck.SerializeToString,
+            ),
+            'GetTopicMetadata': grpc.unary_unary_rpc_method_handler(
+                    servicer.GetTopicMetadata,
+                    request_deserializer=mom__pb2.TopicMetadataRequest.FromString,
+                    response_serializer=mom__pb2.TopicMetadata.SerializeToString,
+            ),
+            'SendBatch': grpc.unary_unary_rpc_method_handler(
+                    servicer.SendBatch,
+                    request_deserializer=mom__pb2.MessageBatch.FromString,
+                    response_serializer=mom__pb2.BatchAck.SerializeToString,
+            ),
+            'ReceiveBatch': grpc.unary_unary_rpc_method_handler(
+                    servicer.ReceiveBatch,
+                    request_deserializer=mom__pb2.ReceiveBatchRequest.FromString,
+                    response_serializer=mom__pb2.ReceiveBatchResponse.SerializeToString,
+            ),
+            'Profile': grpc.unary_unary_rpc_method_handler(
+                    servicer.Profile,
+                    request_deserializer=mom__pb2.ProfileRequest.FromString,
+                    response_serializer=mom__pb2.ProfileResponse.SerializeToString,
+            ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
             'mom.MessageService', rpc_method_handlers)
@@ -185,6 +304,195 @@ class MessageService(object):
             metadata,
             _registered_method=True)
 
+    @staticmethod
+    def AlterTopic(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/mom.MessageService/AlterTopic',
+            mom__pb2.TopicRequest.SerializeToString,
+            mom__pb2.MessageResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def ReplicatePartition(request_iterator,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.stream_unary(
+            request_iterator,
+            target,
+            '/mom.MessageService/ReplicatePartition',
+            mom__pb2.PartitionChunk.SerializeToString,
+            mom__pb2.ReplicationAck.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def GetReplicationOffset(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/mom.MessageService/GetReplicationOffset',
+            mom__pb2.ReplicationOffsetRequest.SerializeToString,
+            mom__pb2.ReplicationAck.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def GetTopicMetadata(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/mom.MessageService/GetTopicMetadata',
+            mom__pb2.TopicMetadataRequest.SerializeToString,
+            mom__pb2.TopicMetadata.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def SendBatch(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/mom.MessageService/SendBatch',
+            mom__pb2.MessageBatch.SerializeToString,
+            mom__pb2.BatchAck.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def ReceiveBatch(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/mom.MessageService/ReceiveBatch',
+            mom__pb2.ReceiveBatchRequest.SerializeToString,
+            mom__pb2.ReceiveBatchResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def Profile(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/mom.MessageService/Profile',
+            mom__pb2.ProfileRequest.SerializeToString,
+            mom__pb2.ProfileResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
 
 class MasterServiceStub(object):
     """Master Node service
@@ -0,0 +1,323 @@
+import asyncio
+import contextvars
+import functools
+import os
+import sys
+import threading
+from concurrent import futures
+
+import dotenv
+import grpc
+
+from .global_topic import DEQUEUE_SCRIPT, PRIORITY_MAX, dequeue_keys
+from .partition_leadership import FORWARDED_METADATA
+from .redis_pool import get_async_redis
+from . import deadline, tracing
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "grpc_generated"))
+from .grpc_generated import mom_pb2, mom_pb2_grpc
+
+dotenv.load_dotenv()
+
+# "thread": grpc.server on a thread pool, "aio": grpc.aio on an asyncio event loop
+GRPC_SERVER_MODES = ("thread", "aio")
+GRPC_SERVER_MODE = os.getenv("GRPC_SERVER_MODE", "thread")
+# Threads serving RPCs in thread mode; threads running blocking operations in aio mode
+GRPC_MAX_WORKERS = int(os.getenv("GRPC_MAX_WORKERS", 10))
+# RPCs in flight beyond this limit are rejected with RESOURCE_EXHAUSTED (0 = no limit)
+GRPC_MAX_CONCURRENT_RPCS = int(os.getenv("GRPC_MAX_CONCURRENT_RPCS", 0))
+# How often a waiting ReceiveBatch checks its partitions again, and the longest wait a client may ask for
+RECEIVE_POLL_INTERVAL_MS = int(os.getenv("RECEIVE_POLL_INTERVAL_MS", 50))
+RECEIVE_MAX_WAIT_MS = 30000
+
+
+def create_server(servicer, server_mode=GRPC_SERVER_MODE, max_workers=GRPC_MAX_WORKERS,
+                  max_concurrent_rpcs=GRPC_MAX_CONCURRENT_RPCS, options=()):
+    """Create a gRPC server for a MOMInstance or MasterNode in the given mode.
+
+    Both kinds of server expose add_insecure_port, start, stop and
+    wait_for_termination like grpc.server.
+    """
+    if server_mode not in GRPC_SERVER_MODES:
+        raise ValueError(f"Unknown gRPC server mode '{server_mode}'. Use one of: {', '.join(GRPC_SERVER_MODES)}")
+    if server_mode == "aio":
+        return AioServer(servicer, max_workers, max_concurrent_rpcs, options)
+
+    # The interceptors continue the caller's trace and deadline in every RPC, including ones added later
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=max_workers),
+                         interceptors=[tracing.ServerInterceptor(), deadline.ServerInterceptor()],
+                         options=options, maximum_concurrent_rpcs=max_concurrent_rpcs or None)
+    mom_pb2_grpc.add_MessageServiceServicer_to_server(servicer, server)
+    if isinstance(servicer, mom_pb2_grpc.MasterServiceServicer):
+        mom_pb2_grpc.add_MasterServiceServicer_to_server(servicer, server)
+    return server
+
+
+class _BlockingContext:
+    """Record the status set by a servicer method running outside the event loop."""
+
+    def __init__(self, context):
+        self._context = context
+        self.code = None
+        self.details = None
+
+    def set_code(self, code):
+        self.code = code
+
+    def set_details(self, details):
+        self.details = details
+
+    def __getattr__(self, name):
+        return getattr(self._context, name)
+
+
+class _BlockingCalls:
+    """Run synchronous code of the servicers on a thread pool owned by the server."""
+
+    def __init__(self, executor):
+        self.executor = executor
+
+    async def _blocking(self, func, *args):
+        context = contextvars.copy_context()
+        return await asyncio.get_running_loop().run_in_executor(
+            self.executor, functools.partial(context.run, func, *args))
+
+    async def _run_blocking(self, method, request, context):
+        """Run a synchronous servicer method off the event loop."""
+        blocking_context = _BlockingContext(context)
+        response = await self._blocking(method, request, blocking_context)
+        if blocking_context.code is not None:
+            context.set_code(blocking_context.code)
+        if blocking_context.details is not None:
+            context.set_details(blocking_context.details)
+        return response
+
+
+class AsyncMessageService(_BlockingCalls, mom_pb2_grpc.MessageServiceServicer):
+    """grpc.aio MessageService serving the hot paths with redis.asyncio.
+
+    Sending to and receiving from Redis-backed topics never blocks the event
+    loop. Everything else (topic creation, delayed messages, consumer groups,
+    log storage topics) runs the synchronous servicer on a thread pool.
+    """
+
+    def __init__(self, servicer, executor):
+        super().__init__(executor)
+        self.servicer = servicer
+        self.registry = servicer.registry
+        self._dequeue_scripts = {}
+
+    def _client(self, endpoint):
+        host, port = endpoint.rsplit(":", 1)
+        return get_async_redis(host, int(port))
+
+    def _dequeue_script(self, endpoint):
+        script = self._dequeue_scripts.get(endpoint)
+        if script is None:
+            script = self._dequeue_scripts[endpoint] = self._client(endpoint).register_script(DEQUEUE_SCRIPT)
+        return script
+
+    async def _partition_count(self, topic_name):
+        """Return (topic exists, partition count, partitions readable by consumers) in one round trip."""
+        pipe = self._client(self.registry.shards.catalog_endpoint).pipeline(transaction=False)
+        pipe.sismember("topics", topic_name)
+        pipe.hget("topic_partitions", topic_name)
+        pipe.hget("topic_fences", topic_name)
+        exists, count, fenced = await pipe.execute()
+        if not exists:
+            return False, 0, 0
+        # Topics created before partition counts were recorded, and topics being expanded, are rare
+        count = int(count) if count is not None else await self._blocking(
+            self.registry.get_partition_count, topic_name)
+        readable = count if fenced is None else await self._blocking(
+            self.registry.get_readable_partition_count, topic_name)
+        return True, count, readable
+
+    async def _topic_storage(self, topic_name):
+        return (self.registry.cached_topic_storage(topic_name)
+                or await self._blocking(self.registry.get_topic_storage, topic_name))
+
+    async def _locate(self, topic_name, partition):
+        return (self.registry.shards.cached_location(topic_name, partition)
+                or await self._blocking(self.registry.shards.locate, topic_name, partition))
+
+    async def SendMessage(self, request, context):
+        """Send a message to the specified topic."""
+        if request.delay_ms > 0 or request.deliver_at or not 0 <= request.priority <= PRIORITY_MAX:
+            return await self._run_blocking(self.servicer.SendMessage, request, context)
+        exists, partition_count, _ = await self._partition_count(request.topic)
+        if not exists or not partition_count or await self._topic_storage(request.topic) != "redis":
+            return await self._run_blocking(self.servicer.SendMessage, request, context)
+
+        if request.HasField("partition"):
+            if not 0 <= request.partition < partition_count:
+                return await self._run_blocking(self.servicer.SendMessage, request, context)
+            partition = request.partition
+        else:
+            partition = self.registry.choose_partition(request.message, partition_count)
+        # Partitions owned by another instance, or whose owner is not cached, are routed by the servicer
+        forwarded = any(key == FORWARDED_METADATA for key, _ in context.invocation_metadata())
+        if not forwarded and self.servicer.membership.members \
+                and self.servicer.leadership.cached_owner(request.topic, partition) != self.servicer.instance_name:
+            request.partition = partition
+            return await self._run_blocking(self.servicer.SendMessage, request, context)
+
+        # Resolved by the coalescer's flusher once the batch holding the message is stored; an RPC
+        # cancelled before its batch is flushed cancels the future too, which withdraws the message
+        with tracing.child_span("redis.coalesced_write", topic=request.topic, partition=partition):
+            await asyncio.wrap_future(
+                self.servicer.writes.submit(request.topic, partition, request.message, request.priority))
+        if self.servicer.audit_messages:
+            self.servicer.audit_log.log("SEND", request.topic, request.message, partition)
+        return mom_pb2.MessageResponse(status="Success", message="Message enqueued")
+
+    async def ReceiveMessage(self, request, context):
+        """Receive a message from the specified topic."""
+        if request.group:
+            return await self._run_blocking(self.servicer.ReceiveMessage, request, context)
+        _, _, partition_count = await self._partition_count(request.topic)
+        if partition_count and await self._topic_storage(request.topic) != "redis":
+            return await self._run_blocking(self.servicer.ReceiveMessage, request, context)
+
+        for partition in range(partition_count):
+            endpoint, migrating_from = await self._locate(request.topic, partition)
+            # While a partition migrates, the source shard holds the oldest messages
+            for source in filter(None, (migrating_from, endpoint)):
+                with tracing.child_span("redis.dequeue_message", topic=request.topic, partition=partition):
+                    messages = await self._dequeue_script(source)(
+                        keys=dequeue_keys(request.topic, partition), args=[1])
+                if messages:
+                    if self.servicer.audit_messages:
+                        self.servicer.audit_log.log("RECEIVE", request.topic, messages[0], partition)
+                    return mom_pb2.MessageResponse(status="Success", message=messages[0])
+        return mom_pb2.MessageResponse(status="Empty", message="No messages available")
+
+    async def CreateTopic(self, request, context):
+        return await self._run_blocking(self.servicer.CreateTopic, request, context)
+
+    async def AlterTopic(self, request, context):
+        return await self._run_blocking(self.servicer.AlterTopic, request, context)
+
+    async def Profile(self, request, context):
+        return await self._run_blocking(self.servicer.Profile, request, context)
+
+    async def GetReplicationOffset(self, request, context):
+        return await self._run_blocking(self.servicer.GetReplicationOffset, request, context)
+
+    async def GetTopicMetadata(self, request, context):
+        return await self._run_blocking(self.servicer.GetTopicMetadata, request, context)
+
+    async def SendBatch(self, request, context):
+        return await self._run_blocking(self.servicer.SendBatch, request, context)
+
+    async def ReceiveBatch(self, request, context):
+        """Long-poll for batches, waiting between attempts on the event loop instead of a thread."""
+        loop = asyncio.get_running_loop()
+        # The wait never outlasts the caller's deadline
+        wait_until = loop.time() + deadline.timeout(min(request.max_wait_ms, RECEIVE_MAX_WAIT_MS) / 1000)
+        attempt = mom_pb2.ReceiveBatchRequest()
+        attempt.CopyFrom(request)
+        attempt.max_wait_ms = 0
+        while True:
+            response = await self._run_blocking(self.servicer.ReceiveBatch, attempt, context)
+            remaining = wait_until - loop.time()
+            if response.status != "Empty" or remaining <= 0:
+                return response
+            await asyncio.sleep(min(RECEIVE_POLL_INTERVAL_MS / 1000, remaining))
+
+    async def ReplicatePartition(self, request_iterator, context):
+        """Apply a stream of partition chunks with the synchronous servicer, fed from the event loop."""
+        if not hasattr(self.servicer, "_replication_checkpoint_key"):
+            await context.abort(grpc.StatusCode.UNIMPLEMENTED, "Replication is not served by this node")
+
+        chunks = request_iterator.__aiter__()
+        loop = asyncio.get_running_loop()
+
+        def blocking_chunks():
+            while True:
+                chunk = asyncio.run_coroutine_threadsafe(anext(chunks, None), loop).result()
+                if chunk is None:
+                    return
+                yield chunk
+
+        return await self._run_blocking(self.servicer.ReplicatePartition, blocking_chunks(), context)
+
+
+class AsyncMasterService(_BlockingCalls, mom_pb2_grpc.MasterServiceServicer):
+    """grpc.aio MasterService; instance management runs on the thread pool."""
+
+    def __init__(self, servicer, executor):
+        super().__init__(executor)
+        self.servicer = servicer
+
+    async def GetNextInstance(self, request, context):
+        return await self._run_blocking(self.servicer.GetNextInstance, request, context)
+
+    async def RegisterMOMInstance(self, request, context):
+        return await self._run_blocking(self.servicer.RegisterMOMInstance, request, context)
+
+
+class AioServer:
+    """A grpc.aio server running on its own event loop thread."""
+
+    def __init__(self, servicer, max_workers=GRPC_MAX_WORKERS, max_concurrent_rpcs=GRPC_MAX_CONCURRENT_RPCS,
+                 options=()):
+        self.servicer = servicer
+        self.max_workers = max_workers
+        self.max_concurrent_rpcs = max_concurrent_rpcs
+        self.options = options
+        self.addresses = []
+        self.loop = None
+        self._server = None
+        self._thread = None
+
+    def add_insecure_port(self, address):
+        self.addresses.append(address)
+
+    def start(self):
+        """Start serving; returns once the server is listening."""
+        started = threading.Event()
+        errors = []
+
+        def aio_server_worker():
+            self.loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self.loop)
+            # Blocking servicer calls get their own pool, sized like the thread server
+            executor = futures.ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="grpc-aio-blocking")
+            try:
+                self._server = grpc.aio.server(
+                    interceptors=[tracing.AioServerInterceptor(), deadline.AioServerInterceptor()],
+                    options=self.options, maximum_concurrent_rpcs=self.max_concurrent_rpcs or None)
+                mom_pb2_grpc.add_MessageServiceServicer_to_server(
+                    AsyncMessageService(self.servicer, executor), self._server)
+                if isinstance(self.servicer, mom_pb2_grpc.MasterServiceServicer):
+                    mom_pb2_grpc.add_MasterServiceServicer_to_server(
+                        AsyncMasterService(self.servicer, executor), self._server)
+                for address in self.addresses:
+                    self._server.add_insecure_port(address)
+                self.loop.run_until_complete(self._server.start())
+            except Exception as e:
+                errors.append(e)
+                started.set()
+                return
+            started.set()
+            # Runs until stop(); the server's own wait_for_termination returns before stop() completes
+            self.loop.run_forever()
+
+        self._thread = threading.Thread(target=aio_server_worker, name="grpc-aio-server", daemon=True)
+        self._thread.start()
+        started.wait()
+        if errors:
+            raise errors[0]
+
+    def stop(self, grace):
+        """Stop the server from any thread."""
+        if self._server is None or not self._thread.is_alive():
+            return
+        asyncio.run_coroutine_threadsafe(self._server.stop(grace), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+    def wait_for_termination(self, timeout=None):
+        """Block until the server stops; returns True if the timeout expired first."""
+        self._thread.join(timeout)
+        return self._thread.is_alive()
@@ -0,0 +1,22 @@
+import grpc
+
+
+def wrap_rpc_handler(handler, wrap_unary, wrap_stream):
+    """Rebuild an RPC method handler with its behavior wrapped, for server interceptors.
+
+    wrap_unary wraps the behavior of RPCs answering with one response,
+    wrap_stream that of RPCs streaming their responses.
+    """
+    if handler is None:
+        return None
+    if handler.unary_unary:
+        return grpc.unary_unary_rpc_method_handler(
+            wrap_unary(handler.unary_unary), handler.request_deserializer, handler.response_serializer)
+    if handler.unary_stream:
+        return grpc.unary_stream_rpc_method_handler(
+            wrap_stream(handler.unary_stream), handler.request_deserializer, handler.response_serializer)
+    if handler.stream_unary:
+        return grpc.stream_unary_rpc_method_handler(
+            wrap_unary(handler.stream_unary), handler.request_deserializer, handler.response_serializer)
+    return grpc.stream_stream_rpc_method_handler(
+        wrap_stream(handler.stream_stream), handler.request_deserializer, handler.response_serializer)
@@ -6,7 +6,9 @@ import socket
 import sys
 import time
 
+from server.grpc_server import GRPC_SERVER_MODE, GRPC_SERVER_MODES
 from server.mom_instance import MOMInstance
+from server.supervisor import MOM_WORKERS, Supervisor
 from server.master_node import MasterNode
 from utils.utils import find_free_port
 
@@ -45,6 +47,23 @@ def main():
         default=int(os.getenv("REDIS_PORT", 6379)),
         help="Redis port (default: from REDIS_PORT env var or 6379)"
     )
+    parser.add_argument(
+        "--storage-dir",
+        default=os.getenv("LOG_STORAGE_DIR", "data"),
+        help="Directory for topics using the node-local log storage engine (default: data)"
+    )
+    parser.add_argument(
+        "--server-mode",
+        choices=GRPC_SERVER_MODES,
+        default=GRPC_SERVER_MODE,
+        help="gRPC server implementation: thread pool or asyncio (default: from GRPC_SERVER_MODE or thread)"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=MOM_WORKERS,
+        help="Worker processes serving this node on the same port (default: from MOM_WORKERS or 1)"
+    )
     parser.add_argument(
         "--create-master-if-fails",
         action="store_true",
@@ -68,12 +87,25 @@ def main():
         port = find_free_port()
         print(f"🔌 Using dynamically assigned port: {port}")
     
+    instance_kwargs = dict(
+        instance_name=args.instance_name,
+        master_node_url=args.master_url,
+        grpc_port=port,
+        storage_dir=args.storage_dir,
+        server_mode=args.server_mode,
+        # Advertised in the node's membership lease
+        capacity=args.workers
+    )
+    if args.workers > 1:
+        # One logical node served by several processes on the same port
+        try:
+            Supervisor(args.workers, instance_kwargs).run()
+        except KeyboardInterrupt:
+            print("👋 Shutting down node...")
+        return
+
     try:
-        mom_instance = MOMInstance(
-            instance_name=args.instance_name,
-            master_node_url=args.master_url,
-            grpc_port=port
-        )
+        mom_instance = MOMInstance(**instance_kwargs)
         
         # Try to register with the master node
         try:
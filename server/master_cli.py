@@ -3,14 +3,15 @@
 import argparse
 import os
 import sys
-import redis
+
+from server.redis_pool import get_redis
 
 def check_master_node():
     """Check if a master node is running and display its information."""
     # Connect to Redis
     redis_host = os.getenv("REDIS_HOST", "localhost")
     redis_port = int(os.getenv("REDIS_PORT", 6379))
-    r = redis.Redis(host=redis_host, port=redis_port, decode_responses=True)
+    r = get_redis(redis_host, redis_port)
     
     # Check if master node is registered
     master_address = r.get("master_node")
@@ -28,16 +29,32 @@ def check_master_node():
     if public_address:
         print(f"🌐 Public address: {public_address}")
     print(f"💓 Heartbeat: {'✅ Active' if is_alive else '❌ Missing'}")
+
+    # Delayed delivery: how late due messages reached their partitions
+    delayed_stats = r.hgetall("delayed_delivery_stats")
+    moved = int(delayed_stats.get("moved", 0))
+    if moved:
+        avg_skew = int(delayed_stats.get("skew_total_ms", 0)) / moved
+        print(f"⏰ Delayed messages delivered: {moved} "
+              f"(avg skew {avg_skew:.1f} ms, last max {delayed_stats.get('last_skew_max_ms', 0)} ms)")
     
-    # Check registered instances
-    from server.state_manager import StateManager
-    state_manager = StateManager()
-    state = state_manager._load_state()
-    instances = state.get("mom_instances", {})
+    # Deleted topics whose data is still being freed
+    tombstones = sorted(r.smembers("topic_tombstones"))
+    if tombstones:
+        print(f"🗑️  Topics being deleted ({len(tombstones)}):")
+        for topic in tombstones:
+            tombstone = r.hgetall(f"tombstone:{topic}")
+            print(f"  - {topic}: {tombstone.get('state')} "
+                  f"({tombstone.get('reclaimed_partitions', 0)}/{tombstone.get('partitions', 0)} partitions, "
+                  f"{tombstone.get('keys_unlinked', 0)} keys freed)")
+    
+    # Live instances: the nodes currently holding a membership lease
+    from server.membership import ClusterMembership
+    instances = ClusterMembership(r).fetch()
     
     print(f"\n🖥️  Registered instances ({len(instances)}):")
-    for name, addr in instances.items():
-        print(f"  - {name}: {addr}")
+    for name, member in sorted(instances.items()):
+        print(f"  - {name}: {member['address']} (capacity {member['capacity']})")
     
     print("\n===== CONNECTION COMMAND =====")
     print(f"python -m mom_middleware join --master-url={public_address or master_address} --instance-name=my-node\n")
@@ -49,7 +66,7 @@ def clear_master_node():
     # Connect to Redis
     redis_host = os.getenv("REDIS_HOST", "localhost")
     redis_port = int(os.getenv("REDIS_PORT", 6379))
-    r = redis.Redis(host=redis_host, port=redis_port, decode_responses=True)
+    r = get_redis(redis_host, redis_port)
     
     # Delete all master node keys
     r.delete("master_node")
@@ -60,14 +77,91 @@ def clear_master_node():
     print("✅ Master node registration cleared.")
     return True
 
+def show_shards():
+    """Display the Redis shards and where each topic partition lives."""
+    from server.shard_map import ShardMap
+    redis_host = os.getenv("REDIS_HOST", "localhost")
+    redis_port = int(os.getenv("REDIS_PORT", 6379))
+    r = get_redis(redis_host, redis_port)
+    shard_map = ShardMap(r)
+
+    print("\n===== REDIS SHARDS =====")
+    for endpoint in shard_map.shards:
+        print(f"  - {endpoint}")
+
+    placements = shard_map.placements()
+    print(f"\n📦 Partition placement ({len(placements)}):")
+    for partition, endpoint in sorted(placements.items()):
+        print(f"  - {partition}: {endpoint}")
+    return True
+
+def migrate_partition(topic, partition, target, chunk_size):
+    """Move a topic partition to another Redis shard while it stays online."""
+    from server.shard_map import ShardMap
+    redis_host = os.getenv("REDIS_HOST", "localhost")
+    redis_port = int(os.getenv("REDIS_PORT", 6379))
+    r = get_redis(redis_host, redis_port)
+
+    if not topic or partition is None or not target:
+        print("❌ migrate requires --topic, --partition and --target")
+        return False
+
+    ShardMap(r).migrate_partition(topic, partition, target, chunk_size=chunk_size)
+    return True
+
+def export_topic(topic, path, fmt, workers, chunk_size):
+    """Stream every message of a topic to a directory of partition files."""
+    from server.global_topic import get_registry
+    from server.topic_transfer import export_topic as export_to
+
+    if not topic or not path:
+        print("❌ export requires --topic and --path")
+        return False
+    try:
+        export_to(get_registry(), topic, path, fmt, workers, chunk_size)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return False
+    return True
+
+def import_topic(topic, path, workers, chunk_size):
+    """Stream the messages of an export back into a topic."""
+    from server.global_topic import get_registry
+    from server.topic_transfer import import_topic as import_from
+
+    if not path:
+        print("❌ import requires --path")
+        return False
+    try:
+        import_from(get_registry(), path, topic, workers, chunk_size)
+    except (ValueError, RuntimeError) as e:
+        print(f"❌ {e}")
+        return False
+    return True
+
 def main():
     """Master node management CLI."""
     parser = argparse.ArgumentParser(description="MOM Master Node Management")
     parser.add_argument(
         "action",
-        choices=["status", "clear"],
-        help="Action to perform: status (check master status), clear (clear master registration)"
+        choices=["status", "clear", "shards", "migrate", "export", "import"],
+        help="Action to perform: status (check master status), clear (clear master registration), "
+             "shards (show partition placement), migrate (move a partition to another Redis shard), "
+             "export (copy a topic to files), import (load an export into a topic)"
+    )
+    parser.add_argument("--topic", help="Topic to migrate, export or import into (import defaults to the exported one)")
+    parser.add_argument("--partition", type=int, help="Partition number to migrate")
+    parser.add_argument("--target", help="Target Redis shard (host:port)")
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=500,
+        help="Messages moved per round trip during migration, export or import (default: 500)"
     )
+    parser.add_argument("--path", help="Directory holding the export (one file per partition and a manifest)")
+    parser.add_argument("--format", choices=["ndjson", "binary"], default="ndjson",
+                        help="Export file format (default: ndjson)")
+    parser.add_argument("--workers", type=int, default=4, help="Partitions exported or imported at once (default: 4)")
     
     args = parser.parse_args()
     
@@ -75,6 +169,16 @@ def main():
         check_master_node()
     elif args.action == "clear":
         clear_master_node()
+    elif args.action == "shards":
+        show_shards()
+    elif args.action == "migrate":
+        migrate_partition(args.topic, args.partition, args.target, args.chunk_size)
+    elif args.action == "export":
+        if not export_topic(args.topic, args.path, args.format, args.workers, args.chunk_size):
+            sys.exit(1)
+    elif args.action == "import":
+        if not import_topic(args.topic, args.path, args.workers, args.chunk_size):
+            sys.exit(1)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -2,43 +2,85 @@ import os
 import socket
 import sys
 import time
-from concurrent import futures
 
 import grpc
-import redis
 
-from server.global_topic import GlobalTopicRegistry
-from server.state_manager import StateManager
+from server import deadline, tracing
+from server.audit_log import AUDIT_LOG_MESSAGES, AuditLog
+from server.global_topic import get_registry
+from server.redis_pool import get_redis
+from server.consumer_group import ConsumerGroupCoordinator
+from server.segment_log import LOG_STORAGE_DIR, SegmentLogStorage
+from server.delayed_delivery import DelayedDeliveryMover
+from server.topic_reclaimer import TopicReclaimer
+from server.membership import MASTER_HEARTBEAT_TTL_MS, ClusterMembership
+from server.partition_leadership import PartitionLeadership
+from server.write_coalescer import WriteCoalescer
+from server.message_servicer import MessageServicer
 from server.mom_instance import MOMInstance
-from utils.utils import get_local_ip, get_public_ip, check_port_externally_accessible, find_free_port
+from server.grpc_server import GRPC_SERVER_MODE, create_server
+from utils.utils import decode_batch, get_local_ip, get_public_ip, check_port_externally_accessible, find_free_port
 sys.path.append(os.path.join(os.path.dirname(__file__), "grpc_generated"))
 from .grpc_generated import mom_pb2, mom_pb2_grpc
 
+# Messages of each partition a subscription to a log storage topic shows at most
+LOG_PEEK_MAX_MESSAGES = int(os.getenv("LOG_PEEK_MAX_MESSAGES", 10000))
 
-class MasterNode(mom_pb2_grpc.MasterServiceServicer, mom_pb2_grpc.MessageServiceServicer):
-    def __init__(self):
-        self.state_manager = StateManager()
-        self.mom_instances = self.state_manager._load_state().get("mom_instances", {})
+
+class MasterNode(mom_pb2_grpc.MasterServiceServicer, MessageServicer):
+    def __init__(self, registry=None):
+        self.registry = registry or get_registry()
+        self.state_manager = self.registry.state_manager
+        tracing.set_service_name("mom-master")
         self.current_instance = 0
         self.log_dir = "log"
         os.makedirs(self.log_dir, exist_ok=True)
+        # log_message events, and every message sent or received when AUDIT_LOG_MESSAGES is set
+        self.audit_log = AuditLog("global_log", self.log_dir)
+        self.audit_messages = AUDIT_LOG_MESSAGES
 
         # Redis setup
         self.redis_host = os.getenv("REDIS_HOST", "localhost")
         self.redis_port = int(os.getenv("REDIS_PORT", 6379))
-        self.redis = redis.Redis(
-            host=self.redis_host, port=self.redis_port, decode_responses=True
-        )
+        self.redis = get_redis(self.redis_host, self.redis_port)
+
+        # Nodes hold leases in Redis; dead nodes drop out when their lease expires
+        self.membership = ClusterMembership(self.redis)
+        self.leadership = PartitionLeadership(self.redis, self.membership)
+        self.membership.on_change(self._on_membership_change)
+        self.membership.watch()
+        # Concurrent writes to a partition share one pipelined RPUSH
+        self.writes = WriteCoalescer(self.registry.shards)
 
         self.public_address = None
-        self.registry = GlobalTopicRegistry(self.redis_host, self.redis_port)
+        # Set once this process registers as the master; only then does it send heartbeats
+        self.master_address = None
+        self.consumer_groups = ConsumerGroupCoordinator(self.registry.redis)
         self.grpc_port = None
         self.instance_name = "master-node"
-        
-        # Set auto_remove to True if you want it to automatically clean up dead nodes
-        self.start_health_check_thread(check_interval=60, auto_remove=True)
+        # Opened once this process registers as the master; REST and CLI processes send log topics to it
+        self.log_storage = None
+        self._master_channel = None
+        self._master_channel_address = None
         self.start_heartbeat_thread()
 
+        # Move delayed messages into their partitions once they are due; runs while this process is the master
+        self.delayed_mover = DelayedDeliveryMover(self.registry)
+
+        # Free the data of deleted topics without blocking Redis; runs while this process is the master
+        self.topic_reclaimer = TopicReclaimer(self.registry)
+
+    def _on_membership_change(self, joined, left):
+        """Move the partitions of instances that left the cluster to live ones."""
+        # Only the acting master does it; any process would reassign them on first use anyway
+        if left and self.master_address:
+            self.leadership.reassign_orphans(self.registry.list_topics())
+
+    @property
+    def mom_instances(self):
+        """Live MOM instances: {name: address}, from the membership leases."""
+        return self.membership.instances
+
     def register_master(self):
         """Register the master node in Redis and ensure no other masters exist."""
         master_key = "master_node"
@@ -49,23 +91,29 @@ class MasterNode(mom_pb2_grpc.MasterServiceServicer, mom_pb2_grpc.MessageService
         # Get local IP for internal communication
         local_ip = get_local_ip()
         grpc_port = find_free_port()
-        self.grpc_port = grpc_port
         
         # Get public IP for external machine connections
         public_ip = get_public_ip()
         
         # Store both addresses
         master_grpc_address = f"{local_ip}:{grpc_port}"
-        self.public_address = f"{public_ip}:{grpc_port}"
+        public_address = f"{public_ip}:{grpc_port}"
         
-        # Store in Redis for discovery
-        self.redis.set(master_key, master_grpc_address)
+        # Store in Redis for discovery; NX so two nodes promoting at once cannot both win
+        if not self.redis.set(master_key, master_grpc_address, nx=True):
+            print("[❌] Master node is already registered!")
+            return False, None, None
+        self.grpc_port = grpc_port
+        self.master_address = master_grpc_address
+        self.public_address = public_address
+        self.update_heartbeat()
+        self._open_log_storage()
+        self._start_master_tasks()
         self.redis.set("master_node_public", self.public_address)
         self.redis.set("master_node_port", grpc_port)
         
         # Register ourselves as the first MOM instance
-        self.mom_instances[self.instance_name] = master_grpc_address
-        self._save_state()
+        self.membership.join(self.instance_name, master_grpc_address)
         
         print(f"[✅] Master node registered at {local_ip}:{grpc_port}")
         print(f"[✅] Public address: {self.public_address}")
@@ -83,14 +131,82 @@ class MasterNode(mom_pb2_grpc.MasterServiceServicer, mom_pb2_grpc.MessageService
 
     def unregister_master(self):
         """Unregister the master node from Redis."""
-        self.redis.delete("master_node")
+        # A master that was already replaced must not unregister its successor
+        if self.master_address and self.redis.get("master_node") == self.master_address:
+            # Nodes watching these keys start the failover election right away
+            self.redis.delete("master_node", "master_node_heartbeat")
+        self.master_address = None
+        self._stop_master_tasks()
         print("[🧹] Master node unregistered.")
 
+    def _open_log_storage(self):
+        """Open the master's log storage; only the process registered as the master writes it."""
+        if self.log_storage is None:
+            self.log_storage = SegmentLogStorage(os.path.join(LOG_STORAGE_DIR, self.instance_name))
+            self.topic_reclaimer.log_storage = self.log_storage
+
+    def _master_stub(self):
+        """Return a MessageService stub to the acting master, reconnecting when it changes."""
+        address = self.get_master_address()
+        if address != self._master_channel_address:
+            self._master_channel = tracing.intercept_channel(grpc.insecure_channel(address))
+            self._master_channel_address = address
+        return mom_pb2_grpc.MessageServiceStub(self._master_channel)
+
+    def _log_owner_stub(self, topic_name):
+        """Return a stub to the acting master if this process does not own the master's log storage."""
+        if self.log_storage is not None or self.registry.get_topic_storage(topic_name) != "log":
+            return None
+        return self._master_stub()
+
+    def _receive_from_master(self, request):
+        """Run a ReceiveBatch on the acting master; it serves log topics from its own log storage."""
+        try:
+            response = self._master_stub().ReceiveBatch(request, timeout=deadline.timeout(30))
+        except grpc.RpcError as e:
+            if e.code() in (grpc.StatusCode.INVALID_ARGUMENT, grpc.StatusCode.FAILED_PRECONDITION):
+                raise ValueError(e.details())
+            raise Exception(f"Failed to receive from the master node: {e.details() or e.code()}")
+        return [message for batch in response.batches
+                for message in decode_batch(batch.payload, batch.compressed)]
+
+    def dequeue_log_message(self, topic_name, partitions):
+        """Take the first available message of a log storage topic from the given partitions."""
+        for partition in partitions:
+            messages = self._receive_from_master(mom_pb2.ReceiveBatchRequest(
+                topic=topic_name, partitions=[partition], max_messages=1))
+            if messages:
+                return messages[0]
+        return None
+
+    def peek_log_messages(self, topic_name, max_messages=LOG_PEEK_MAX_MESSAGES):
+        """Read the messages of a log storage topic not consumed yet, without consuming them."""
+        return self._receive_from_master(mom_pb2.ReceiveBatchRequest(
+            topic=topic_name, max_messages=max_messages, peek=True))
+
+    def _start_master_tasks(self):
+        """Start the background work only the acting master does."""
+        self.delayed_mover.start()
+        self.topic_reclaimer.start()
+
+    def _stop_master_tasks(self):
+        """Stop the acting master's background work once this process is no longer the master."""
+        self.delayed_mover.stop()
+        self.topic_reclaimer.stop()
+
     def update_heartbeat(self):
         """Update the master node heartbeat in Redis."""
+        if self.master_address is None:
+            return
         try:
+            if self.redis.get("master_node") != self.master_address:
+                # Another node took over (e.g. this process stalled for longer than the TTL)
+                print("[MasterNode] ⚠️ No longer the registered master, stopping heartbeats")
+                self.master_address = None
+                self._stop_master_tasks()
+                return
             # Use a Redis key with TTL for automatic expiration
-            self.redis.set("master_node_heartbeat", "alive", ex=10)  # 10 second TTL
+            self.redis.set("master_node_heartbeat", self.master_address, px=MASTER_HEARTBEAT_TTL_MS)
         except Exception as e:
             print(f"[MasterNode] Error updating heartbeat: {e}")
         
@@ -105,9 +221,10 @@ class MasterNode(mom_pb2_grpc.MasterServiceServicer, mom_pb2_grpc.MessageService
                     self.update_heartbeat()
                 except Exception as e:
                     print(f"[MasterNode] Error in heartbeat thread: {e}")
-                time.sleep(5)  # Update heartbeat every 5 seconds
+                # Several renewals per TTL, so one slow round trip does not trigger a failover
+                time.sleep(MASTER_HEARTBEAT_TTL_MS / 4000)
         
-        thread = threading.Thread(target=heartbeat_worker, daemon=True)
+        thread = threading.Thread(target=heartbeat_worker, name="master-heartbeat", daemon=True)
         thread.start()
         print(f"[MasterNode] Started master heartbeat thread")
 
@@ -133,21 +250,19 @@ class MasterNode(mom_pb2_grpc.MasterServiceServicer, mom_pb2_grpc.MessageService
             print(f"⚠️ Instance {instance_address} already exists.")
             return
 
-        self.mom_instances[node_name] = instance_address
-        print(
-            f"[✅] Instance {node_name} ({instance_address}) added to the cluster.")
-        self._save_state()
-
+        # The instance takes its membership lease once it registers with the master
         mom_instance = MOMInstance(node_name, self.get_master_address(), port)
         mom_instance.start_server()
+        print(
+            f"[✅] Instance {node_name} ({instance_address}) added to the cluster.")
 
     def remove_instance(self, node_name):
         """Remove a MOM instance from the cluster."""
-        if node_name in self.mom_instances:
-            removed_address = self.mom_instances.pop(node_name)
+        removed_address = self.mom_instances.get(node_name)
+        if self.membership.evict(node_name):
+            # A node that is still running joins again on its next lease renewal
             print(
                 f"Instance {node_name} ({removed_address}) removed from the cluster.")
-            self._save_state()
         else:
             print(f"Node {node_name} does not exist in the cluster.")
 
@@ -157,14 +272,14 @@ class MasterNode(mom_pb2_grpc.MasterServiceServicer, mom_pb2_grpc.MessageService
 
     def get_next_instance(self):
         """Get the next available MOM instance in round-robin order."""
-        if not self.mom_instances:
+        node_names, instances = self.membership.view
+        if not node_names:
             raise Exception("No MOM instances available")
 
-        node_names = list(self.mom_instances.keys())
-        instance_name = node_names[self.current_instance]
+        instance_name = node_names[self.current_instance % len(node_names)]
         self.current_instance = (self.current_instance + 1) % len(node_names)
 
-        hostname, port = self.mom_instances[instance_name].split(":")
+        hostname, port = instances[instance_name].rsplit(":", 1)
         if hostname == socket.gethostname():
             hostname = "127.0.0.1"
 
@@ -190,21 +305,16 @@ class MasterNode(mom_pb2_grpc.MasterServiceServicer, mom_pb2_grpc.MessageService
             
             instance_address = f"{hostname}:{port}"
             
-            # Verify if the instance is already registered
-            if instance_address in self.mom_instances.values():
-                print(f"[MasterNode] Instance already exists: {instance_address}")
-                return mom_pb2.MessageResponse(
-                    status="Error", 
-                    message=f"Instance already exists at {instance_address}"
-                )
-                
-            # Generate a unique node name if it already exists
-            if node_name in self.mom_instances:
-                node_name = f"{node_name}-{len(self.mom_instances) + 1}"
-                
-            # Register the new instance
-            self.mom_instances[node_name] = instance_address
-            self._save_state()
+            # Verify the address is not held by another instance
+            for name, address in self.mom_instances.items():
+                if address == instance_address and name != node_name:
+                    print(f"[MasterNode] Instance already exists: {instance_address}")
+                    return mom_pb2.MessageResponse(
+                        status="Error", 
+                        message=f"Instance already exists at {instance_address}"
+                    )
+
+            # The instance then holds its own lease; registering again (e.g. after a restart) replaces it
             print(f"[MasterNode] Registered new instance: {node_name} at {instance_address}")
             
             return mom_pb2.MessageResponse(
@@ -221,17 +331,14 @@ class MasterNode(mom_pb2_grpc.MasterServiceServicer, mom_pb2_grpc.MessageService
             )
 
     def log_message(self, topic, message, action):
-        """Log messages to a file."""
-        log_file = os.path.join(self.log_dir, "global_log.txt")
-        with open(log_file, "a") as f:
-            f.write(f"[{action}] Topic: {topic}, Message: {message}\n")
+        """Log messages to a file; the audit log writer appends them in the background."""
+        self.audit_log.log(action, topic, message)
 
-    def create_topic(self, topic_name, num_partitions):
+    def create_topic(self, topic_name, num_partitions, storage="redis"):
         """Create a new topic and broadcast to all MOM instances."""
         try:
             # Create locally first
-            registry = GlobalTopicRegistry()
-            registry.create_topic(topic_name, num_partitions)
+            self.registry.create_topic(topic_name, num_partitions, storage)
             
             # Notify all instances about the new topic
             for node_name, address in self.mom_instances.items():
@@ -241,7 +348,8 @@ class MasterNode(mom_pb2_grpc.MasterServiceServicer, mom_pb2_grpc.MessageService
                         response = stub.CreateTopic(
                             mom_pb2.TopicRequest(
                                 topic_name=topic_name, 
-                                partitions=num_partitions
+                                partitions=num_partitions,
+                                storage=storage
                             ))
                         print(f"[MasterNode] Topic {topic_name} created on {node_name}")
                 except Exception as e:
@@ -251,68 +359,14 @@ class MasterNode(mom_pb2_grpc.MasterServiceServicer, mom_pb2_grpc.MessageService
             print(f"Error creating topic: {e}")
             raise
 
-    def CreateTopic(self, request, context):
-        """Create a new topic with the specified number of partitions."""
-        try:
-            self.registry.create_topic(request.topic_name, request.partitions)
-            return mom_pb2.MessageResponse(
-                status="Success", 
-                message=f"Topic {request.topic_name} created with {request.partitions} partitions"
-            )
-        except Exception as e:
-            context.set_details(str(e))
-            context.set_code(grpc.StatusCode.INTERNAL)
-            return mom_pb2.MessageResponse(
-                status="Error", 
-                message=f"Failed to create topic: {str(e)}"
-            )
-            
-    def SendMessage(self, request, context):
-        """Send a message to the specified topic."""
-        print(f"[{self.instance_name}] Received message for topic '{request.topic}': {request.message}")
-        
-        # Check if topic exists, if not create it with default partitions
-        topic_exists = self.registry.redis.sismember("topics", request.topic)
-        if not topic_exists:
-            print(f"[{self.instance_name}] Topic '{request.topic}' doesn't exist, creating with default partitions")
-            self.registry.create_topic(request.topic, 3)  # Create with default 3 partitions
-        
-        self.registry.enqueue_message(request.topic, request.message)
-        return mom_pb2.MessageResponse(
-            status="Success", message="Message enqueued")
-
-    def ReceiveMessage(self, request, context):
-        """Receive a message from the specified topic."""
-        print(
-            f"[{self.instance_name}] Processing message for topic '{request.topic}'")
-        partition_count = self.registry.get_partition_count(request.topic)
-        message = None
-
-        if partition_count > 0:
-            for i in range(partition_count):
-                message = self.registry.dequeue_message(request.topic, i)
-                if message:
-                    break
-
-        if message:
-            return mom_pb2.MessageResponse(status="Success", message=message)
-        else:
-            return mom_pb2.MessageResponse(
-                status="Empty", message="No messages available"
-            )
-
-    def _save_state(self):
-        self.state_manager.update_state("mom_instances", self.mom_instances)
-
-    def start_grpc_server(self, ip_address, port):
+    def start_grpc_server(self, ip_address, port, server_mode=GRPC_SERVER_MODE):
         """Start the gRPC server for the Master Node."""
     
-        server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
-        mom_pb2_grpc.add_MasterServiceServicer_to_server(self, server)
-        mom_pb2_grpc.add_MessageServiceServicer_to_server(self, server)  # Register as MOM instance too
+        # Serves MasterService and, as a MOM instance too, MessageService
+        server = create_server(self, server_mode)
         server.add_insecure_port(f"0.0.0.0:{port}")  # For IPv4
         server.add_insecure_port(f"[::]:{port}")      # For IPv6
-        print(f"[MasterNode] gRPC server starting on port {port}...")
+        print(f"[MasterNode] gRPC server starting on port {port} ({server_mode} mode)...")
         server.start()
     
         # Verify that the server is actually listening on the port
@@ -372,63 +426,93 @@ class MasterNode(mom_pb2_grpc.MasterServiceServicer, mom_pb2_grpc.MessageService
         
         return False
 
-    def send_message_to_topic(self, topic_name, message):
+    def send_message_to_topic(self, topic_name, message, delay_ms=0, deliver_at=0, priority=0):
         """Send a message to a topic via the next available MOM instance, with failover."""
         print(f"[MasterNode] Requesting next available instance for topic '{topic_name}'...")
-        
-        if not self.mom_instances:
-            raise Exception("No MOM instances available")
-        
-        # Get a list of all instances to try
-        node_names = list(self.mom_instances.keys())
-        if not node_names:
-            raise Exception("No MOM instances available")
-        
-        # Start with the current instance pointer
-        start_idx = self.current_instance
-        tried_instances = 0
-        offline_instances = []
-        
-        while tried_instances < len(node_names):
-            # Get the next instance in round-robin order
-            instance_name = node_names[self.current_instance]
-            instance_address = self.mom_instances[instance_name]
-            
-            # Update round-robin pointer for next call
-            self.current_instance = (self.current_instance + 1) % len(node_names)
-            tried_instances += 1
-            
-            try:
-                print(f"[MasterNode] Trying to send message to instance {instance_name} at {instance_address}...")
-                with grpc.insecure_channel(instance_address, options=[
-                    ('grpc.keepalive_time_ms', 5000),
-                    ('grpc.keepalive_timeout_ms', 1000),
-                    ('grpc.max_reconnect_backoff_ms', 1000),
-                    ('grpc.enable_retries', 0),
-                    ('grpc.max_receive_message_length', 10 * 1024 * 1024),  # 10MB
-                ]) as channel:
-                    # Set a shorter timeout for quicker failover
-                    stub = mom_pb2_grpc.MessageServiceStub(channel)
-                    response = stub.SendMessage(
-                        mom_pb2.MessageRequest(topic=topic_name, message=message),
-                        timeout=3.0  # 3 second timeout
-                    )
-                    
+        with tracing.span("master.send_message_to_topic", topic=topic_name) as current:
+            request = mom_pb2.MessageRequest(
+                topic=topic_name, message=message, delay_ms=delay_ms or 0, deliver_at=deliver_at or 0,
+                priority=priority or 0)
+
+            if self.registry.get_topic_storage(topic_name) == "log":
+                # Log topics written here are kept by the acting master, where the REST API reads them
+                try:
+                    return self._master_stub().SendMessage(request, timeout=deadline.timeout(3.0))
+                except grpc.RpcError as e:
+                    if e.code() in (grpc.StatusCode.INVALID_ARGUMENT, grpc.StatusCode.FAILED_PRECONDITION):
+                        raise ValueError(e.details())
+                    raise Exception(f"Failed to send message to the master node: {e.details() or e.code()}")
+
+            # Snapshot of the live instances to try
+            node_names, instances = self.membership.view
+            if not node_names:
+                raise Exception("No MOM instances available")
+
+            # Start with the current instance pointer
+            start_idx = self.current_instance % len(node_names)
+            self.current_instance = (start_idx + 1) % len(node_names)
+            candidates = node_names[start_idx:] + node_names[:start_idx]
+
+            # Immediate messages to Redis topics go to the partition's owner first
+            with tracing.span("master.route"):
+                if not (delay_ms or deliver_at) and self.registry.redis.sismember("topics", topic_name) \
+                        and self.registry.get_topic_storage(topic_name) == "redis":
+                    partition_count = self.registry.get_partition_count(topic_name)
+                    if partition_count:
+                        request.partition = self.registry.choose_partition(message, partition_count)
+                        owner = self.leadership.owner(topic_name, request.partition)
+                        if owner in instances:
+                            candidates = (owner,) + tuple(name for name in candidates if name != owner)
+
+            offline_instances = []
+
+            for instance_name in candidates:
+                instance_address = instances[instance_name]
+                # Each attempt gets what is left of the request's budget, so failing over never outlasts it
+                attempt_timeout = deadline.timeout(3.0)
+
+                try:
+                    print(f"[MasterNode] Trying to send message to instance {instance_name} at {instance_address}...")
+                    with tracing.span("master.send_attempt", instance=instance_name,
+                                      attempt=len(offline_instances) + 1):
+                        with tracing.span("master.create_channel"):
+                            channel = grpc.insecure_channel(instance_address, options=[
+                                ('grpc.keepalive_time_ms', 5000),
+                                ('grpc.keepalive_timeout_ms', 1000),
+                                ('grpc.max_reconnect_backoff_ms', 1000),
+                                ('grpc.enable_retries', 0),
+                                ('grpc.max_receive_message_length', 10 * 1024 * 1024),  # 10MB
+                            ])
+                        with channel:
+                            # Set a shorter timeout for quicker failover
+                            stub = mom_pb2_grpc.MessageServiceStub(tracing.intercept_channel(channel))
+                            response = stub.SendMessage(request, timeout=attempt_timeout)
+
                     print(f"[MasterNode] Message sent successfully via {instance_name}")
+                    if current is not None:
+                        current.set_attribute("failovers", len(offline_instances))
                     return response
-                    
-            except Exception as e:
-                print(f"[MasterNode] Failed to send message to {instance_name}: {e}")
-                offline_instances.append(instance_name)
-                # Continue to the next instance
-        
-        # If we get here, all instances failed
-        if offline_instances:
-            print(f"[MasterNode] Warning: {len(offline_instances)} instances are unreachable and might need cleanup.")
-        
-        # Throw exception when all instances have failed
-        raise Exception(f"Failed to send message: All {len(node_names)} MOM instances are unreachable")
-    
+
+                except grpc.RpcError as e:
+                    # The instance answered but rejected the request: another one would too
+                    if e.code() in (grpc.StatusCode.INVALID_ARGUMENT, grpc.StatusCode.FAILED_PRECONDITION):
+                        raise ValueError(e.details())
+                    print(f"[MasterNode] Failed to send message to {instance_name}: {e}")
+                    offline_instances.append(instance_name)
+                except Exception as e:
+                    print(f"[MasterNode] Failed to send message to {instance_name}: {e}")
+                    offline_instances.append(instance_name)
+                    # Continue to the next instance
+
+            # If we get here, all instances failed
+            if offline_instances:
+                print(f"[MasterNode] Warning: {len(offline_instances)} instances are unreachable and might need cleanup.")
+
+            # Attempts cut short by the request's deadline are not an outage
+            deadline.check()
+            # Throw exception when all instances have failed
+            raise Exception(f"Failed to send message: All {len(node_names)} MOM instances are unreachable")
+
     def health_check_instances(self, auto_remove=False):
         """Periodically check if instances are still alive."""
         print(f"[MasterNode] Running health check on {len(self.mom_instances)} instances...")
@@ -476,7 +560,7 @@ class MasterNode(mom_pb2_grpc.MasterServiceServicer, mom_pb2_grpc.MessageService
                     print(f"[MasterNode] Error in health check: {e}")
                 time.sleep(check_interval)  # Run every check_interval seconds
         
-        thread = threading.Thread(target=health_check_worker, daemon=True)
+        thread = threading.Thread(target=health_check_worker, name="instance-health-check", daemon=True)
         thread.start()
         print(f"[MasterNode] Started instance health check thread (interval: {check_interval}s)")
 
@@ -3,6 +3,7 @@ import os
 import sys
 import time
 
+from server.grpc_server import GRPC_SERVER_MODE, GRPC_SERVER_MODES
 from server.master_node import MasterNode
 from utils.utils import find_free_port, get_local_ip, get_public_ip
 
@@ -26,6 +27,12 @@ def main():
         default=int(os.getenv("REDIS_PORT", 6379)),
         help="Redis port (default: from REDIS_PORT env var or 6379)"
     )
+    parser.add_argument(
+        "--server-mode",
+        choices=GRPC_SERVER_MODES,
+        default=GRPC_SERVER_MODE,
+        help="gRPC server implementation: thread pool or asyncio (default: from GRPC_SERVER_MODE or thread)"
+    )
     
     args = parser.parse_args()
     
@@ -46,7 +53,7 @@ def main():
             print(f"🌐 Public address: {master_node.public_address}")
             
             # Start the gRPC server (this blocks until interrupted)
-            master_node.start_grpc_server(ip, port)
+            master_node.start_grpc_server(ip, port, args.server_mode)
         else:
             print(f"❌ Failed to register master node (already exists)")
             sys.exit(1)
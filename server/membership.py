@@ -0,0 +1,197 @@
+import json
+import os
+import threading
+import time
+
+import dotenv
+
+dotenv.load_dotenv()
+
+# A node drops out of the cluster this long after its last lease renewal
+MEMBER_LEASE_MS = int(os.getenv("MEMBER_LEASE_MS", 10000))
+MEMBER_KEY_PREFIX = "member:"
+# The master is presumed dead this long after its last heartbeat
+MASTER_HEARTBEAT_TTL_MS = int(os.getenv("MASTER_HEARTBEAT_TTL_MS", 1000))
+
+
+def enable_keyspace_notifications(redis_client):
+    """Make Redis publish generic (del), string (set) and expiry keyspace events.
+
+    Returns False when the server does not allow CONFIG SET; callers then
+    have to rely on polling.
+    """
+    try:
+        current = redis_client.config_get("notify-keyspace-events").get("notify-keyspace-events", "")
+        wanted = set(current) | set("K$gx")
+        if "A" in current:
+            wanted -= set("$gx")
+        if set(current) != wanted:
+            redis_client.config_set("notify-keyspace-events", "".join(sorted(wanted)))
+        return True
+    except Exception as e:
+        print(f"[Membership] ⚠️ Could not enable keyspace notifications: {e}")
+        return False
+
+
+def keyspace_channel(redis_client, key):
+    """Pub/sub channel carrying the keyspace events of a key (or key pattern)."""
+    db = redis_client.connection_pool.connection_kwargs.get("db", 0)
+    return f"__keyspace@{db}__:{key}"
+
+
+class ClusterMembership:
+    """Cluster membership kept as per-node leases in Redis.
+
+    Every node owns a ``member:{name}`` key holding JSON ``{address, capacity,
+    version}`` with a TTL it keeps renewing, so a dead node disappears within
+    one lease period without anyone probing it. Watchers keep a local view up
+    to date from keyspace notifications, with a full resync every lease
+    period in case notifications are disabled or missed.
+    """
+
+    def __init__(self, redis_client, lease_ms=MEMBER_LEASE_MS):
+        self.redis = redis_client
+        self.lease_ms = lease_ms
+        self._leases = {}
+        self._lock = threading.Lock()
+        self._watcher = None
+        self._listeners = []
+        # Local view: name -> record, plus (member names, name -> address) derived from it
+        self.members = {}
+        self._view = ((), {})
+
+    @property
+    def view(self):
+        """(member names, {name: address}); replaced on change, never mutated, so no copy is needed."""
+        return self._view
+
+    @property
+    def instances(self):
+        return self._view[1]
+
+    def _key(self, name):
+        return f"{MEMBER_KEY_PREFIX}{name}"
+
+    def join(self, name, address, capacity=1):
+        """Take a lease for a node and keep renewing it in the background."""
+        record = json.dumps({
+            "address": address,
+            "capacity": capacity,
+            # Changes when the node restarts, so watchers can tell a new incarnation apart
+            "version": int(time.time() * 1000),
+        })
+        self.redis.set(self._key(name), record, px=self.lease_ms)
+        renewing = name in self._leases
+        self._leases[name] = record
+        if renewing:
+            return
+
+        def lease_worker():
+            while name in self._leases:
+                time.sleep(self.lease_ms / 3000)
+                record = self._leases.get(name)
+                if record is None:
+                    return
+                try:
+                    # PEXPIRE does not rewrite the record, so watchers only hear about real changes
+                    if not self.redis.pexpire(self._key(name), self.lease_ms):
+                        print(f"[Membership] Lease of {name} had expired, joining again")
+                        self.redis.set(self._key(name), record, px=self.lease_ms)
+                except Exception as e:
+                    print(f"[Membership] Error renewing the lease of {name}: {e}")
+
+        threading.Thread(target=lease_worker, name=f"member-lease-{name}", daemon=True).start()
+        print(f"[Membership] {name} joined the cluster at {address} (lease {self.lease_ms}ms)")
+
+    def leave(self, name):
+        """Stop renewing a node's lease and drop it right away."""
+        self._leases.pop(name, None)
+        self.redis.delete(self._key(name))
+
+    def evict(self, name):
+        """Drop a node's lease; a node that is still alive joins again on its next renewal."""
+        return bool(self.redis.delete(self._key(name)))
+
+    def fetch(self):
+        """Read every member record from Redis: {name: record}."""
+        names = [key[len(MEMBER_KEY_PREFIX):] for key in self.redis.scan_iter(f"{MEMBER_KEY_PREFIX}*", count=1000)]
+        records = self.redis.mget([self._key(name) for name in names]) if names else []
+        return {name: json.loads(record) for name, record in zip(names, records) if record}
+
+    def refresh(self):
+        """Replace the local view with the members currently holding a lease."""
+        self._set_members(self.fetch())
+
+    def on_change(self, callback):
+        """Call callback(joined, left), with sets of member names, whenever the local view changes."""
+        self._listeners.append(callback)
+
+    def _set_members(self, members):
+        with self._lock:
+            previous = self.members
+            self.members = members
+            instances = {name: record["address"] for name, record in sorted(members.items())}
+            self._view = (tuple(instances), instances)
+        joined = members.keys() - previous.keys()
+        left = previous.keys() - members.keys()
+        if joined or left:
+            for callback in self._listeners:
+                try:
+                    callback(joined, left)
+                except Exception as e:
+                    print(f"[Membership] Error in membership listener: {e}")
+
+    def _on_event(self, name, event):
+        if event == "set":
+            record = self.redis.get(self._key(name))
+            if record is None:
+                return
+            record = json.loads(record)
+            if self.members.get(name) == record:
+                return
+            print(f"[Membership] {name} is a member at {record['address']}")
+            members = dict(self.members)
+            members[name] = record
+            self._set_members(members)
+        elif event in ("expired", "del") and name in self.members:
+            print(f"[Membership] {name} left the cluster ({event})")
+            members = dict(self.members)
+            members.pop(name)
+            self._set_members(members)
+
+    def watch(self):
+        """Keep the local view of the cluster up to date in a background thread."""
+        if self._watcher is not None:
+            return
+        if not enable_keyspace_notifications(self.redis):
+            print(f"[Membership] Membership changes are picked up every {self.lease_ms}ms")
+        try:
+            self.refresh()
+        except Exception as e:
+            # The watcher thread resyncs once Redis answers again
+            print(f"[Membership] Error reading cluster membership: {e}")
+        pattern = keyspace_channel(self.redis, f"{MEMBER_KEY_PREFIX}*")
+        prefix_length = len(pattern) - 1
+
+        def watcher_worker():
+            while True:
+                pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+                try:
+                    pubsub.psubscribe(pattern)
+                    last_refresh = time.time()
+                    while True:
+                        message = pubsub.get_message(timeout=1.0)
+                        if message:
+                            self._on_event(message["channel"][prefix_length:], message["data"])
+                        if time.time() - last_refresh > self.lease_ms / 1000:
+                            self.refresh()
+                            last_refresh = time.time()
+                except Exception as e:
+                    print(f"[Membership] Error watching membership changes: {e}")
+                    time.sleep(1)
+                finally:
+                    pubsub.close()
+
+        self._watcher = threading.Thread(target=watcher_worker, name="membership-watcher", daemon=True)
+        self._watcher.start()
+        print(f"[Membership] Watching cluster membership ({len(self.members)} members)")
@@ -0,0 +1,372 @@
+import os
+import sys
+import time
+
+import grpc
+
+from utils.utils import decode_batch, encode_batch
+from server import deadline
+from server.global_topic import PRIORITY_MAX
+from server.grpc_server import RECEIVE_MAX_WAIT_MS, RECEIVE_POLL_INTERVAL_MS
+from server.profiling import run_profile
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "grpc_generated"))
+from .grpc_generated import mom_pb2, mom_pb2_grpc
+
+
+class MessageServicer(mom_pb2_grpc.MessageServiceServicer):
+    """MessageService RPCs served alike by MOM instances and the master node.
+
+    Subclasses provide registry, instance_name, log_storage, writes,
+    leadership, consumer_groups, audit_log and audit_messages.
+    """
+
+    def CreateTopic(self, request, context):
+        """Create a new topic with the specified number of partitions."""
+        try:
+            self.registry.create_topic(
+                request.topic_name, request.partitions, request.storage or "redis")
+            return mom_pb2.MessageResponse(
+                status="Success", 
+                message=f"Topic {request.topic_name} created with {request.partitions} partitions"
+            )
+        except ValueError as e:
+            context.set_details(str(e))
+            context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+            return mom_pb2.MessageResponse(status="Error", message=str(e))
+        except RuntimeError as e:
+            context.set_details(str(e))
+            context.set_code(grpc.StatusCode.FAILED_PRECONDITION)
+            return mom_pb2.MessageResponse(status="Error", message=str(e))
+        except Exception as e:
+            context.set_details(str(e))
+            context.set_code(grpc.StatusCode.INTERNAL)
+            return mom_pb2.MessageResponse(
+                status="Error", 
+                message=f"Failed to create topic: {str(e)}"
+            )
+            
+    def AlterTopic(self, request, context):
+        """Add partitions to an existing topic."""
+        if not self.registry.redis.sismember("topics", request.topic_name):
+            context.set_details(f"Topic '{request.topic_name}' does not exist")
+            context.set_code(grpc.StatusCode.NOT_FOUND)
+            return mom_pb2.MessageResponse(status="Error", message=f"Topic '{request.topic_name}' does not exist")
+        try:
+            previous = self.registry.alter_topic(request.topic_name, request.partitions)
+        except ValueError as e:
+            context.set_details(str(e))
+            context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+            return mom_pb2.MessageResponse(status="Error", message=str(e))
+        except RuntimeError as e:
+            context.set_details(str(e))
+            context.set_code(grpc.StatusCode.FAILED_PRECONDITION)
+            return mom_pb2.MessageResponse(status="Error", message=str(e))
+        except Exception as e:
+            context.set_details(str(e))
+            context.set_code(grpc.StatusCode.INTERNAL)
+            return mom_pb2.MessageResponse(status="Error", message=f"Failed to alter topic: {str(e)}")
+        return mom_pb2.MessageResponse(
+            status="Success",
+            message=f"Topic {request.topic_name} altered from {previous} to {request.partitions} partitions"
+        )
+
+    def Profile(self, request, context):
+        """Profile this process for a while: CPU samples, allocation growth or thread stacks."""
+        try:
+            output, data = run_profile(
+                request.kind, request.duration_ms, request.interval_ms, request.format, request.top)
+        except ValueError as e:
+            context.set_details(str(e))
+            context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+            return mom_pb2.ProfileResponse(status="Error", message=str(e))
+        except RuntimeError as e:
+            context.set_details(str(e))
+            context.set_code(grpc.StatusCode.FAILED_PRECONDITION)
+            return mom_pb2.ProfileResponse(status="Error", message=str(e))
+        return mom_pb2.ProfileResponse(
+            status="Success", message=f"{request.kind} profile of {self.instance_name}", format=output, data=data)
+
+    def _log_owner_stub(self, topic_name):
+        """Return a stub to the log storage owner if this node must forward the topic's RPCs."""
+        return None
+
+    def _forward(self, method, request, context, response_type=mom_pb2.MessageResponse):
+        """Relay an RPC to the log storage owner, passing its status through."""
+        try:
+            return method(request, timeout=deadline.timeout(30))
+        except grpc.RpcError as e:
+            context.set_details(e.details())
+            context.set_code(e.code())
+            return response_type(status="Error", message=e.details() or str(e.code()))
+
+    def SendMessage(self, request, context):
+        """Send a message to the specified topic."""
+        if not 0 <= request.priority <= PRIORITY_MAX:
+            context.set_details(f"Priority must be between 0 and {PRIORITY_MAX}")
+            context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+            return mom_pb2.MessageResponse(status="Error", message=f"Priority must be between 0 and {PRIORITY_MAX}")
+        print(f"[{self.instance_name}] Received message for topic '{request.topic}': {request.message}")
+        
+        log_owner = self._log_owner_stub(request.topic)
+        if log_owner:
+            return self._forward(log_owner.SendMessage, request, context)
+
+        # Check if topic exists, if not create it with default partitions
+        topic_exists = self.registry.redis.sismember("topics", request.topic)
+        if not topic_exists:
+            print(f"[{self.instance_name}] Topic '{request.topic}' doesn't exist, creating with default partitions")
+            try:
+                self.registry.create_topic(request.topic, 3)  # Create with default 3 partitions
+            except RuntimeError as e:
+                # The topic was deleted and is not reclaimed yet
+                context.set_details(str(e))
+                context.set_code(grpc.StatusCode.FAILED_PRECONDITION)
+                return mom_pb2.MessageResponse(status="Error", message=str(e))
+        
+        partition = None
+        partition_count = self.registry.get_partition_count(request.topic)
+        if request.HasField("partition"):
+            if not 0 <= request.partition < partition_count:
+                context.set_details(f"Topic '{request.topic}' has no partition {request.partition}")
+                context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+                return mom_pb2.MessageResponse(
+                    status="Error", message=f"Topic '{request.topic}' has no partition {request.partition}")
+            partition = request.partition
+        elif partition_count:
+            partition = request.partition = self.registry.choose_partition(request.message, partition_count)
+
+        deliver_at = request.deliver_at
+        if request.delay_ms > 0:
+            deliver_at = int(time.time() * 1000) + request.delay_ms
+        if deliver_at > time.time() * 1000:
+            if self.registry.get_topic_storage(request.topic) == "log":
+                context.set_details("Delayed delivery is not supported for log storage topics")
+                context.set_code(grpc.StatusCode.FAILED_PRECONDITION)
+                return mom_pb2.MessageResponse(
+                    status="Error", message="Delayed delivery is not supported for log storage topics")
+            if request.priority:
+                context.set_details("Delayed messages cannot have a priority")
+                context.set_code(grpc.StatusCode.FAILED_PRECONDITION)
+                return mom_pb2.MessageResponse(status="Error", message="Delayed messages cannot have a priority")
+            self.registry.schedule_message(request.topic, request.message, deliver_at, partition)
+            return mom_pb2.MessageResponse(
+                status="Success", message=f"Message scheduled for delivery at {deliver_at}")
+
+        if partition is not None and self.registry.get_topic_storage(request.topic) == "redis":
+            # Forward to the partition's owner unless this instance owns it
+            response = self.leadership.route(request, context, self.instance_name)
+            if response is not None:
+                return response
+
+        if request.priority and self.registry.get_topic_storage(request.topic) == "log":
+            context.set_details("Priorities are not supported for log storage topics")
+            context.set_code(grpc.StatusCode.FAILED_PRECONDITION)
+            return mom_pb2.MessageResponse(
+                status="Error", message="Priorities are not supported for log storage topics")
+        if not self._enqueue(request.topic, request.message, partition, request.priority):
+            return mom_pb2.MessageResponse(
+                status="Success", message="Message accepted; its write was still in progress")
+        return mom_pb2.MessageResponse(
+            status="Success", message="Message enqueued")
+
+    def SendBatch(self, request, context):
+        """Store a producer's batch of messages in one partition of a topic."""
+        log_owner = self._log_owner_stub(request.topic)
+        if log_owner:
+            return self._forward(log_owner.SendBatch, request, context, mom_pb2.BatchAck)
+
+        partition_count = self.registry.get_partition_count(request.topic)
+        if not partition_count:
+            context.set_details(f"Topic '{request.topic}' does not exist")
+            context.set_code(grpc.StatusCode.NOT_FOUND)
+            return mom_pb2.BatchAck(status="Error", message=f"Topic '{request.topic}' does not exist")
+        if not 0 <= request.partition < partition_count:
+            context.set_details(f"Topic '{request.topic}' has no partition {request.partition}")
+            context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+            return mom_pb2.BatchAck(
+                status="Error", message=f"Topic '{request.topic}' has no partition {request.partition}")
+        if not 0 <= request.priority <= PRIORITY_MAX:
+            context.set_details(f"Priority must be between 0 and {PRIORITY_MAX}")
+            context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+            return mom_pb2.BatchAck(status="Error", message=f"Priority must be between 0 and {PRIORITY_MAX}")
+        messages = decode_batch(request.payload, request.compressed)
+        if len(messages) != request.count:
+            context.set_details(f"Batch holds {len(messages)} messages, expected {request.count}")
+            context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+            return mom_pb2.BatchAck(status="Error", message="Message count does not match the payload")
+
+        if self.registry.get_topic_storage(request.topic) == "log":
+            if request.priority:
+                context.set_details("Priorities are not supported for log storage topics")
+                context.set_code(grpc.StatusCode.FAILED_PRECONDITION)
+                return mom_pb2.BatchAck(status="Error", message="Priorities are not supported for log storage topics")
+            self.log_storage.append(request.topic, request.partition, messages)
+            if self.audit_messages:
+                self.audit_log.log_many("SEND", request.topic, messages, request.partition)
+            return mom_pb2.BatchAck(status="Success", message=f"Stored {len(messages)} messages")
+
+        response = self.leadership.route(request, context, self.instance_name, "SendBatch", mom_pb2.BatchAck)
+        if response is not None:
+            return response
+        stored = self.registry.enqueue_batch(
+            request.topic, request.partition, messages, request.producer_id, request.sequence, request.priority)
+        if not stored:
+            return mom_pb2.BatchAck(status="Success", message="Batch was already stored", duplicate=True)
+        if self.audit_messages:
+            self.audit_log.log_many("SEND", request.topic, messages, request.partition)
+        return mom_pb2.BatchAck(status="Success", message=f"Stored {len(messages)} messages")
+
+    def _enqueue(self, topic_name, message, partition=None, priority=0):
+        """Store a message with the storage engine of its topic.
+
+        Returns False if the message was accepted but its coalesced write was
+        still in progress when the request ran out of time.
+        """
+        stored = True
+        if self.registry.get_topic_storage(topic_name) == "log":
+            if partition is None:
+                partition = self.registry.choose_partition(
+                    message, self.registry.get_partition_count(topic_name))
+            self.log_storage.append(topic_name, partition, [message])
+        elif partition is not None:
+            stored = self.writes.write(topic_name, partition, message, priority=priority)
+        else:
+            self.registry.enqueue_message(topic_name, message, partition, priority)
+        if self.audit_messages:
+            self.audit_log.log("SEND", topic_name, message, -1 if partition is None else partition)
+        return stored
+
+    def _dequeue(self, topic_name, partitions):
+        """Take the next message from the given partitions of a topic."""
+        message = None
+        if self.registry.get_topic_storage(topic_name) == "log":
+            for partition in partitions:
+                message = self.log_storage.pop(topic_name, partition)
+                if message is not None:
+                    break
+        else:
+            message = self.registry.dequeue_from_partitions(topic_name, partitions)
+        if message is not None and self.audit_messages:
+            self.audit_log.log("RECEIVE", topic_name, message)
+        return message
+
+    def ReceiveMessage(self, request, context):
+        """Receive a message from the specified topic."""
+        print(
+            f"[{self.instance_name}] Processing message for topic '{request.topic}'")
+        log_owner = self._log_owner_stub(request.topic)
+        if log_owner:
+            return self._forward(log_owner.ReceiveMessage, request, context)
+
+        # Partitions added by AlterTopic are only read once the older ones have drained
+        partition_count = self.registry.get_readable_partition_count(request.topic)
+        partitions = range(partition_count)
+
+        if request.group:
+            if not request.consumer_id:
+                context.set_details("consumer_id is required when reading through a group")
+                context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+                return mom_pb2.MessageResponse(
+                    status="Error", message="consumer_id is required when reading through a group")
+            # Only drain the partitions assigned to this consumer
+            partitions = self.consumer_groups.heartbeat(
+                request.topic, request.group, request.consumer_id, partition_count)
+
+        message = self._dequeue(request.topic, partitions)
+
+        if message:
+            return mom_pb2.MessageResponse(status="Success", message=message)
+        else:
+            return mom_pb2.MessageResponse(
+                status="Empty", message="No messages available"
+            )
+
+    def _dequeue_batch(self, topic_name, partitions, max_messages):
+        """Take up to max_messages from each of the given partitions: {partition: [messages]}."""
+        if self.registry.get_topic_storage(topic_name) != "log":
+            batches = self.registry.dequeue_batch(topic_name, partitions, max_messages)
+        else:
+            batches = {}
+            for partition in partitions:
+                messages = []
+                while len(messages) < max_messages:
+                    message = self.log_storage.pop(topic_name, partition)
+                    if message is None:
+                        break
+                    messages.append(message)
+                if messages:
+                    batches[partition] = messages
+        if self.audit_messages:
+            for partition, messages in batches.items():
+                self.audit_log.log_many("RECEIVE", topic_name, messages, partition)
+        return batches
+
+    def _peek_batch(self, topic_name, partitions, max_messages):
+        """Read up to max_messages from each of the given partitions without consuming them."""
+        if self.registry.get_topic_storage(topic_name) != "log":
+            return self.registry.peek_batch(topic_name, partitions, max_messages)
+        batches = {}
+        for partition in partitions:
+            messages = self.log_storage.peek(topic_name, partition, max_messages)
+            if messages:
+                batches[partition] = messages
+        return batches
+
+    def ReceiveBatch(self, request, context):
+        """Receive batches of messages from a topic's partitions, waiting up to max_wait_ms for any."""
+        log_owner = self._log_owner_stub(request.topic)
+        if log_owner:
+            return self._forward(log_owner.ReceiveBatch, request, context, mom_pb2.ReceiveBatchResponse)
+
+        partition_count = self.registry.get_readable_partition_count(request.topic)
+        assigned = list(range(partition_count))
+        if request.group:
+            if not request.consumer_id:
+                context.set_details("consumer_id is required when reading through a group")
+                context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+                return mom_pb2.ReceiveBatchResponse(
+                    status="Error", message="consumer_id is required when reading through a group")
+            assigned = self.consumer_groups.heartbeat(
+                request.topic, request.group, request.consumer_id, partition_count)
+        partitions = [p for p in request.partitions if p in assigned] if request.partitions else assigned
+        max_messages = max(1, request.max_messages)
+
+        # The wait never outlasts the caller's deadline
+        wait_until = time.time() + deadline.timeout(min(request.max_wait_ms, RECEIVE_MAX_WAIT_MS) / 1000)
+        while True:
+            if request.peek:
+                batches = self._peek_batch(request.topic, partitions, max_messages)
+            else:
+                batches = self._dequeue_batch(request.topic, partitions, max_messages)
+            remaining = wait_until - time.time()
+            if batches or remaining <= 0 or not context.is_active():
+                break
+            time.sleep(min(RECEIVE_POLL_INTERVAL_MS / 1000, remaining))
+
+        return mom_pb2.ReceiveBatchResponse(
+            status="Success" if batches else "Empty",
+            message=f"{sum(map(len, batches.values()))} messages" if batches else "No messages available",
+            batches=[mom_pb2.MessageBatch(topic=request.topic, partition=partition, count=len(messages),
+                                          payload=encode_batch(messages), compressed=True)
+                     for partition, messages in sorted(batches.items())],
+            assigned=assigned)
+
+    def GetTopicMetadata(self, request, context):
+        """Return the partitions of a topic and the instance owning writes to each."""
+        if not self.registry.redis.sismember("topics", request.topic):
+            context.set_details(f"Topic '{request.topic}' does not exist")
+            context.set_code(grpc.StatusCode.NOT_FOUND)
+            return mom_pb2.TopicMetadata(status="Error", message=f"Topic '{request.topic}' does not exist")
+
+        storage = self.registry.get_topic_storage(request.topic)
+        partition_count = self.registry.get_partition_count(request.topic)
+        if storage == "redis":
+            partitions = self.leadership.metadata(request.topic, partition_count)
+        else:
+            # Log storage partitions live on whichever node received the messages
+            partitions = [(partition, "", "") for partition in range(partition_count)]
+        return mom_pb2.TopicMetadata(
+            status="Success", topic=request.topic, storage=storage,
+            partitions=[mom_pb2.PartitionMetadata(partition=partition, leader=leader, address=address)
+                        for partition, leader, address in partitions])
@@ -1,37 +1,71 @@
+import itertools
 import os
 import socket
 import sys
 import time
-from concurrent import futures
 from .state_manager import StateManager
 import dotenv
 import grpc
 import requests
-import random
 
-from utils.utils import get_local_ip, get_public_ip, find_free_port
-from server.global_topic import GlobalTopicRegistry
+from utils.utils import get_local_ip, get_public_ip, find_free_port, encode_batch, decode_batch
+from server import tracing
+from server.audit_log import AUDIT_LOG_MESSAGES, AuditLog
+from server.global_topic import PRIORITY_MAX, get_registry, partition_key
+from server.redis_pool import get_redis
+from server.consumer_group import ConsumerGroupCoordinator
+from server.segment_log import LOG_STORAGE_DIR, SegmentLogStorage
+from server.grpc_server import GRPC_SERVER_MODE, create_server
+from server.message_servicer import MessageServicer
+from server.membership import MASTER_HEARTBEAT_TTL_MS, ClusterMembership, enable_keyspace_notifications, keyspace_channel
+from server.partition_leadership import PartitionLeadership
+from server.topic_reclaimer import TopicReclaimer
+from server.topic_stats import record_enqueued
+from server.write_coalescer import WriteCoalescer
 
 sys.path.append(os.path.join(os.path.dirname(__file__), "grpc_generated"))
 from .grpc_generated import mom_pb2, mom_pb2_grpc
 
-class MOMInstance(mom_pb2_grpc.MessageServiceServicer):
-    def __init__(self, instance_name, master_node_url=None, grpc_port=50051):
+REPLICATION_CHUNK_SIZE = int(os.getenv("REPLICATION_CHUNK_SIZE", 1000))
+
+
+class MOMInstance(MessageServicer):
+    def __init__(self, instance_name, master_node_url=None, grpc_port=50051, storage_dir=None, registry=None,
+                 server_mode=GRPC_SERVER_MODE, worker_id=None, log_owner=None, capacity=1):
         self.instance_name = instance_name
+        tracing.set_service_name("mom-instance")
         self.master_node_url = master_node_url  # This can be the public address for remote machines
         self.grpc_port = grpc_port
-        self.registry = GlobalTopicRegistry()
+        self.server_mode = server_mode  # "thread" or "aio" gRPC server
+        # Set when the node runs as several worker processes (see server/supervisor.py):
+        # worker 0 owns the node-local log storage and listens on log_owner for the others
+        self.worker_id = worker_id
+        self.log_owner = log_owner
+        self._log_owner_channel = None
+        self.registry = registry or get_registry()
+        self.consumer_groups = ConsumerGroupCoordinator(self.registry.redis)
+        # Node-local segment files for topics created with the "log" storage engine
+        self.log_storage = SegmentLogStorage(
+            os.path.join(storage_dir or LOG_STORAGE_DIR, instance_name))
         self.promoting_to_master = False
-        self.election_priority = random.random()  # Random priority for leader election
         
         # For connecting to Redis, use environment variables or defaults
         self.redis_host = os.getenv("REDIS_HOST", "localhost")
         self.redis_port = int(os.getenv("REDIS_PORT", 6379))
-        try:
-            import redis
-            self.redis = redis.Redis(host=self.redis_host, port=self.redis_port, decode_responses=True)
-        except Exception as e:
-            print(f"Failed to connect to Redis: {e}")
+        self.redis = get_redis(self.redis_host, self.redis_port)
+        # Worker processes serving this node, advertised in its membership lease
+        self.capacity = capacity
+        self.membership = ClusterMembership(self.redis)
+        # Each partition of a Redis topic is written by the one instance owning it
+        self.leadership = PartitionLeadership(self.redis, self.membership)
+        # Concurrent writes to a partition share one pipelined RPUSH
+        self.writes = WriteCoalescer(self.registry.shards)
+        # Every worker process of the node writes its own audit file
+        self.audit_messages = AUDIT_LOG_MESSAGES
+        self.audit_log = AuditLog(
+            f"audit_{instance_name}" + (f"-w{worker_id}" if worker_id is not None else ""))
+        # Removes this node's log partitions of deleted topics; the master frees the Redis data
+        self.topic_reclaimer = TopicReclaimer(self.registry, log_storage=self.log_storage, local_only=True)
 
     def get_master_address(self):
         """Get the master node address from the provided URL or from Redis."""
@@ -88,6 +122,8 @@ class MOMInstance(mom_pb2_grpc.MessageServiceServicer):
         
             if response.status == "Success":
                 print(f"[{self.instance_name}] Successfully registered with MasterNode.")
+                # Stay a member for as long as this node keeps renewing its lease
+                self.membership.join(self.instance_name, f"{hostname}:{self.grpc_port}", self.capacity)
                 
                 # Synchronize topic information with Redis
                 self._sync_topics_from_state_file()
@@ -108,248 +144,236 @@ class MOMInstance(mom_pb2_grpc.MessageServiceServicer):
             return False
 
     def _sync_topics_from_state_file(self):
-        """Load topics from state file and add them to Redis."""
+        """Load topics from state file and add the missing ones to Redis."""
         try:
             state_manager = StateManager()
-            state = state_manager._load_state()
-            
-            # Process each key that isn't 'mom_instances'
-            for topic_name, topic_info in state.items():
-                if topic_name != 'mom_instances' and isinstance(topic_info, dict) and 'partitions' in topic_info:
-                    partitions = topic_info['partitions']
-                    print(f"[{self.instance_name}] Syncing topic {topic_name} with {partitions} partitions")
-                    self.registry.create_topic(topic_name, partitions)
+            topics = state_manager.topics()
+            print(f"[{self.instance_name}] Syncing {len(topics)} topics from the state file")
+            # Verifies the catalog epoch first; existing topics and their messages are left alone
+            if state_manager.restore_state(self.registry.redis, self.registry.shards):
+                print(f"[{self.instance_name}] Rebuilt the topic catalog from the state file")
         except Exception as e:
             print(f"[{self.instance_name}] Error syncing topics: {e}")
 
-    def CreateTopic(self, request, context):
-        """Create a new topic with the specified number of partitions."""
-        try:
-            self.registry.create_topic(request.topic_name, request.partitions)
-            return mom_pb2.MessageResponse(
-                status="Success", 
-                message=f"Topic {request.topic_name} created with {request.partitions} partitions"
-            )
-        except Exception as e:
-            context.set_details(str(e))
-            context.set_code(grpc.StatusCode.INTERNAL)
-            return mom_pb2.MessageResponse(
-                status="Error", 
-                message=f"Failed to create topic: {str(e)}"
-            )
-            
-    def SendMessage(self, request, context):
-        """Send a message to the specified topic."""
-        print(f"[{self.instance_name}] Received message for topic '{request.topic}': {request.message}")
-        
-        # Check if topic exists, if not create it with default partitions
-        topic_exists = self.registry.redis.sismember("topics", request.topic)
-        if not topic_exists:
-            print(f"[{self.instance_name}] Topic '{request.topic}' doesn't exist, creating with default partitions")
-            self.registry.create_topic(request.topic, 3)  # Create with default 3 partitions
-        
-        self.registry.enqueue_message(request.topic, request.message)
-        return mom_pb2.MessageResponse(
-            status="Success", message="Message enqueued")
-
-    def ReceiveMessage(self, request, context):
-        """Receive a message from the specified topic."""
-        print(
-            f"[{self.instance_name}] Processing message for topic '{request.topic}'")
-        partition_count = self.registry.get_partition_count(request.topic)
-        message = None
-
-        if partition_count > 0:
-            for i in range(partition_count):
-                message = self.registry.dequeue_message(request.topic, i)
-                if message:
-                    break
-
-        if message:
-            return mom_pb2.MessageResponse(status="Success", message=message)
-        else:
-            return mom_pb2.MessageResponse(
-                status="Empty", message="No messages available"
-            )
-
-    def replicate_partition(self, topic_name, partition, target_instance):
-        partition_key = f"{topic_name}:partition{partition}"
-        messages = self.registry.redis.lrange(partition_key, 0, -1)
-        with grpc.insecure_channel(target_instance) as channel:
-            stub = mom_pb2_grpc.MessageServiceStub(channel)
-            for message in messages:
-                stub.SendMessage(
-                    mom_pb2.MessageRequest(
-                        topic=topic_name,
-                        message=message.decode()))
+    def _log_owner_stub(self, topic_name):
+        """Return a stub to the log storage owner if this worker must forward the topic's RPCs."""
+        if not self.worker_id or not self.log_owner:
+            return None
+        if self.registry.get_topic_storage(topic_name) != "log":
+            return None
+        if self._log_owner_channel is None:
+            self._log_owner_channel = tracing.intercept_channel(grpc.insecure_channel(self.log_owner))
+        return mom_pb2_grpc.MessageServiceStub(self._log_owner_channel)
+
+    def replicate_partition(self, topic_name, partition, target_instance,
+                            chunk_size=REPLICATION_CHUNK_SIZE, max_attempts=3):
+        """Stream a partition to another instance, resuming from its last checkpoint."""
+        for attempt in range(1, max_attempts + 1):
+            try:
+                with grpc.insecure_channel(target_instance, options=[
+                    ('grpc.max_send_message_length', 64 * 1024 * 1024),
+                ]) as channel:
+                    stub = mom_pb2_grpc.MessageServiceStub(channel)
+                    start_offset = stub.GetReplicationOffset(
+                        mom_pb2.ReplicationOffsetRequest(
+                            topic=topic_name, partition=partition, source=self.instance_name)
+                    ).next_offset
+                    print(f"[{self.instance_name}] Replicating {topic_name}[{partition}] to "
+                          f"{target_instance} from offset {start_offset}")
+
+                    ack = stub.ReplicatePartition(
+                        self._partition_chunks(topic_name, partition, start_offset, chunk_size))
+                    # An empty stream (target already caught up) acknowledges offset 0
+                    next_offset = max(ack.next_offset, start_offset)
+                    print(f"[{self.instance_name}] ✅ Replicated {topic_name}[{partition}] to "
+                          f"{target_instance} up to offset {next_offset}")
+                    return next_offset
+            except grpc.RpcError as e:
+                print(f"[{self.instance_name}] Replication attempt {attempt}/{max_attempts} "
+                      f"of {topic_name}[{partition}] failed: {e}")
+                time.sleep(attempt)
+
+        raise Exception(f"Failed to replicate {topic_name}[{partition}] to {target_instance}")
+
+    def _partition_chunks(self, topic_name, partition, offset, chunk_size):
+        """Yield a partition as compressed chunks, reading one chunk at a time.
+
+        Offsets of a Redis partition run through its lists in the order
+        consumers drain them: the migration source shard first, then most
+        urgent priority first. Each list is streamed up to the length it had
+        when the stream reached it.
+        """
+        if self.registry.get_topic_storage(topic_name) == "log":
+            while True:
+                # Retention may already have removed the oldest offsets
+                offset = max(offset, self.log_storage.partition(topic_name, partition).start_offset)
+                messages = self.log_storage.read(topic_name, partition, offset, chunk_size)
+                if not messages:
+                    return
+                yield mom_pb2.PartitionChunk(
+                    topic=topic_name, partition=partition, source=self.instance_name,
+                    start_offset=offset, count=len(messages), payload=encode_batch(messages))
+                offset += len(messages)
+
+        base = 0
+        for client in self.registry.shards.clients_for_read(topic_name, partition):
+            for priority in range(PRIORITY_MAX, -1, -1):
+                key = partition_key(topic_name, partition, priority)
+                length = client.llen(key)
+                index = max(offset - base, 0)
+                while index < length:
+                    messages = client.lrange(key, index, min(index + chunk_size, length) - 1)
+                    if not messages:
+                        break
+                    yield mom_pb2.PartitionChunk(
+                        topic=topic_name, partition=partition, source=self.instance_name,
+                        start_offset=base + index, count=len(messages), payload=encode_batch(messages),
+                        priority=priority)
+                    index += len(messages)
+                base += length
+
+    def _replication_checkpoint_key(self, topic_name, partition, source):
+        return f"replication:{topic_name}:{partition}:{source}"
+
+    def GetReplicationOffset(self, request, context):
+        """Return the offset a replication stream from request.source should resume from."""
+        checkpoint = self.registry.shards.client_for(request.topic, request.partition).get(
+            self._replication_checkpoint_key(request.topic, request.partition, request.source))
+        return mom_pb2.ReplicationAck(
+            status="Success", message="Replication checkpoint", next_offset=int(checkpoint or 0))
+
+    def ReplicatePartition(self, request_iterator, context):
+        """Apply a stream of partition chunks sent by replicate_partition."""
+        request_iterator = iter(request_iterator)
+        first_chunk = next(request_iterator, None)
+        if first_chunk is None:
+            return mom_pb2.ReplicationAck(status="Success", message="Applied 0 messages", next_offset=0)
+        request_iterator = itertools.chain([first_chunk], request_iterator)
+        log_owner = self._log_owner_stub(first_chunk.topic)
+        if log_owner:
+            return self._forward(log_owner.ReplicatePartition, request_iterator, context, mom_pb2.ReplicationAck)
+
+        next_offset = None
+        received = 0
+        for chunk in request_iterator:
+            if not self.registry.redis.sismember("topics", chunk.topic):
+                context.set_details(f"Topic '{chunk.topic}' does not exist")
+                context.set_code(grpc.StatusCode.NOT_FOUND)
+                return mom_pb2.ReplicationAck(status="Error", message=f"Topic '{chunk.topic}' does not exist")
+
+            partition_redis = self.registry.shards.client_for(chunk.topic, chunk.partition)
+            checkpoint_key = self._replication_checkpoint_key(chunk.topic, chunk.partition, chunk.source)
+            if next_offset is None:
+                next_offset = int(partition_redis.get(checkpoint_key) or 0)
+
+            # Skip whatever an interrupted stream already applied
+            skip = next_offset - chunk.start_offset
+            if skip < 0:
+                context.set_details(f"Missing offsets {next_offset}-{chunk.start_offset - 1}")
+                context.set_code(grpc.StatusCode.FAILED_PRECONDITION)
+                return mom_pb2.ReplicationAck(
+                    status="Error", message="Replication stream has a gap", next_offset=next_offset)
+            if skip >= chunk.count:
+                continue
+
+            if not 0 <= chunk.priority <= PRIORITY_MAX:
+                context.set_details(f"Priority must be between 0 and {PRIORITY_MAX}")
+                context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+                return mom_pb2.ReplicationAck(
+                    status="Error", message=f"Priority must be between 0 and {PRIORITY_MAX}", next_offset=next_offset)
+            messages = decode_batch(chunk.payload)[skip:]
+            end_offset = chunk.start_offset + chunk.count
+            if self.registry.get_topic_storage(chunk.topic) == "log":
+                self.log_storage.append(chunk.topic, chunk.partition, messages)
+                partition_redis.set(checkpoint_key, end_offset)
+            else:
+                # Messages, their counters and the checkpoint are applied atomically
+                pipe = partition_redis.pipeline(transaction=True)
+                pipe.rpush(partition_key(chunk.topic, chunk.partition, chunk.priority), *messages)
+                record_enqueued(pipe, chunk.topic, chunk.partition, messages)
+                pipe.set(checkpoint_key, end_offset)
+                pipe.execute()
+            next_offset = end_offset
+            received += len(messages)
+
+        print(f"[{self.instance_name}] Received {received} replicated messages, next offset {next_offset}")
+        return mom_pb2.ReplicationAck(
+            status="Success", message=f"Applied {received} messages", next_offset=next_offset or 0)
 
     def check_master_status(self):
-        """Check if the master node is alive."""
+        """Check if the master node is alive: its heartbeat lease has not expired."""
         try:
-            # First check if master node record exists at all
-            master_address = self.redis.get("master_node")
-            if not master_address:
-                print(f"[{self.instance_name}] ⚠️ Master node address not found in Redis")
-                return False
-            
-            # Then check heartbeat
-            heartbeat = self.redis.get("master_node_heartbeat")
-            if not heartbeat:
-                print(f"[{self.instance_name}] ⚠️ Master node heartbeat not found, checking connection...")
-                
-                # Double-check by trying to connect
-                try:
-                    with grpc.insecure_channel(master_address, options=[
-                        ('grpc.enable_retries', 0),
-                        ('grpc.max_reconnect_backoff_ms', 500),
-                        ('grpc.keepalive_timeout_ms', 1000),
-                    ]) as channel:
-                        # Set a very short timeout to quickly detect if server is down
-                        future = grpc.channel_ready_future(channel)
-                        future.result(timeout=1.0)  # 1 second timeout
-                        
-                        # If we get here, the server is actually responsive
-                        print(f"[{self.instance_name}] Master node is actually responsive despite missing heartbeat")
-                        return True
-                except Exception as e:
-                    print(f"[{self.instance_name}] ❌ Confirmed master node is down: {e}")
-                    return False
-            
-            # If we have both master record and heartbeat, the master is alive
-            return True
+            return bool(self.redis.exists("master_node_heartbeat"))
         except Exception as e:
             print(f"[{self.instance_name}] Error checking master status: {e}")
             return False
 
     def participate_in_leader_election(self):
-        """Attempt to become the new master node."""
-        # Use a Redis lock to ensure only one instance becomes master
-        import time
-        import uuid
-        
-        # Generate a unique ID for this election attempt
-        election_attempt_id = str(uuid.uuid4())
-        
-        # Use our election priority for an ordered election
-        priority_key = f"election:priority:{self.instance_name}"
+        """Attempt to become the new master node; the first node to take the election lock wins."""
         try:
-            # Set our priority in Redis (lower number = higher priority)
-            self.redis.set(priority_key, str(self.election_priority), ex=30)  # 30-second expiry
-            
-            # Wait for a random time between 1-3 seconds to avoid all nodes trying at once
-            delay = 1.0 + random.random() * 2.0
-            print(f"[{self.instance_name}] Waiting {delay:.2f}s before attempting leader election")
-            time.sleep(delay)
-            
-            # First verify that master node key is actually missing from Redis
-            if self.redis.exists("master_node"):
-                # Double check if it's really alive by trying to connect
-                master_address = self.redis.get("master_node")
-                if not master_address:
-                    # Master node key exists but is empty, proceed with election
-                    print(f"[{self.instance_name}] Master node key exists but is empty")
-                else:
-                    try:
-                        # Try to connect with a very short timeout
-                        with grpc.insecure_channel(master_address, options=[
-                            ('grpc.enable_retries', 0),
-                            ('grpc.max_reconnect_backoff_ms', 500),
-                            ('grpc.keepalive_timeout_ms', 1000),
-                        ]) as channel:
-                            future = grpc.channel_ready_future(channel)
-                            future.result(timeout=1.0)  # 1 second timeout
-                            
-                            # If we get here, the master is actually alive
-                            print(f"[{self.instance_name}] Master node is actually responsive, aborting election")
-                            return False
-                    except Exception as e:
-                        # Failed to connect, proceed with election despite key existing
-                        print(f"[{self.instance_name}] Master node key exists but connection failed: {e}")
-            
-            # Try to acquire the election lock
-            election_lock = self.redis.lock("master_node_election", timeout=30)
-            got_lock = False
-            
+            # register_master's NX claim is the real fence; a lock left by a crashed node expires quickly
+            election_lock = self.redis.lock("master_node_election", timeout=10)
+            if not election_lock.acquire(blocking=False):
+                print(f"[{self.instance_name}] Another node is already performing leader election")
+                return False
+
             try:
-                got_lock = election_lock.acquire(blocking=False)
-                if got_lock:
-                    print(f"[{self.instance_name}] Acquired election lock, checking if master still down...")
-                    
-                    # Double-check master node is actually gone from Redis
-                    if not self.redis.exists("master_node") or not self.check_master_status():
-                        print(f"[{self.instance_name}] 🏆 Confirmed master is down, promoting self to master")
-                        
-                        # Force clear all master registrations to avoid conflicts
-                        self.redis.delete("master_node")
-                        self.redis.delete("master_node_public")
-                        self.redis.delete("master_node_port")
-                        self.redis.delete("master_node_heartbeat")
-                        
-                        try:
-                            # Create a MasterNode instance and register it
-                            from server.master_node import MasterNode
-                            new_master = MasterNode()
-                            
-                            # Set the instance name to maintain identity
-                            new_master.instance_name = f"{self.instance_name}-master"
-                            
-                            # Register as the master node
-                            success, ip, port = new_master.register_master()
-                            
-                            if success:
-                                print(f"[{self.instance_name}] ✅ Successfully promoted to master node")
-                                
-                                # Transfer node's state to master node
-                                self.transfer_state_to_master(new_master)
-                                
-                                # Start the gRPC server for the master node (non-daemon thread)
-                                import threading
-                                thread = threading.Thread(
-                                    target=new_master.start_grpc_server,
-                                    args=(ip, port),
-                                    daemon=False  # Use non-daemon thread so it keeps running
-                                )
-                                thread.start()
-                                
-                                # Set a flag that we're now the master
-                                self.redis.set(f"node:{self.instance_name}:is_master", "true")
-                                print(f"[{self.instance_name}] 👑 Now operating as master node")
-                                
-                                return True
-                            else:
-                                print(f"[{self.instance_name}] ❌ Failed to register as master node")
-                        except Exception as e:
-                            print(f"[{self.instance_name}] Error during master promotion: {e}")
-                    else:
-                        print(f"[{self.instance_name}] Master node is back online, aborting election")
-                else:
-                    print(f"[{self.instance_name}] Another node is already performing leader election")
+                # The heartbeat may have come back while we were notified
+                if self.check_master_status():
+                    print(f"[{self.instance_name}] Master node is back online, aborting election")
+                    return False
+                print(f"[{self.instance_name}] 🏆 Confirmed master is down, promoting self to master")
+
+                # Clear the registration of the dead master
+                self.redis.delete("master_node", "master_node_public", "master_node_port")
+
+                # Create a MasterNode instance and register it
+                from server.master_node import MasterNode
+                new_master = MasterNode()
+
+                # Set the instance name to maintain identity
+                new_master.instance_name = f"{self.instance_name}-master"
+
+                # Register as the master node
+                success, ip, port = new_master.register_master()
+                if not success:
+                    print(f"[{self.instance_name}] ❌ Failed to register as master node")
+                    return False
+                print(f"[{self.instance_name}] ✅ Successfully promoted to master node")
+
+                # Transfer node's state to master node
+                self.transfer_state_to_master(new_master)
+
+                # Start the gRPC server for the master node (non-daemon thread)
+                import threading
+                thread = threading.Thread(
+                    target=new_master.start_grpc_server,
+                    args=(ip, port, self.server_mode),
+                    name="master-grpc-server",
+                    daemon=False  # Use non-daemon thread so it keeps running
+                )
+                thread.start()
+
+                # Set a flag that we're now the master
+                self.redis.set(f"node:{self.instance_name}:is_master", "true")
+                print(f"[{self.instance_name}] 👑 Now operating as master node")
+                return True
             finally:
-                # Always release the lock if we acquired it
-                if got_lock:
-                    try:
-                        election_lock.release()
-                        print(f"[{self.instance_name}] Released election lock")
-                    except Exception as e:
-                        print(f"[{self.instance_name}] Error releasing election lock: {e}")
+                try:
+                    election_lock.release()
+                    print(f"[{self.instance_name}] Released election lock")
+                except Exception as e:
+                    print(f"[{self.instance_name}] Error releasing election lock: {e}")
         except Exception as e:
             print(f"[{self.instance_name}] Error during leader election: {e}")
-        
+
         return False
 
     def transfer_state_to_master(self, new_master):
         """Transfer this node's state to the new master node."""
-        # First, make sure to read the latest state
-        state_manager = StateManager()
-        state = state_manager._load_state()
-        
-        # Transfer MOM instance registrations
-        for node_name, address in state.get("mom_instances", {}).items():
-            new_master.mom_instances[node_name] = address
-        
-        # Save state to file 
-        new_master._save_state()
-        
+        # Instances are not transferred: every node keeps renewing its own membership lease
+        # in Redis, and the new master watches those leases
+
         # Set in Redis that we're the elected master
         self.redis.set("elected_master", self.instance_name)
         self.redis.set("elected_master_time", time.time())
@@ -357,111 +381,91 @@ class MOMInstance(mom_pb2_grpc.MessageServiceServicer):
         print(f"[{self.instance_name}] ✅ Successfully transferred state to new master")
 
     def start_master_monitoring_thread(self):
-        """Start a background thread that monitors master health and triggers failover if needed."""
+        """Start a background thread that monitors master health and triggers failover if needed.
+
+        The thread reacts to the keyspace events of the master's heartbeat
+        lease expiring or its registration being deleted, and also checks the
+        heartbeat once per TTL in case notifications are unavailable.
+        """
         import threading
-        
+
+        channels = [keyspace_channel(self.redis, key) for key in ("master_node_heartbeat", "master_node")]
+
+        def master_lost(reason):
+            print(f"\n[{self.instance_name}] 🚨 MASTER NODE DOWN ({reason})! INITIATING LEADER ELECTION...\n")
+            self.promoting_to_master = True
+            if self.participate_in_leader_election():
+                print(f"\n[{self.instance_name}] 👑👑👑 NOW OPERATING AS MASTER NODE 👑👑👑")
+                return True
+            self.promoting_to_master = False
+            return False
+
         def monitoring_worker():
-            # Initial delay to allow system to stabilize
-            print(f"[{self.instance_name}] Starting master node monitoring (waiting for 15s)")
-            time.sleep(15)
-            
-            failures_count = 0
-            max_failures = 2  # Reduced to make failover faster
-            is_master_node = False
-            
-            while not is_master_node:
+            enable_keyspace_notifications(self.redis)
+            check_interval = MASTER_HEARTBEAT_TTL_MS / 1000
+            while True:
+                pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
                 try:
-                    # Skip checking if we're already promoting
-                    if hasattr(self, 'promoting_to_master') and self.promoting_to_master:
-                        time.sleep(5)
-                        continue
-                    
-                    # First, check if master node record exists in Redis at all
-                    master_exists = self.redis.exists("master_node")
-                    if not master_exists:
-                        print(f"\n[{self.instance_name}] 🔴 MASTER NODE EXPLICITLY UNREGISTERED: Record missing from Redis")
-                        print(f"[{self.instance_name}] 🚨 INITIATING IMMEDIATE FAILOVER")
-                        
-                        # Immediate failover when master is explicitly unregistered
-                        self.promoting_to_master = True
-                        success = self.participate_in_leader_election()
-                        
-                        if success:
-                            print(f"\n[{self.instance_name}] 👑👑👑 NOW OPERATING AS MASTER NODE 👑👑👑")
-                            is_master_node = True
-                            break  # Exit the monitoring loop - we're now the master
+                    pubsub.subscribe(*channels)
+                    last_check = time.time()
+                    while True:
+                        message = pubsub.get_message(timeout=check_interval)
+                        if message and message["data"] in ("expired", "del"):
+                            reason = f"{message['channel'].rsplit(':', 1)[1]} {message['data']}"
+                        elif time.time() - last_check >= check_interval:
+                            # Fallback for missed or disabled notifications: one EXISTS per TTL
+                            last_check = time.time()
+                            if self.check_master_status():
+                                continue
+                            reason = "heartbeat missing"
                         else:
-                            # Reset flag but continue monitoring
-                            self.promoting_to_master = False
-                            failures_count = 0
-                            time.sleep(3)  # Wait a bit before next check
                             continue
-                        
-                    # Otherwise check if master is alive via heartbeat/connection
-                    if not self.check_master_status():
-                        failures_count += 1
-                        print(f"\n[{self.instance_name}] 🚨 Master node appears to be down ({failures_count}/{max_failures})")
-                        
-                        if failures_count >= max_failures:
-                            print(f"\n[{self.instance_name}] 🚨 MASTER NODE DOWN! Confirmed after {failures_count} checks")
-                            print(f"[{self.instance_name}] 🚨 INITIATING LEADER ELECTION...\n")
-                            
-                            # Slight delay to prevent all nodes from trying simultaneously
-                            time.sleep(random.uniform(0.5, 2))
-                            
-                            # Try to become the new master
-                            self.promoting_to_master = True
-                            success = self.participate_in_leader_election()
-                            
-                            if success:
-                                print(f"\n[{self.instance_name}] 👑👑👑 NOW OPERATING AS MASTER NODE 👑👑👑")
-                                is_master_node = True
-                                break  # Exit the monitoring loop - we're now the master
-                            
-                            # Reset flag and counter regardless of result
-                            self.promoting_to_master = False
-                            failures_count = 0
-                    else:
-                        if failures_count > 0:
-                            print(f"[{self.instance_name}] Master node is responsive again, resetting failure count")
-                        failures_count = 0  # Reset counter if master is responsive
+                        if master_lost(reason):
+                            print(f"[{self.instance_name}] Master monitoring thread exiting - now operating as master")
+                            return
                 except Exception as e:
                     print(f"[{self.instance_name}] Error in master monitoring: {e}")
-                    failures_count = 0  # Reset on errors
-                
-                # Check every 5 seconds (reduced from 10 for faster detection)
-                time.sleep(5)
-            
-            # If we get here, we've become the master node
-            print(f"[{self.instance_name}] Master monitoring thread exiting - now operating as master")
-        
+                    time.sleep(1)
+                finally:
+                    pubsub.close()
+
         # Initialize flag and start monitoring thread
         self.promoting_to_master = False
-        thread = threading.Thread(target=monitoring_worker, daemon=True)
-        thread.daemon = True  # Make thread exit when main program exits
+        thread = threading.Thread(target=monitoring_worker, name="master-monitor", daemon=True)
         thread.start()
         print(f"[{self.instance_name}] Started master node monitoring thread")
 
     def start_server(self):
         """Start the gRPC server for this MOM instance."""
-        server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
-        mom_pb2_grpc.add_MessageServiceServicer_to_server(self, server)
+        # Writes are routed to partition owners among the live members
+        self.membership.watch()
+
+        # Worker processes of one node share the port; the kernel spreads connections among them
+        server = create_server(self, self.server_mode, options=[("grpc.so_reuseport", 1)])
         server.add_insecure_port(f"[::]:{self.grpc_port}")
+        if self.worker_id == 0 and self.log_owner:
+            server.add_insecure_port(self.log_owner)
         
         # Start the server BEFORE registering with master
         server.start()
-        print(f"[{self.instance_name}] gRPC server started on port {self.grpc_port}")
-        
-        # Now register with the master node
-        self.register_with_master_node()
-        print(f"[{self.instance_name}] Ready to process requests.")
+        print(f"[{self.instance_name}] gRPC server started on port {self.grpc_port} ({self.server_mode} mode)")
         
-        # Start monitoring master node health for potential failover
-        self.start_master_monitoring_thread()
+        if self.worker_id:
+            # The node is registered and monitored by worker 0 only
+            print(f"[{self.instance_name}] Worker {self.worker_id} ready to process requests.")
+        else:
+            # Now register with the master node
+            self.register_with_master_node()
+            print(f"[{self.instance_name}] Ready to process requests.")
+            
+            # Start monitoring master node health for potential failover
+            self.start_master_monitoring_thread()
+            # Only worker 0 writes the node's log storage
+            self.topic_reclaimer.start()
 
         # Make server non-blocking
         import threading
-        thread = threading.Thread(target=server.wait_for_termination)
+        thread = threading.Thread(target=server.wait_for_termination, name="grpc-server")
         thread.daemon = True
         thread.start()
         
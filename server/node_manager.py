@@ -7,6 +7,7 @@ from concurrent import futures
 import grpc
 import redis
 
+from server.audit_log import AuditLog
 from server.global_topic import GlobalTopicRegistry
 from server.state_manager import StateManager
 
@@ -20,6 +21,7 @@ class MasterNode(mom_pb2_grpc.MasterServiceServicer):
         self.current_instance = 0
         self.log_dir = "log"
         os.makedirs(self.log_dir, exist_ok=True)
+        self.audit_log = AuditLog("global_log", self.log_dir)
 
         # Redis setup
         self.redis_host = os.getenv("REDIS_HOST", "localhost")
@@ -141,10 +143,8 @@ class MasterNode(mom_pb2_grpc.MasterServiceServicer):
             return mom_pb2.InstanceResponse()
 
     def log_message(self, topic, message, action):
-        """Log messages to a file."""
-        log_file = os.path.join(self.log_dir, "global_log.txt")
-        with open(log_file, "a") as f:
-            f.write(f"[{action}] Topic: {topic}, Message: {message}\n")
+        """Log messages to a file; the audit log writer appends them in the background."""
+        self.audit_log.log(action, topic, message)
 
     def create_topic(self, topic_name, num_partitions):
         """Create a new topic in the global topic registry."""
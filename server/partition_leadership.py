@@ -0,0 +1,154 @@
+import hashlib
+import os
+import sys
+import threading
+import time
+
+import grpc
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "grpc_generated"))
+from .grpc_generated import mom_pb2, mom_pb2_grpc
+from . import deadline
+from .tracing import intercept_channel
+
+PARTITION_LEADERS_PREFIX = "partition_leaders:"
+# How long a process trusts its copy of a topic's leaders before reading them again
+LEADER_CACHE_MS = 1000
+# gRPC metadata marking a write another instance already routed: it is never forwarded again
+FORWARDED_METADATA = "x-mom-forwarded"
+
+
+def rendezvous_owner(topic_name, partition, names):
+    """Pick the owner of a partition among instance names by rendezvous hashing.
+
+    Every process picks the same owner from the same names, and removing an
+    instance only moves the partitions it owned.
+    """
+    if not names:
+        return None
+
+    def weight(name):
+        # Not stable_hash: CRC32 is linear and would order two names the same way for every partition
+        digest = hashlib.blake2b(f"{topic_name}:{partition}:{name}".encode("utf-8"), digest_size=8).digest()
+        return int.from_bytes(digest, "big")
+
+    return max(names, key=weight)
+
+
+class PartitionLeadership:
+    """Single-writer ownership of the partitions of Redis-backed topics.
+
+    ``partition_leaders:{topic}`` maps each partition to the live instance
+    that writes it. Partitions without an owner, or whose owner's membership
+    lease expired, are (re)assigned on first use by rendezvous hashing over the
+    live members; a check-and-set keeps concurrent assignments consistent.
+    The master also reassigns orphaned partitions as soon as a member leaves.
+    Log storage topics are node-local and are not routed.
+    """
+
+    def __init__(self, redis_client, membership):
+        self.redis = redis_client
+        self.membership = membership
+        # topic -> (fetched at, {partition: owner})
+        self._cache = {}
+        self._channels = {}
+        self._channels_lock = threading.Lock()
+
+    def _key(self, topic_name):
+        return f"{PARTITION_LEADERS_PREFIX}{topic_name}"
+
+    def leaders(self, topic_name):
+        """Return {partition: owner name} as last assigned for a topic."""
+        cached = self._cache.get(topic_name)
+        if cached and time.time() - cached[0] < LEADER_CACHE_MS / 1000:
+            return cached[1]
+        leaders = {int(p): owner for p, owner in self.redis.hgetall(self._key(topic_name)).items()}
+        self._cache[topic_name] = (time.time(), leaders)
+        return leaders
+
+    def cached_owner(self, topic_name, partition):
+        """Owner of a partition if it is cached and alive, without touching Redis (else None)."""
+        cached = self._cache.get(topic_name)
+        if not cached or time.time() - cached[0] >= LEADER_CACHE_MS / 1000:
+            return None
+        owner = cached[1].get(partition)
+        return owner if owner in self.membership.members else None
+
+    def owner(self, topic_name, partition):
+        """Name of the live instance owning a partition, assigning one if needed (None if none is live)."""
+        current = self.leaders(topic_name).get(partition)
+        if current in self.membership.members:
+            return current
+        return self._assign(topic_name, partition, current)
+
+    def _assign(self, topic_name, partition, stale_owner):
+        candidate = rendezvous_owner(topic_name, partition, self.membership.view[0])
+        if candidate is None:
+            return None
+        key = self._key(topic_name)
+
+        def claim(pipe):
+            current = pipe.hget(key, partition)
+            # Another process already replaced the stale owner with a live one
+            if current != stale_owner and current in self.membership.members:
+                return current
+            pipe.multi()
+            pipe.hset(key, partition, candidate)
+            return candidate
+
+        owner = self.redis.transaction(claim, key, value_from_callable=True)
+        self._cache.pop(topic_name, None)
+        if owner == candidate:
+            moved = f" from {stale_owner}" if stale_owner else ""
+            print(f"[Leadership] Partition {partition} of '{topic_name}' assigned to {owner}{moved}")
+        return owner
+
+    def reassign_orphans(self, topics):
+        """Move the partitions owned by instances that are no longer members."""
+        for topic_name in topics:
+            self._cache.pop(topic_name, None)
+            for partition, owner in self.leaders(topic_name).items():
+                if owner not in self.membership.members:
+                    self._assign(topic_name, partition, owner)
+
+    def metadata(self, topic_name, partition_count):
+        """Return [(partition, owner, address)] for every partition of a topic."""
+        instances = self.membership.instances
+        partitions = []
+        for partition in range(partition_count):
+            owner = self.owner(topic_name, partition)
+            partitions.append((partition, owner or "", instances.get(owner, "")))
+        return partitions
+
+    def _stub(self, address):
+        with self._channels_lock:
+            channel = self._channels.get(address)
+            if channel is None:
+                channel = self._channels[address] = intercept_channel(grpc.insecure_channel(address))
+        return mom_pb2_grpc.MessageServiceStub(channel)
+
+    def route(self, request, context, local_name, method="SendMessage", response_type=mom_pb2.MessageResponse):
+        """Forward a write RPC (SendMessage or SendBatch) to the owner of request.partition.
+
+        Returns the owner's response, or None when this instance should write
+        the message itself: it owns the partition, the request was already
+        forwarded, or the owner cannot be reached (a write on the wrong
+        instance is better than a lost one).
+        """
+        if any(key == FORWARDED_METADATA for key, _ in context.invocation_metadata()):
+            return None
+        owner = self.owner(request.topic, request.partition)
+        address = self.membership.instances.get(owner)
+        if owner in (None, local_name) or not address:
+            return None
+        try:
+            return getattr(self._stub(address), method)(
+                request, timeout=deadline.timeout(5), metadata=((FORWARDED_METADATA, "1"),))
+        except grpc.RpcError as e:
+            if e.code() in (grpc.StatusCode.UNAVAILABLE, grpc.StatusCode.DEADLINE_EXCEEDED):
+                print(f"[Leadership] ⚠️ Owner {owner} of '{request.topic}' partition {request.partition} "
+                      f"is unreachable, writing locally")
+                return None
+            context.set_details(e.details())
+            context.set_code(e.code())
+            return response_type(status="Error", message=e.details() or str(e.code()))
@@ -0,0 +1,160 @@
+import collections
+import marshal
+import os
+import sys
+import threading
+import time
+import traceback
+import tracemalloc
+
+import dotenv
+
+dotenv.load_dotenv()
+
+# Longest profile a caller may ask for, so a forgotten request cannot slow a node down for long
+PROFILE_MAX_DURATION_MS = int(os.getenv("PROFILE_MAX_DURATION_MS", 60000))
+PROFILE_DEFAULT_DURATION_MS = 5000
+PROFILE_DEFAULT_INTERVAL_MS = 5
+# Profiles the REST API runs or relays at the same time, across all nodes
+PROFILE_MAX_CONCURRENT = int(os.getenv("PROFILE_MAX_CONCURRENT", 2))
+# Frames kept per allocation while tracemalloc runs
+TRACEMALLOC_FRAMES = 25
+# "cpu": sampled stacks of every thread; "memory": tracemalloc snapshot diff; "threads": current stacks
+PROFILE_KINDS = ("cpu", "memory", "threads")
+# cpu profiles as collapsed stacks (flamegraph.pl, speedscope) or marshalled pstats (pstats, snakeviz)
+CPU_FORMATS = ("collapsed", "pstats")
+
+# One profile at a time per process
+_profile_lock = threading.Lock()
+
+
+def thread_stacks():
+    """Return the current stack of every thread of this process, most recent call last."""
+    frames = sys._current_frames()
+    lines = []
+    for thread in threading.enumerate():
+        lines.append(f'Thread "{thread.name}" (id {thread.ident}, {"daemon" if thread.daemon else "non-daemon"})')
+        frame = frames.get(thread.ident)
+        if frame is not None:
+            lines.extend(line.rstrip("\n") for line in traceback.format_stack(frame))
+        lines.append("")
+    return "\n".join(lines)
+
+
+def sample_stacks(duration_ms, interval_ms=PROFILE_DEFAULT_INTERVAL_MS):
+    """Sample the stacks of every other thread for duration_ms.
+
+    Returns {(thread name, frames): samples}; frames are (filename, first line,
+    function) tuples, outermost first. Sampling needs no tracing hooks, so the
+    profiled threads run at full speed.
+    """
+    sampler = threading.get_ident()
+    counts = collections.Counter()
+    end = time.monotonic() + duration_ms / 1000
+    while time.monotonic() < end:
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == sampler:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append((code.co_filename, code.co_firstlineno, code.co_name))
+                frame = frame.f_back
+            counts[(names.get(ident, str(ident)), tuple(reversed(stack)))] += 1
+        time.sleep(interval_ms / 1000)
+    return counts
+
+
+def collapsed_stacks(counts):
+    """Render samples as collapsed stacks: "thread;outer;...;inner count" per line."""
+    lines = []
+    for (thread_name, stack), samples in sorted(counts.items(), key=lambda item: -item[1]):
+        frames = [thread_name] + [f"{function} ({os.path.basename(filename)}:{line})"
+                                  for filename, line, function in stack]
+        lines.append(";".join(frame.replace(";", ":") for frame in frames) + f" {samples}")
+    return "\n".join(lines) + "\n"
+
+
+def pstats_dump(counts, interval_ms):
+    """Render samples as a marshalled pstats table, loadable with pstats.Stats(path).
+
+    Call counts are sample counts and times are estimated from the sampling interval.
+    """
+    interval = interval_ms / 1000
+    stats = {}
+    for (_, stack), samples in counts.items():
+        seen = set()
+        for depth, function in enumerate(stack):
+            entry = stats.setdefault(function, [0, 0, 0.0, 0.0, {}])
+            first = function not in seen
+            seen.add(function)
+            entry[1] += samples
+            if first:
+                entry[0] += samples
+                entry[3] += samples * interval
+            if depth == len(stack) - 1:
+                entry[2] += samples * interval
+            if depth:
+                caller = entry[4].setdefault(stack[depth - 1], [0, 0, 0.0, 0.0])
+                caller[0] += samples
+                caller[1] += samples
+                caller[3] += samples * interval
+                if depth == len(stack) - 1:
+                    caller[2] += samples * interval
+    return marshal.dumps({
+        function: (cc, nc, tt, ct, {caller: tuple(values) for caller, values in callers.items()})
+        for function, (cc, nc, tt, ct, callers) in stats.items()})
+
+
+def memory_diff(duration_ms, top=50):
+    """Return the allocations that grew most over duration_ms, with their tracebacks."""
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start(TRACEMALLOC_FRAMES)
+    try:
+        before = tracemalloc.take_snapshot()
+        time.sleep(duration_ms / 1000)
+        after = tracemalloc.take_snapshot()
+    finally:
+        if started:
+            tracemalloc.stop()
+    ignore = [tracemalloc.Filter(False, tracemalloc.__file__)]
+    diff = after.filter_traces(ignore).compare_to(before.filter_traces(ignore), "traceback")
+    lines = [f"Top {top} allocation changes over {duration_ms}ms"
+             + (" (tracing started with this profile)" if started else "")]
+    for stat in diff[:top]:
+        lines.append(f"{stat.size_diff / 1024:+.1f} KiB, {stat.count_diff:+d} blocks "
+                     f"(now {stat.size / 1024:.1f} KiB in {stat.count} blocks)")
+        lines.extend(f"    {line}" for line in stat.traceback.format())
+    return "\n".join(lines) + "\n"
+
+
+def run_profile(kind, duration_ms=0, interval_ms=0, output="", top=0):
+    """Profile this process; returns (format, data bytes).
+
+    Raises ValueError for an unknown kind or format and RuntimeError while
+    another profile of this process is running.
+    """
+    if kind == "threads":
+        return "text", thread_stacks().encode()
+    if kind not in PROFILE_KINDS:
+        raise ValueError(f"Unknown profile kind '{kind}'. Use one of: {', '.join(PROFILE_KINDS)}")
+    output = output or CPU_FORMATS[0]
+    if kind == "cpu" and output not in CPU_FORMATS:
+        raise ValueError(f"Unknown CPU profile format '{output}'. Use one of: {', '.join(CPU_FORMATS)}")
+    duration_ms = max(1, min(duration_ms or PROFILE_DEFAULT_DURATION_MS, PROFILE_MAX_DURATION_MS))
+    interval_ms = max(interval_ms or PROFILE_DEFAULT_INTERVAL_MS, 1)
+
+    if not _profile_lock.acquire(blocking=False):
+        raise RuntimeError("A profile of this process is already running")
+    try:
+        print(f"[Profiling] Running a {duration_ms}ms {kind} profile")
+        if kind == "memory":
+            return "text", memory_diff(duration_ms, top or 50).encode()
+        counts = sample_stacks(duration_ms, interval_ms)
+        if output == "pstats":
+            return "pstats", pstats_dump(counts, interval_ms)
+        return "collapsed", collapsed_stacks(counts).encode()
+    finally:
+        _profile_lock.release()
@@ -0,0 +1,111 @@
+import asyncio
+import os
+import threading
+
+import dotenv
+import redis
+import redis.asyncio
+from redis.connection import SENTINEL
+
+from . import deadline
+
+dotenv.load_dotenv()
+
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", 50))
+# Seconds to wait for a free connection once the pool is exhausted
+REDIS_POOL_TIMEOUT = float(os.getenv("REDIS_POOL_TIMEOUT", 5))
+REDIS_HEALTH_CHECK_INTERVAL = int(os.getenv("REDIS_HEALTH_CHECK_INTERVAL", 30))
+REDIS_SOCKET_TIMEOUT = float(os.getenv("REDIS_SOCKET_TIMEOUT", 5))
+REDIS_SOCKET_CONNECT_TIMEOUT = float(os.getenv("REDIS_SOCKET_CONNECT_TIMEOUT", 2))
+
+_pools = {}
+_pools_lock = threading.Lock()
+# asyncio pools are bound to the event loop they were created on
+_async_pools = {}
+
+
+class DeadlineConnection(redis.Connection):
+    """A connection whose replies are awaited no longer than the request being served has left.
+
+    Commands are not sent once the deadline passed; a reply cut short by it
+    drops the connection, as any read timeout does, and raises DeadlineExceeded.
+    """
+
+    def send_packed_command(self, command, check_health=True):
+        deadline.check()
+        super().send_packed_command(command, check_health)
+
+    def read_response(self, disable_decoding=False, *, timeout=SENTINEL, **kwargs):
+        current = deadline.current()
+        if current is None or timeout is not SENTINEL:
+            return super().read_response(disable_decoding, timeout=timeout, **kwargs)
+        left = current.remaining()
+        if self.socket_timeout is not None and left >= self.socket_timeout:
+            return super().read_response(disable_decoding, **kwargs)
+        if left <= 0:
+            # The command was sent: its reply would be read by the next user of the connection
+            self.disconnect()
+            current.check()
+        try:
+            return super().read_response(disable_decoding, timeout=left, **kwargs)
+        except redis.TimeoutError:
+            current.check()
+            raise
+
+
+def _endpoint(host=None, port=None):
+    # Read the environment at call time: the CLIs set REDIS_HOST/REDIS_PORT after import
+    return host or os.getenv("REDIS_HOST", "localhost"), int(port or os.getenv("REDIS_PORT", 6379))
+
+
+def get_redis_pool(host=None, port=None):
+    """Return the process-wide connection pool for a Redis endpoint."""
+    endpoint = _endpoint(host, port)
+    pool = _pools.get(endpoint)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(endpoint)
+            if pool is None:
+                pool = redis.BlockingConnectionPool(
+                    connection_class=DeadlineConnection,
+                    host=endpoint[0],
+                    port=endpoint[1],
+                    max_connections=REDIS_MAX_CONNECTIONS,
+                    timeout=REDIS_POOL_TIMEOUT,
+                    health_check_interval=REDIS_HEALTH_CHECK_INTERVAL,
+                    socket_timeout=REDIS_SOCKET_TIMEOUT,
+                    socket_connect_timeout=REDIS_SOCKET_CONNECT_TIMEOUT,
+                    socket_keepalive=True,
+                    decode_responses=True,
+                )
+                _pools[endpoint] = pool
+    return pool
+
+
+def get_redis(host=None, port=None):
+    """Return a Redis client backed by the shared pool of an endpoint.
+
+    Clients are cheap wrappers; every client for the same endpoint shares the
+    same bounded set of connections.
+    """
+    return redis.Redis(connection_pool=get_redis_pool(host, port))
+
+
+def get_async_redis(host=None, port=None):
+    """Return a redis.asyncio client backed by the shared pool of an endpoint on the running loop."""
+    key = (_endpoint(host, port), asyncio.get_running_loop())
+    pool = _async_pools.get(key)
+    if pool is None:
+        pool = redis.asyncio.BlockingConnectionPool(
+            host=key[0][0],
+            port=key[0][1],
+            max_connections=REDIS_MAX_CONNECTIONS,
+            timeout=REDIS_POOL_TIMEOUT,
+            health_check_interval=REDIS_HEALTH_CHECK_INTERVAL,
+            socket_timeout=REDIS_SOCKET_TIMEOUT,
+            socket_connect_timeout=REDIS_SOCKET_CONNECT_TIMEOUT,
+            socket_keepalive=True,
+            decode_responses=True,
+        )
+        _async_pools[key] = pool
+    return redis.asyncio.Redis(connection_pool=pool)
@@ -0,0 +1,368 @@
+import bisect
+import mmap
+import os
+import shutil
+import struct
+import threading
+import time
+from array import array
+from urllib.parse import quote, unquote
+
+import dotenv
+
+dotenv.load_dotenv()
+
+LOG_STORAGE_DIR = os.getenv("LOG_STORAGE_DIR", "data")
+LOG_SEGMENT_BYTES = int(os.getenv("LOG_SEGMENT_BYTES", 64 * 1024 * 1024))
+LOG_RETENTION_MS = int(os.getenv("LOG_RETENTION_MS", 7 * 24 * 3600 * 1000))
+LOG_RETENTION_BYTES = int(os.getenv("LOG_RETENTION_BYTES", 0))  # 0 = no size limit
+# 0 = group-commit fsync before acknowledging every append, >0 = fsync in the background
+LOG_FSYNC_INTERVAL_MS = int(os.getenv("LOG_FSYNC_INTERVAL_MS", 0))
+
+_RECORD_HEADER = struct.Struct(">I")
+# Tail reads beyond the mapped region use pread until this much new data justifies a remap
+_REMAP_THRESHOLD = 1024 * 1024
+
+
+def _write_all(fd, data):
+    view = memoryview(data)
+    while view:
+        written = os.write(fd, view)
+        view = view[written:]
+
+
+class Segment:
+    """One append-only ``.log`` file plus its ``.index`` of record positions."""
+
+    def __init__(self, directory, base_offset):
+        self.base_offset = base_offset
+        self.log_path = os.path.join(directory, f"{base_offset:020d}.log")
+        self.index_path = os.path.join(directory, f"{base_offset:020d}.index")
+        self.log_fd = os.open(self.log_path, os.O_RDWR | os.O_CREAT | os.O_APPEND, 0o644)
+        self.index_fd = os.open(self.index_path, os.O_RDWR | os.O_CREAT | os.O_APPEND, 0o644)
+
+        self.positions = array("I")
+        with open(self.index_path, "rb") as f:
+            data = f.read()
+        self.positions.frombytes(data[:len(data) - len(data) % self.positions.itemsize])
+        self.size = os.fstat(self.log_fd).st_size
+        self._recover()
+
+        self._mmap = None
+        self._mapped_size = 0
+
+    def _recover(self):
+        """Drop a record torn by a crash between the log and the index write."""
+        while self.positions and self.positions[-1] + _RECORD_HEADER.size > self.size:
+            self.positions.pop()
+        end = 0
+        if self.positions:
+            last = self.positions[-1]
+            header = os.pread(self.log_fd, _RECORD_HEADER.size, last)
+            end = last + _RECORD_HEADER.size + _RECORD_HEADER.unpack(header)[0]
+            if end > self.size:
+                self.positions.pop()
+                end = last
+        if end != self.size:
+            os.ftruncate(self.log_fd, end)
+            self.size = end
+        os.ftruncate(self.index_fd, len(self.positions) * self.positions.itemsize)
+
+    @property
+    def next_offset(self):
+        return self.base_offset + len(self.positions)
+
+    def append(self, payloads):
+        """Append encoded records; the data reaches the page cache, not the disk."""
+        records = bytearray()
+        positions = array("I")
+        position = self.size
+        for payload in payloads:
+            positions.append(position)
+            records += _RECORD_HEADER.pack(len(payload))
+            records += payload
+            position += _RECORD_HEADER.size + len(payload)
+
+        # The index is written last so a torn record is never indexed
+        _write_all(self.log_fd, records)
+        _write_all(self.index_fd, positions.tobytes())
+        self.positions.extend(positions)
+        self.size = position
+
+    def read(self, offset):
+        """Read one record, through a memory map of the segment where possible."""
+        index = offset - self.base_offset
+        start = self.positions[index] + _RECORD_HEADER.size
+        end = self.positions[index + 1] if index + 1 < len(self.positions) else self.size
+        if self._mapped_size < end and self.size - self._mapped_size >= _REMAP_THRESHOLD:
+            self._remap()
+        if end <= self._mapped_size:
+            return self._mmap[start:end]
+        # Freshly appended tail of the active segment
+        return os.pread(self.log_fd, end - start, start)
+
+    def _remap(self):
+        if self._mmap is not None:
+            self._mmap.close()
+        self._mmap = mmap.mmap(self.log_fd, self.size, access=mmap.ACCESS_READ)
+        self._mapped_size = self.size
+
+    def sync(self):
+        os.fsync(self.log_fd)
+        os.fsync(self.index_fd)
+
+    def close(self):
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        os.close(self.log_fd)
+        os.close(self.index_fd)
+
+    def delete(self):
+        self.close()
+        os.remove(self.log_path)
+        os.remove(self.index_path)
+
+
+class PartitionLog:
+    """A partition stored as a sequence of segments with a single consume offset."""
+
+    def __init__(self, directory, segment_bytes=LOG_SEGMENT_BYTES):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        os.makedirs(directory, exist_ok=True)
+
+        bases = sorted(int(name[:-4]) for name in os.listdir(directory) if name.endswith(".log"))
+        self.segments = [Segment(directory, base) for base in bases] or [Segment(directory, 0)]
+        self.lock = threading.Lock()
+
+        self._offset_path = os.path.join(directory, "consumer.offset")
+        self.consume_offset = self.start_offset
+        if os.path.exists(self._offset_path):
+            with open(self._offset_path) as f:
+                self.consume_offset = max(int(f.read() or 0), self.start_offset)
+        self._committed_consume_offset = self.consume_offset
+
+        # Group commit state: one appender fsyncs on behalf of everyone waiting
+        self._sync_cond = threading.Condition()
+        self._syncing = False
+        self._durable_offset = self.end_offset
+
+    @property
+    def start_offset(self):
+        return self.segments[0].base_offset
+
+    @property
+    def end_offset(self):
+        return self.segments[-1].next_offset
+
+    @property
+    def size(self):
+        return sum(segment.size for segment in self.segments)
+
+    def append(self, payloads):
+        """Append records and return the offset following the last one."""
+        with self.lock:
+            if self.segments[-1].size >= self.segment_bytes:
+                self._roll()
+            self.segments[-1].append(payloads)
+            return self.end_offset
+
+    def _roll(self):
+        active = self.segments[-1]
+        active.sync()
+        self.segments.append(Segment(self.directory, active.next_offset))
+
+    def wait_durable(self, offset):
+        """Block until every record before ``offset`` has been fsynced."""
+        with self._sync_cond:
+            while self._durable_offset < offset:
+                if self._syncing:
+                    self._sync_cond.wait()
+                    continue
+                self._syncing = True
+                with self.lock:
+                    target = self.end_offset
+                    segment = self.segments[-1]
+                self._sync_cond.release()
+                try:
+                    segment.sync()
+                finally:
+                    self._sync_cond.acquire()
+                    self._syncing = False
+                    self._sync_cond.notify_all()
+                self._durable_offset = max(self._durable_offset, target)
+
+    def read(self, offset):
+        """Read the record at ``offset``, or None if it is out of range."""
+        with self.lock:
+            return self._read(offset)
+
+    def _read(self, offset):
+        if offset < self.start_offset or offset >= self.end_offset:
+            return None
+        index = bisect.bisect_right([s.base_offset for s in self.segments], offset) - 1
+        return self.segments[index].read(offset)
+
+    def pop(self):
+        """Return the record at the consume offset and advance past it."""
+        with self.lock:
+            self.consume_offset = max(self.consume_offset, self.start_offset)
+            if self.consume_offset >= self.end_offset:
+                return None
+            record = self._read(self.consume_offset)
+            self.consume_offset += 1
+            return record
+
+    def backlog(self):
+        with self.lock:
+            return self.end_offset - max(self.consume_offset, self.start_offset)
+
+    def commit_consume_offset(self):
+        """Persist the consume offset; after a crash consumption resumes from here."""
+        offset = self.consume_offset
+        if offset == self._committed_consume_offset:
+            return
+        tmp_path = f"{self._offset_path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(str(offset))
+        os.replace(tmp_path, self._offset_path)
+        self._committed_consume_offset = offset
+
+    def enforce_retention(self, retention_ms, retention_bytes):
+        """Delete whole segments that are too old or exceed the size budget."""
+        deleted = 0
+        now = time.time()
+        with self.lock:
+            # The active segment is never deleted
+            while len(self.segments) > 1:
+                oldest = self.segments[0]
+                expired = now - os.path.getmtime(oldest.log_path) > retention_ms / 1000
+                oversized = retention_bytes and self.size > retention_bytes
+                if not (expired or oversized):
+                    break
+                oldest.delete()
+                self.segments.pop(0)
+                deleted += 1
+        return deleted
+
+    def sync(self):
+        with self.lock:
+            segment = self.segments[-1]
+        segment.sync()
+
+    def close(self):
+        with self.lock:
+            self.commit_consume_offset()
+            for segment in self.segments:
+                segment.close()
+
+
+class SegmentLogStorage:
+    """Node-local storage engine that keeps each topic partition in segment files."""
+
+    def __init__(self, directory=LOG_STORAGE_DIR, segment_bytes=LOG_SEGMENT_BYTES,
+                 retention_ms=LOG_RETENTION_MS, retention_bytes=LOG_RETENTION_BYTES,
+                 fsync_interval_ms=LOG_FSYNC_INTERVAL_MS):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.retention_ms = retention_ms
+        self.retention_bytes = retention_bytes
+        self.fsync_interval_ms = fsync_interval_ms
+        self._partitions = {}
+        self._lock = threading.Lock()
+        self._maintenance_thread = None
+
+    def _partition_dir(self, topic_name, partition):
+        return os.path.join(self.directory, quote(topic_name, safe=""), str(partition))
+
+    def partition(self, topic_name, partition):
+        """Return the log of a partition, opening it on first use."""
+        key = (topic_name, int(partition))
+        log = self._partitions.get(key)
+        if log is None:
+            with self._lock:
+                log = self._partitions.get(key)
+                if log is None:
+                    log = PartitionLog(self._partition_dir(topic_name, partition), self.segment_bytes)
+                    self._partitions[key] = log
+                    self._start_maintenance_thread()
+        return log
+
+    def append(self, topic_name, partition, messages):
+        """Append messages to a partition; returns once they are durable."""
+        log = self.partition(topic_name, partition)
+        end_offset = log.append([message.encode("utf-8") for message in messages])
+        if not self.fsync_interval_ms:
+            log.wait_durable(end_offset)
+        return end_offset
+
+    def pop(self, topic_name, partition):
+        """Consume the next message of a partition."""
+        record = self.partition(topic_name, partition).pop()
+        return record.decode("utf-8") if record is not None else None
+
+    def read(self, topic_name, partition, offset, max_messages):
+        """Read up to ``max_messages`` messages starting at ``offset`` without consuming them."""
+        log = self.partition(topic_name, partition)
+        messages = []
+        for current in range(max(offset, log.start_offset), log.end_offset):
+            if len(messages) >= max_messages:
+                break
+            messages.append(log.read(current).decode("utf-8"))
+        return messages
+
+    def peek(self, topic_name, partition, max_messages):
+        """Read up to ``max_messages`` messages not consumed yet, without consuming them."""
+        log = self.partition(topic_name, partition)
+        return self.read(topic_name, partition, log.consume_offset, max_messages)
+
+    def backlog(self, topic_name, partition):
+        return self.partition(topic_name, partition).backlog()
+
+    def topics(self):
+        """Return the topics with partitions on disk or open in this process."""
+        names = {topic_name for topic_name, _ in list(self._partitions)}
+        if os.path.isdir(self.directory):
+            names.update(unquote(entry.name) for entry in os.scandir(self.directory) if entry.is_dir())
+        return names
+
+    def delete_topic(self, topic_name):
+        """Close and remove every partition of a topic."""
+        with self._lock:
+            keys = [key for key in self._partitions if key[0] == topic_name]
+            logs = [self._partitions.pop(key) for key in keys]
+        for log in logs:
+            with log.lock:
+                for segment in log.segments:
+                    segment.delete()
+        topic_dir = os.path.join(self.directory, quote(topic_name, safe=""))
+        if os.path.isdir(topic_dir):
+            shutil.rmtree(topic_dir, ignore_errors=True)
+
+    def _start_maintenance_thread(self):
+        if self._maintenance_thread is not None:
+            return
+
+        def maintenance_worker():
+            last_retention = 0
+            interval = min(self.fsync_interval_ms or 1000, 1000) / 1000
+            while True:
+                time.sleep(interval)
+                for (topic_name, partition), log in list(self._partitions.items()):
+                    try:
+                        if self.fsync_interval_ms:
+                            log.sync()
+                        log.commit_consume_offset()
+                        if time.time() - last_retention > 30:
+                            deleted = log.enforce_retention(self.retention_ms, self.retention_bytes)
+                            if deleted:
+                                print(f"[SegmentLog] Retention removed {deleted} segment(s) of {topic_name}[{partition}]")
+                    except Exception as e:
+                        print(f"[SegmentLog] Error maintaining {topic_name}[{partition}]: {e}")
+                if time.time() - last_retention > 30:
+                    last_retention = time.time()
+
+        self._maintenance_thread = threading.Thread(
+            target=maintenance_worker, name="segment-log-maintenance", daemon=True)
+        self._maintenance_thread.start()
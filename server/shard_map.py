@@ -0,0 +1,342 @@
+import json
+import os
+import time
+import uuid
+
+import dotenv
+
+from utils.utils import jump_consistent_hash, stable_hash
+
+from .redis_pool import get_redis
+
+dotenv.load_dotenv()
+
+SHARD_MAP_CACHE_TTL = float(os.getenv("SHARD_MAP_CACHE_TTL", 1.0))
+
+# Merges the producer -> last batch sequence pairs ARGV[2..] into the hash KEYS[1],
+# keeping the larger sequence of each producer, and keeps the hash ARGV[1] ms.
+MERGE_PRODUCERS_SCRIPT = """
+for i = 2, #ARGV, 2 do
+  local last = tonumber(redis.call('HGET', KEYS[1], ARGV[i]) or '0')
+  if tonumber(ARGV[i + 1]) > last then
+    redis.call('HSET', KEYS[1], ARGV[i], ARGV[i + 1])
+  end
+end
+redis.call('PEXPIRE', KEYS[1], ARGV[1])
+return 1
+"""
+
+
+# Marks the last chunk a migration copied to (target) or trimmed from (source) a list
+MIGRATION_MARKER_TTL_MS = 24 * 3600 * 1000
+
+# Prepends the chunk ARGV[2..#ARGV - 1] (oldest first) to the list KEYS[1] and records
+# its id ARGV[1] in KEYS[2], kept ARGV[#ARGV] ms.
+COPY_CHUNK_SCRIPT = """
+for i = #ARGV - 1, 2, -1 do
+  redis.call('LPUSH', KEYS[1], ARGV[i])
+end
+redis.call('SET', KEYS[2], ARGV[1], 'PX', ARGV[#ARGV])
+return 1
+"""
+
+# Removes the ARGV[2] messages of chunk ARGV[1] from the tail of the list KEYS[1],
+# once (recorded in KEYS[2], kept ARGV[3] ms). Returns how many of them consumers
+# had already popped from the head, or -1 if the chunk was trimmed before.
+TRIM_CHUNK_SCRIPT = """
+if redis.call('GET', KEYS[2]) == ARGV[1] then
+  return -1
+end
+local length = redis.call('LLEN', KEYS[1])
+local count = math.min(tonumber(ARGV[2]), length)
+if count == length then
+  redis.call('DEL', KEYS[1])
+else
+  redis.call('LTRIM', KEYS[1], 0, length - count - 1)
+end
+redis.call('SET', KEYS[2], ARGV[1], 'PX', ARGV[3])
+return tonumber(ARGV[2]) - count
+"""
+
+# Pops the messages ARGV[1..] off the head of the list KEYS[1] while they are still there, in order
+DROP_CONSUMED_SCRIPT = """
+local dropped = 0
+for i = 1, #ARGV do
+  if redis.call('LINDEX', KEYS[1], 0) ~= ARGV[i] then
+    break
+  end
+  redis.call('LPOP', KEYS[1])
+  dropped = dropped + 1
+end
+return dropped
+"""
+
+
+class ShardMap:
+    """Place topic partitions across several Redis endpoints.
+
+    The catalog Redis (topics set, partition markers, leader keys...) stays the
+    single source of truth and stores the placement of every partition in the
+    ``shard_map`` hash. Partitions without a placement live on the catalog
+    Redis, which keeps topics created before sharding was enabled readable.
+    """
+
+    def __init__(self, catalog_redis, shards=None):
+        self.catalog = catalog_redis
+        kwargs = catalog_redis.connection_pool.connection_kwargs
+        self.catalog_endpoint = f"{kwargs.get('host', 'localhost')}:{kwargs.get('port', 6379)}"
+
+        if shards is None:
+            # Comma separated Redis endpoints holding partition data, e.g.
+            # "localhost:6379,localhost:6380". Defaults to the catalog Redis.
+            shards = [s.strip() for s in os.getenv("REDIS_SHARDS", "").split(",") if s.strip()]
+        self.shards = shards or [self.catalog_endpoint]
+
+        self._clients = {self.catalog_endpoint: catalog_redis}
+        # (topic, partition) -> (expires_at, endpoint, migrating_from)
+        self._cache = {}
+
+    def _field(self, topic_name, partition):
+        return f"{topic_name}:{partition}"
+
+    def client(self, endpoint):
+        """Return the Redis client for a shard endpoint."""
+        if endpoint not in self._clients:
+            host, port = endpoint.rsplit(":", 1)
+            self._clients[endpoint] = get_redis(host, int(port))
+        return self._clients[endpoint]
+
+    def default_shard(self, topic_name, partition):
+        """Return the shard a partition is placed on when it is created."""
+        field = self._field(topic_name, partition)
+        return self.shards[jump_consistent_hash(stable_hash(field), len(self.shards))]
+
+    def assign(self, topic_name, partition):
+        """Choose a shard for a new partition and record it in the catalog."""
+        field = self._field(topic_name, partition)
+        endpoint = self.default_shard(topic_name, partition)
+        # HSETNX keeps the first placement if several nodes create the topic at once
+        self.catalog.hsetnx("shard_map", field, endpoint)
+        self._cache.pop((topic_name, partition), None)
+        return self.locate(topic_name, partition)[0]
+
+    def cached_location(self, topic_name, partition):
+        """Return (endpoint, migrating_from) from the local cache, or None if it must be looked up."""
+        cached = self._cache.get((topic_name, int(partition)))
+        if cached and cached[0] > time.time():
+            return cached[1], cached[2]
+        return None
+
+    def locate(self, topic_name, partition):
+        """Return (endpoint, migrating_from) for a partition."""
+        cached = self.cached_location(topic_name, partition)
+        if cached:
+            return cached
+
+        cache_key = (topic_name, int(partition))
+        field = self._field(topic_name, partition)
+        pipe = self.catalog.pipeline()
+        pipe.hget("shard_map", field)
+        pipe.hget("shard_migrations", field)
+        endpoint, migrating_from = pipe.execute()
+        endpoint = endpoint or self.catalog_endpoint
+
+        self._cache[cache_key] = (time.time() + SHARD_MAP_CACHE_TTL, endpoint, migrating_from)
+        return endpoint, migrating_from
+
+    def locate_many(self, partitions):
+        """Return {(topic, partition): (endpoint, migrating_from)} with one catalog round trip."""
+        partitions = [(topic_name, int(partition)) for topic_name, partition in partitions]
+        if not partitions:
+            return {}
+        fields = [self._field(topic_name, partition) for topic_name, partition in partitions]
+        pipe = self.catalog.pipeline()
+        pipe.hmget("shard_map", fields)
+        pipe.hmget("shard_migrations", fields)
+        endpoints, migrations = pipe.execute()
+
+        expires_at = time.time() + SHARD_MAP_CACHE_TTL
+        locations = {}
+        for key, endpoint, migrating_from in zip(partitions, endpoints, migrations):
+            endpoint = endpoint or self.catalog_endpoint
+            self._cache[key] = (expires_at, endpoint, migrating_from)
+            locations[key] = (endpoint, migrating_from)
+        return locations
+
+    def client_for(self, topic_name, partition):
+        """Return the Redis client that receives writes for a partition."""
+        return self.client(self.locate(topic_name, partition)[0])
+
+    def clients_for_read(self, topic_name, partition):
+        """Return the clients to read a partition from, oldest data first."""
+        endpoint, migrating_from = self.locate(topic_name, partition)
+        if migrating_from:
+            return [self.client(migrating_from), self.client(endpoint)]
+        return [self.client(endpoint)]
+
+    def forget(self, topic_name, num_partitions):
+        """Drop the placement of a deleted topic's partitions."""
+        fields = [self._field(topic_name, p) for p in range(num_partitions)]
+        if fields:
+            self.catalog.hdel("shard_map", *fields)
+            self.catalog.hdel("shard_migrations", *fields)
+            self.catalog.hdel("shard_migration_chunks", *fields)
+        for partition in range(num_partitions):
+            self._cache.pop((topic_name, partition), None)
+
+    def placements(self):
+        """Return {"topic:partition": endpoint} for every placed partition."""
+        return self.catalog.hgetall("shard_map")
+
+    def migrate_partition(self, topic_name, partition, target, chunk_size=500):
+        """Move a partition to another shard while producers and consumers keep running.
+
+        Writes are switched to the target first; readers drain the source before
+        the target while the backlog is copied over, oldest messages last so
+        they end up at the head of the target list in their original order.
+        The producers' last batch sequences are merged into the target before
+        and after the switch, so retries stay de-duplicated, and pending
+        delayed messages move before the backlog, so the mover (which follows
+        the write placement) delivers them on the target.
+
+        Each chunk is copied to the target before it is trimmed off the source,
+        and is recorded in the catalog (shard_migration_chunks) meanwhile, so a
+        migration that dies half way loses nothing: running it again with the
+        same target resumes it, finishing the recorded chunk once.
+        """
+        field = self._field(topic_name, partition)
+        source, migrating_from = self.locate(topic_name, partition)
+        if migrating_from and source != target:
+            raise Exception(f"Partition {field} is already migrating from {migrating_from} to {source}")
+        if migrating_from:
+            print(f"[ShardMap] Resuming the migration of {field} from {migrating_from} to {target}")
+            source = migrating_from
+        elif source == target:
+            print(f"[ShardMap] Partition {field} already lives on {target}")
+            return 0
+
+        source_client = self.client(source)
+        target_client = self.client(target)
+        self._merge_producers(topic_name, partition, source_client, target_client)
+
+        if not migrating_from:
+            pipe = self.catalog.pipeline()
+            pipe.hset("shard_migrations", field, source)
+            pipe.hset("shard_map", field, target)
+            pipe.execute()
+            self._cache.pop((topic_name, partition), None)
+
+            # Give every process time to drop its cached placement and write to the target
+            time.sleep(SHARD_MAP_CACHE_TTL)
+
+        from .global_topic import partition_queues
+
+        # Batches stored on the source until every process switched over
+        self._merge_producers(topic_name, partition, source_client, target_client)
+        timers = self._move_timers(topic_name, partition, source_client, target_client, chunk_size)
+        if timers:
+            print(f"[ShardMap] Moved {timers} delayed messages of {field} from {source} to {target}")
+        moved = 0
+        pending = self.catalog.hget("shard_migration_chunks", field)
+        if pending:
+            moved += self._move_chunk(field, source_client, target_client, chunk=json.loads(pending))
+        # Each priority list of the partition moves the same way
+        for partition_key in partition_queues(topic_name, partition):
+            while True:
+                # Take a chunk off the tail; consumers keep popping from the head
+                count = self._move_chunk(field, source_client, target_client, partition_key, chunk_size)
+                if not count:
+                    break
+                moved += count
+                print(f"[ShardMap] Moved {moved} messages of {field} from {source} to {target}")
+
+        self._merge_stats(topic_name, partition, source_client, target_client)
+        self._merge_producers(topic_name, partition, source_client, target_client)
+        source_client.delete(f"{topic_name}:partition{partition}:producers")
+        markers = [f"{partition_key}:migration" for partition_key in partition_queues(topic_name, partition)]
+        source_client.delete(*markers)
+        target_client.delete(*markers)
+        self.catalog.hdel("shard_migrations", field)
+        self._cache.pop((topic_name, partition), None)
+        print(f"[ShardMap] ✅ Partition {field} migrated to {target} ({moved} messages)")
+        return moved
+
+    def _move_chunk(self, field, source_client, target_client, partition_key=None, chunk_size=0, chunk=None):
+        """Copy the tail chunk of a list to the head of the target's, then trim it off the source.
+
+        With chunk (a recorded chunk of an interrupted migration), finish that
+        one instead. Returns the messages moved, 0 once the list is empty.
+        """
+        if chunk is None:
+            messages = source_client.lrange(partition_key, -chunk_size, -1)
+            if not messages:
+                return 0
+            chunk = {"key": partition_key, "count": len(messages), "id": uuid.uuid4().hex}
+            self.catalog.hset("shard_migration_chunks", field, json.dumps(chunk))
+            self._copy_chunk(target_client, chunk, messages)
+        else:
+            marker = f"{chunk['key']}:migration"
+            if target_client.get(marker) != chunk["id"]:
+                # Died before the copy: the chunk is still whole on the source
+                self.catalog.hdel("shard_migration_chunks", field)
+                return 0
+            messages = target_client.lrange(chunk["key"], 0, chunk["count"] - 1)
+
+        consumed = self._trim_chunk(source_client, chunk)
+        if consumed > 0:
+            # Popped from the source while the chunk was copied: drop their copies unless already read
+            dropped = target_client.eval(DROP_CONSUMED_SCRIPT, 1, chunk["key"], *messages[:consumed])
+            if dropped < consumed:
+                print(f"[ShardMap] ⚠️ {consumed - dropped} messages of {field} may have been delivered twice")
+        self.catalog.hdel("shard_migration_chunks", field)
+        return chunk["count"] - max(consumed, 0)
+
+    def _copy_chunk(self, target_client, chunk, messages):
+        target_client.eval(COPY_CHUNK_SCRIPT, 2, chunk["key"], f"{chunk['key']}:migration",
+                           chunk["id"], *messages, MIGRATION_MARKER_TTL_MS)
+
+    def _trim_chunk(self, source_client, chunk):
+        return source_client.eval(TRIM_CHUNK_SCRIPT, 2, chunk["key"], f"{chunk['key']}:migration",
+                                  chunk["id"], chunk["count"], MIGRATION_MARKER_TTL_MS)
+
+    def _merge_producers(self, topic_name, partition, source_client, target_client):
+        """Copy the last batch sequence of each producer from the source shard, keeping the larger one."""
+        from .global_topic import PRODUCER_STATE_TTL_MS
+
+        key = f"{topic_name}:partition{partition}:producers"
+        sequences = source_client.hgetall(key)
+        if not sequences:
+            return
+        target_client.eval(MERGE_PRODUCERS_SCRIPT, 1, key, PRODUCER_STATE_TTL_MS,
+                           *(value for pair in sequences.items() for value in pair))
+
+    def _move_timers(self, topic_name, partition, source_client, target_client, chunk_size):
+        """Move the pending delayed messages of a partition to the target shard; returns how many."""
+        key = f"{topic_name}:partition{partition}:delayed"
+        moved = 0
+        while True:
+            timers = source_client.zrange(key, 0, chunk_size - 1, withscores=True)
+            if not timers:
+                return moved
+            # Members are unique, so a chunk added twice after a failure is stored once
+            target_client.zadd(key, dict(timers))
+            source_client.zrem(key, *(member for member, _ in timers))
+            moved += len(timers)
+
+    def _merge_stats(self, topic_name, partition, source_client, target_client):
+        """Fold the partition counters kept on the source shard into the target's."""
+        from .topic_stats import COUNTERS, stats_key
+
+        key = stats_key(topic_name, partition)
+        counters = source_client.hgetall(key)
+        if not counters:
+            return
+        pipe = target_client.pipeline()
+        for name in COUNTERS:
+            if int(counters.get(name, 0)):
+                pipe.hincrby(key, name, int(counters[name]))
+        pipe.hget(key, "last_write_ms")
+        last_write_ms = pipe.execute()[-1]
+        if int(counters.get("last_write_ms", 0)) > int(last_write_ms or 0):
+            target_client.hset(key, "last_write_ms", counters["last_write_ms"])
+        source_client.delete(key)
@@ -7,6 +7,8 @@ import time
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from server.mom_instance import MOMInstance
 from server.node_manager import MasterNode
+from server.grpc_server import GRPC_MAX_WORKERS, GRPC_MAX_CONCURRENT_RPCS
+from server import deadline, tracing
 from server.grpc_generated import mom_pb2_grpc
 
 def main():
@@ -17,7 +19,9 @@ def main():
     instance = MOMInstance("grpc_server_instance", master_node)
     
     # Create a GRPC server
-    server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=GRPC_MAX_WORKERS),
+                         interceptors=[tracing.ServerInterceptor(), deadline.ServerInterceptor()],
+                         maximum_concurrent_rpcs=GRPC_MAX_CONCURRENT_RPCS or None)
     mom_pb2_grpc.add_MessageServiceServicer_to_server(instance, server)
     
     # Pick a port to listen on
@@ -6,6 +6,8 @@ import dotenv
 dotenv.load_dotenv()
 
 TOPICS_STATE_FILE = os.getenv("TOPICS_STATE_FILE", "topics_state.json")
+# Bumped in Redis on every topic create/delete; the state file records the last value it saw
+CATALOG_EPOCH_KEY = "catalog:epoch"
 
 
 class StateManager:
@@ -30,38 +32,73 @@ class StateManager:
         except Exception as e:
             print(f"❌ Error saving state: {e}")
 
-    def add_topic(self, topic_name, num_partitions):
+    def topics(self):
+        """Return {topic: info} for every topic recorded in the state."""
+        return {name: info for name, info in self.state.items()
+                if isinstance(info, dict) and "partitions" in info}
+
+    def add_topic(self, topic_name, num_partitions, storage="redis", epoch=None):
         """Add a new topic to the state and save it."""
         if topic_name in self.state:
             print(
                 f"⚠️ Topic '{topic_name}' already exists. Updating partitions to {num_partitions}."
             )
         self.state[topic_name] = {"partitions": num_partitions}
+        if storage != "redis":
+            self.state[topic_name]["storage"] = storage
+        if epoch is not None:
+            self.state["catalog_epoch"] = epoch
         self.save_state()
 
-    def delete_topic(self, topic_name):
+    def delete_topic(self, topic_name, epoch=None):
         """Delete a topic from the state and save it."""
         if topic_name in self.state:
             del self.state[topic_name]
+            if epoch is not None:
+                self.state["catalog_epoch"] = epoch
             self.save_state()
         else:
             print(f"⚠️ Topic '{topic_name}' does not exist.")
 
-    def restore_state(self, redis_client):
-        """Restore the state from Redis."""
-        for topic_name, topic_info in self.state.items():
-            partitions = topic_info.get("partitions")
-            if partitions is None:
-                print(
-                    f"⚠️ Warning: Topic '{topic_name}' is missing 'partitions'. Skipping..."
-                )
-                continue  # Skip topics with missing 'partitions'
+    def restore_state(self, redis_client, shard_map=None):
+        """Make sure the Redis catalog knows every topic of the state file.
+
+        Partition data is never touched. If Redis already holds the epoch of
+        this checkpoint (or a newer one) the catalog is trusted as is, which
+        costs one round trip whatever the number of topics; otherwise the
+        missing catalog entries are re-created in a single pipeline.
+        """
+        topics = self.topics()
+        epoch = int(self.state.get("catalog_epoch", 0))
+
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.get(CATALOG_EPOCH_KEY)
+        pipe.scard("topics")
+        redis_epoch, topic_count = pipe.execute()
+        if redis_epoch is not None:
+            redis_epoch = int(redis_epoch)
+            if redis_epoch > epoch or (redis_epoch == epoch and topic_count == len(topics)):
+                return False
 
-            if not redis_client.exists(topic_name):
-                redis_client.sadd("topics", topic_name)
-            for partition in range(partitions):
-                partition_key = f"{topic_name}:partition{partition}"
-                redis_client.delete(partition_key)  # Clean partitions
+        if topics:
+            print(f"⚠️ Catalog epoch {redis_epoch} does not match checkpoint epoch {epoch}. "
+                  f"Rebuilding the catalog of {len(topics)} topics...")
+        pipe = redis_client.pipeline(transaction=False)
+        if topics:
+            pipe.sadd("topics", *topics)
+        for topic_name, topic_info in topics.items():
+            storage = topic_info.get("storage", "redis")
+            if storage != "redis":
+                pipe.hset("topic_storage", topic_name, storage)
+            pipe.hsetnx("topic_partitions", topic_name, topic_info["partitions"])
+            for partition in range(topic_info["partitions"]):
+                pipe.set(f"{topic_name}:partition_exists:{partition}", "1")
+                if shard_map is not None:
+                    pipe.hsetnx("shard_map", f"{topic_name}:{partition}",
+                                shard_map.default_shard(topic_name, partition))
+        pipe.set(CATALOG_EPOCH_KEY, max(epoch, redis_epoch or 0))
+        pipe.execute()
+        return True
 
     def update_state(self, key, value):
         """Update the state with a new key-value pair and save it."""
@@ -0,0 +1,104 @@
+import multiprocessing
+import os
+import signal
+import sys
+import time
+
+import dotenv
+
+from utils.utils import find_free_port
+
+dotenv.load_dotenv()
+
+MOM_WORKERS = int(os.getenv("MOM_WORKERS", 1))
+# A worker that crashes again within this many seconds is restarted with a growing delay
+WORKER_MIN_UPTIME = 10
+WORKER_MAX_RESTART_DELAY = 30
+
+
+def run_worker(worker_id, instance_kwargs, log_owner, supervisor_pid):
+    """Entry point of a worker process: serve the node's gRPC port until the supervisor goes away."""
+    # Imported here so every worker builds its own gRPC and Redis state after the spawn
+    from server.mom_instance import MOMInstance
+
+    instance = MOMInstance(worker_id=worker_id, log_owner=log_owner, **instance_kwargs)
+    instance.start_server()
+    while os.getppid() == supervisor_pid:
+        time.sleep(1)
+
+
+class Supervisor:
+    """Run one logical MOM node as several worker processes sharing its gRPC port.
+
+    Each worker is a full MOMInstance in its own process (and GIL); the kernel
+    balances incoming connections across them through SO_REUSEPORT. Worker 0
+    registers the node with the master, takes part in failover and owns the
+    node-local log storage, which the other workers reach over loopback.
+    Crashed workers are restarted.
+    """
+
+    def __init__(self, workers, instance_kwargs):
+        self.workers = workers
+        self.instance_kwargs = instance_kwargs
+        self.instance_name = instance_kwargs["instance_name"]
+        self.log_owner = f"127.0.0.1:{find_free_port()}"
+        # spawn instead of fork: gRPC and open Redis connections do not survive a fork
+        self._context = multiprocessing.get_context("spawn")
+        self._processes = {}
+        self._started_at = {}
+        self._restart_delay = {}
+        self._restart_at = {}
+
+    def _spawn(self, worker_id):
+        process = self._context.Process(
+            target=run_worker,
+            args=(worker_id, self.instance_kwargs, self.log_owner, os.getpid()),
+            name=f"{self.instance_name}-worker-{worker_id}",
+            daemon=True,
+        )
+        process.start()
+        self._processes[worker_id] = process
+        self._started_at[worker_id] = time.time()
+        print(f"[Supervisor] Started worker {worker_id} of {self.instance_name} (pid {process.pid})")
+
+    def _restart_crashed_workers(self):
+        now = time.time()
+        for worker_id, process in list(self._processes.items()):
+            if process.is_alive():
+                continue
+            if worker_id not in self._restart_at:
+                uptime = now - self._started_at[worker_id]
+                # Back off while a worker keeps crashing right after it starts
+                delay = 0
+                if uptime < WORKER_MIN_UPTIME:
+                    delay = min(max(self._restart_delay.get(worker_id, 0) * 2, 1), WORKER_MAX_RESTART_DELAY)
+                self._restart_delay[worker_id] = delay
+                self._restart_at[worker_id] = now + delay
+                print(f"[Supervisor] ⚠️ Worker {worker_id} exited with code {process.exitcode} "
+                      f"after {uptime:.1f}s, restarting in {delay}s")
+            if now >= self._restart_at[worker_id]:
+                del self._restart_at[worker_id]
+                self._spawn(worker_id)
+
+    def stop(self):
+        """Terminate every worker."""
+        for process in self._processes.values():
+            if process.is_alive():
+                process.terminate()
+        for process in self._processes.values():
+            process.join(5)
+        print(f"[Supervisor] Stopped {len(self._processes)} workers of {self.instance_name}")
+
+    def run(self, check_interval=1):
+        """Start the workers and keep them running until interrupted."""
+        signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+        print(f"[Supervisor] Running {self.instance_name} as {self.workers} workers "
+              f"on port {self.instance_kwargs['grpc_port']}")
+        try:
+            for worker_id in range(self.workers):
+                self._spawn(worker_id)
+            while True:
+                time.sleep(check_interval)
+                self._restart_crashed_workers()
+        finally:
+            self.stop()
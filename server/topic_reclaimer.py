@@ -0,0 +1,166 @@
+import os
+import threading
+import time
+
+import dotenv
+
+from .consumer_group import GROUP_KEY_SUFFIXES, group_key, groups_key
+from .topic_stats import stats_key
+
+dotenv.load_dotenv()
+
+TOPIC_RECLAIM_INTERVAL_MS = int(os.getenv("TOPIC_RECLAIM_INTERVAL_MS", 1000))
+# Keys unlinked per UNLINK command
+TOPIC_RECLAIM_BATCH = int(os.getenv("TOPIC_RECLAIM_BATCH", 500))
+# How long the progress of a finished deletion stays readable
+TOPIC_TOMBSTONE_TTL_S = 3600
+
+
+def tombstone_key(topic_name):
+    """Hash tracking the deletion of a topic: partitions, storage, deleted_at_ms,
+    state, reclaimed_partitions and keys_unlinked."""
+    return f"tombstone:{topic_name}"
+
+
+class TopicReclaimer:
+    """Free the data of deleted topics in the background.
+
+    delete_topic only tombstones a topic in the catalog. The reclaimer then
+    unlinks the keys of its partitions on every shard, a bounded chunk per
+    command, and the state of its consumer groups. Every key is named from
+    the registry and the topic's group set; nothing scans the keyspace. UNLINK hands
+    large lists to Redis' background thread, so freeing millions of messages
+    does not stall other clients. Progress is saved in the tombstone after every
+    chunk; a restarted master carries on where the last one stopped.
+
+    Only the acting master frees Redis data. MOM instances run a local_only
+    reclaimer, which removes the segment files of their own log partitions
+    once a topic is tombstoned or gone from the catalog.
+    """
+
+    def __init__(self, registry, interval_ms=TOPIC_RECLAIM_INTERVAL_MS, batch_size=TOPIC_RECLAIM_BATCH,
+                 log_storage=None, local_only=False):
+        self.registry = registry
+        # Segment files of log topics kept by this process, if any
+        self.log_storage = log_storage
+        self.local_only = local_only
+        self.interval_ms = interval_ms
+        self.batch_size = batch_size
+        self._stop = None
+
+    def run_once(self):
+        """Reclaim every tombstoned topic; returns the number of topics finished."""
+        if self.local_only:
+            return self.reclaim_local_logs()
+        redis_client = self.registry.redis
+        finished = 0
+        # Writes already in flight when a topic was deleted land before it is reclaimed
+        deleted_before = int(time.time() * 1000) - self.interval_ms
+        for topic_name in redis_client.smembers("topic_tombstones"):
+            tombstone = redis_client.hgetall(tombstone_key(topic_name))
+            self.registry.forget_topic_storage(topic_name)
+            if int(tombstone.get("deleted_at_ms", 0)) > deleted_before:
+                continue
+            self.reclaim(topic_name, tombstone)
+            finished += 1
+        return finished
+
+    def reclaim(self, topic_name, tombstone):
+        """Unlink the keys of a tombstoned topic, saving progress after every chunk."""
+        from .global_topic import PRIORITY_MAX, partition_queues
+
+        redis_client = self.registry.redis
+        key = tombstone_key(topic_name)
+        num_partitions = int(tombstone.get("partitions", 0))
+        start = int(tombstone.get("reclaimed_partitions", 0))
+        redis_client.hset(key, "state", "reclaiming")
+
+        # Partition data, a chunk of partitions at a time, one UNLINK per shard and chunk
+        # Every priority list and its migration marker, the stats, timers and producer state of each partition
+        chunk = max(1, self.batch_size // (2 * (PRIORITY_MAX + 1) + 3))
+        for first in range(start, num_partitions, chunk):
+            partitions = range(first, min(first + chunk, num_partitions))
+            by_endpoint = {}
+            locations = self.registry.shards.locate_many((topic_name, p) for p in partitions)
+            for (_, partition), (endpoint, migrating_from) in locations.items():
+                queues = partition_queues(topic_name, partition)
+                for source in filter(None, (migrating_from, endpoint)):
+                    by_endpoint.setdefault(source, []).extend(queues + [f"{queue}:migration" for queue in queues] + [
+                        stats_key(topic_name, partition), self.registry.timer_key(topic_name, partition),
+                        self.registry.producers_key(topic_name, partition)])
+            unlinked = sum(self.registry.shards.client(endpoint).unlink(*keys)
+                           for endpoint, keys in by_endpoint.items())
+            unlinked += redis_client.unlink(
+                *(f"{topic_name}:partition_exists:{partition}" for partition in partitions))
+            pipe = redis_client.pipeline(transaction=False)
+            pipe.hset(key, "reclaimed_partitions", partitions[-1] + 1)
+            pipe.hincrby(key, "keys_unlinked", unlinked)
+            pipe.execute()
+
+        # Leases, assignments and generations of the topic's consumer groups
+        group_names = sorted(redis_client.smembers(groups_key(topic_name)))
+        per_chunk = max(1, self.batch_size // len(GROUP_KEY_SUFFIXES))
+        for first in range(0, len(group_names), per_chunk):
+            keys = [group_key(topic_name, group_name, suffix)
+                    for group_name in group_names[first:first + per_chunk] for suffix in GROUP_KEY_SUFFIXES]
+            redis_client.hincrby(key, "keys_unlinked", redis_client.unlink(*keys))
+        redis_client.hincrby(key, "keys_unlinked", redis_client.unlink(groups_key(topic_name)))
+
+        if tombstone.get("storage") == "log" and self.log_storage is not None:
+            self.log_storage.delete_topic(topic_name)
+        self.registry.shards.forget(topic_name, num_partitions)
+        pipe = redis_client.pipeline()
+        pipe.srem("topic_tombstones", topic_name)
+        pipe.hset(key, mapping={"state": "done", "reclaimed_at_ms": int(time.time() * 1000)})
+        pipe.expire(key, TOPIC_TOMBSTONE_TTL_S)
+        pipe.execute()
+        print(f"[TopicReclaimer] ✅ Reclaimed topic '{topic_name}' "
+              f"({num_partitions} partitions, {redis_client.hget(key, 'keys_unlinked')} keys)")
+
+    def reclaim_local_logs(self):
+        """Remove this process' log partitions of deleted topics; returns the number of topics removed."""
+        if self.log_storage is None:
+            return 0
+        topic_names = sorted(self.log_storage.topics())
+        if not topic_names:
+            return 0
+        pipe = self.registry.redis.pipeline(transaction=False)
+        for topic_name in topic_names:
+            pipe.sismember("topic_tombstones", topic_name)
+            pipe.sismember("topics", topic_name)
+        flags = pipe.execute()
+        removed = 0
+        for topic_name, tombstoned, exists in zip(topic_names, flags[::2], flags[1::2]):
+            # A topic no longer in the catalog was deleted (and maybe reclaimed) while this node was away
+            if tombstoned or not exists:
+                self.registry.forget_topic_storage(topic_name)
+                self.log_storage.delete_topic(topic_name)
+                print(f"[TopicReclaimer] ✅ Removed the local log partitions of deleted topic '{topic_name}'")
+                removed += 1
+        return removed
+
+    def start(self):
+        """Run the reclaimer in a background thread until stop()."""
+        if self._stop is not None:
+            return None
+        stop = self._stop = threading.Event()
+
+        def reclaimer_worker():
+            while not stop.is_set():
+                try:
+                    self.run_once()
+                except Exception as e:
+                    print(f"[TopicReclaimer] Error reclaiming deleted topics: {e}")
+                stop.wait(self.interval_ms / 1000)
+
+        thread = threading.Thread(target=reclaimer_worker, name="topic-reclaimer", daemon=True)
+        thread.start()
+        print(f"[TopicReclaimer] Started topic reclaimer (interval: {self.interval_ms}ms)")
+        return thread
+
+    def stop(self):
+        """Stop the background thread after its current pass."""
+        if self._stop is not None:
+            self._stop.set()
+            self._stop = None
+            print("[TopicReclaimer] Stopped topic reclaimer")
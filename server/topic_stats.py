@@ -0,0 +1,146 @@
+import os
+import threading
+import time
+from collections import deque
+
+import dotenv
+
+dotenv.load_dotenv()
+
+# Rolling windows (seconds) over which /stats reports enqueue and dequeue rates
+TOPIC_STATS_WINDOWS = [int(w) for w in os.getenv("TOPIC_STATS_WINDOWS", "10,60").split(",") if w.strip()]
+
+COUNTERS = ("enqueued", "dequeued", "bytes")
+
+
+def stats_key(topic_name, partition):
+    """Hash of a partition's counters, kept on the shard holding the partition.
+
+    Fields: enqueued and dequeued (messages), bytes (enqueued), last_write_ms.
+    """
+    return f"{topic_name}:partition{partition}:stats"
+
+
+def record_enqueued(pipe, topic_name, partition, messages, now_ms=None):
+    """Queue the counter updates for messages appended to a partition on the pipeline writing them."""
+    key = stats_key(topic_name, partition)
+    pipe.hincrby(key, "enqueued", len(messages))
+    pipe.hincrby(key, "bytes", sum(len(message.encode("utf-8")) for message in messages))
+    pipe.hset(key, "last_write_ms", now_ms or int(time.time() * 1000))
+
+
+class TopicStats:
+    """Read the counters of every partition of every topic with one pipeline per shard.
+
+    Each collect() keeps a sample of the totals, so rates over the rolling
+    windows come from samples taken by earlier calls (dashboards polling every
+    few seconds keep the windows filled).
+    """
+
+    def __init__(self, registry, windows=TOPIC_STATS_WINDOWS):
+        self.registry = registry
+        self.windows = sorted(windows)
+        self._samples = deque()
+        self._lock = threading.Lock()
+
+    def _partitions(self):
+        """Return {topic: [(partition, [endpoints holding its counters])]} from two catalog reads."""
+        shards = self.registry.shards
+        pipe = self.registry.redis.pipeline(transaction=False)
+        pipe.smembers("topics")
+        pipe.hgetall("shard_map")
+        pipe.hgetall("shard_migrations")
+        topics, placements, migrations = pipe.execute()
+
+        partitions = {topic_name: [] for topic_name in topics}
+        for field, endpoint in placements.items():
+            topic_name, partition = field.rsplit(":", 1)
+            if topic_name in partitions:
+                endpoints = [endpoint] + ([migrations[field]] if field in migrations else [])
+                partitions[topic_name].append((int(partition), endpoints))
+        for topic_name, placed in partitions.items():
+            if not placed:
+                # Topics created before partitions were placed live on the catalog Redis
+                placed.extend((partition, [shards.catalog_endpoint])
+                              for partition in range(self.registry.get_partition_count(topic_name)))
+            placed.sort()
+        return partitions
+
+    def snapshot(self):
+        """Return {topic: {partition: counters}} read straight from Redis."""
+        partitions = self._partitions()
+        reads = {}
+        for topic_name, placed in partitions.items():
+            for partition, endpoints in placed:
+                for endpoint in endpoints:
+                    reads.setdefault(endpoint, []).append((topic_name, partition))
+
+        counters = {topic_name: {partition: {name: 0 for name in COUNTERS} | {"last_write_ms": 0}
+                                 for partition, _ in placed}
+                    for topic_name, placed in partitions.items()}
+        for endpoint, keys in reads.items():
+            pipe = self.registry.shards.client(endpoint).pipeline(transaction=False)
+            for topic_name, partition in keys:
+                pipe.hgetall(stats_key(topic_name, partition))
+            for (topic_name, partition), values in zip(keys, pipe.execute()):
+                current = counters[topic_name][partition]
+                for name in COUNTERS:
+                    current[name] += int(values.get(name, 0))
+                current["last_write_ms"] = max(current["last_write_ms"], int(values.get("last_write_ms", 0)))
+        return counters
+
+    def _rates(self, now, key, enqueued, dequeued):
+        """Enqueue/dequeue rates (messages per second) of a topic or partition over each window."""
+        rates = {}
+        for window in self.windows:
+            # The oldest sample inside the window, or the newest one before it
+            base = None
+            for sample_time, totals in self._samples:
+                if base is not None and sample_time > now - window:
+                    break
+                if key in totals:
+                    base = (sample_time, totals[key])
+            if base is None or now - base[0] <= 0:
+                rates[f"{window}s"] = {"enqueue": 0.0, "dequeue": 0.0}
+                continue
+            elapsed = now - base[0]
+            rates[f"{window}s"] = {
+                "enqueue": round(max(0, enqueued - base[1][0]) / elapsed, 3),
+                "dequeue": round(max(0, dequeued - base[1][1]) / elapsed, 3),
+            }
+        return rates
+
+    def collect(self):
+        """Return the counters of every topic and partition with their rates over the rolling windows."""
+        now = time.time()
+        counters = self.snapshot()
+        totals = {}
+        topics = {}
+        with self._lock:
+            for topic_name, partitions in counters.items():
+                topic = {name: 0 for name in COUNTERS} | {"last_write_ms": 0}
+                partition_stats = {}
+                for partition, current in partitions.items():
+                    key = (topic_name, partition)
+                    totals[key] = (current["enqueued"], current["dequeued"])
+                    partition_stats[str(partition)] = {
+                        **current,
+                        "depth": max(0, current["enqueued"] - current["dequeued"]),
+                        "rates": self._rates(now, key, current["enqueued"], current["dequeued"]),
+                    }
+                    for name in COUNTERS:
+                        topic[name] += current[name]
+                    topic["last_write_ms"] = max(topic["last_write_ms"], current["last_write_ms"])
+                totals[topic_name] = (topic["enqueued"], topic["dequeued"])
+                topics[topic_name] = {
+                    **topic,
+                    "depth": max(0, topic["enqueued"] - topic["dequeued"]),
+                    "rates": self._rates(now, topic_name, topic["enqueued"], topic["dequeued"]),
+                    "partitions": partition_stats,
+                }
+
+            self._samples.append((now, totals))
+            # Keep one sample older than the longest window as its base
+            while len(self._samples) > 1 and self._samples[1][0] <= now - self.windows[-1]:
+                self._samples.popleft()
+        return topics
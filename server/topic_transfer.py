@@ -0,0 +1,257 @@
+import json
+import os
+import struct
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .global_topic import PRIORITY_MAX, partition_key, partition_queues
+from .topic_stats import record_enqueued
+
+# "ndjson": one {"priority", "message"} object per line; "binary": length-prefixed records
+TRANSFER_FORMATS = ("ndjson", "binary")
+MANIFEST_FILE = "manifest.json"
+# First bytes of a binary partition file
+BINARY_MAGIC = b"MOMTOPIC1\n"
+# priority, message length
+BINARY_RECORD = struct.Struct(">BI")
+PROGRESS_INTERVAL_S = 1.0
+
+def partition_file(directory, partition, fmt):
+    return os.path.join(directory, f"partition{partition}.{'ndjson' if fmt == 'ndjson' else 'bin'}")
+
+
+class _Progress:
+    """Count transferred messages across workers and print them every PROGRESS_INTERVAL_S."""
+
+    def __init__(self, action, topic_name, partitions, total):
+        self.action = action
+        self.topic_name = topic_name
+        self.partitions = partitions
+        self.total = total
+        self.messages = 0
+        self.bytes = 0
+        self.done = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._started = time.time()
+
+    def add(self, messages, size):
+        with self._lock:
+            self.messages += messages
+            self.bytes += size
+
+    def partition_done(self):
+        with self._lock:
+            self.done += 1
+
+    def report(self):
+        elapsed = max(time.time() - self._started, 1e-6)
+        percent = f" ({100 * self.messages / self.total:.1f}%)" if self.total else ""
+        print(f"[TopicTransfer] {self.action} '{self.topic_name}': {self.messages}/{self.total} messages{percent}, "
+              f"{self.bytes / 1024 / 1024:.1f} MB, {self.messages / elapsed:.0f} msg/s, "
+              f"{self.done}/{self.partitions} partitions")
+
+    def __enter__(self):
+        def progress_worker():
+            while not self._stop.wait(PROGRESS_INTERVAL_S):
+                self.report()
+
+        threading.Thread(target=progress_worker, name="topic-transfer-progress", daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self.report()
+
+
+def _write_records(f, fmt, priority, messages):
+    """Write messages of one priority; returns the bytes of message data written."""
+    size = 0
+    if fmt == "ndjson":
+        lines = []
+        for message in messages:
+            lines.append(json.dumps({"priority": priority, "message": message}, ensure_ascii=False) + "\n")
+            size += len(message)
+        f.write("".join(lines).encode("utf-8"))
+        return size
+    chunks = []
+    for message in messages:
+        data = message.encode("utf-8")
+        chunks += (BINARY_RECORD.pack(priority, len(data)), data)
+        size += len(data)
+    f.write(b"".join(chunks))
+    return size
+
+
+def _read_records(f, fmt):
+    """Yield (priority, message) from a partition file opened in binary mode."""
+    if fmt == "ndjson":
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                yield int(record.get("priority", 0)), record["message"]
+        return
+    if f.read(len(BINARY_MAGIC)) != BINARY_MAGIC:
+        raise ValueError(f"{f.name} is not a binary topic export")
+    while True:
+        header = f.read(BINARY_RECORD.size)
+        if not header:
+            return
+        if len(header) < BINARY_RECORD.size:
+            raise ValueError(f"{f.name} is truncated")
+        priority, length = BINARY_RECORD.unpack(header)
+        data = f.read(length)
+        if len(data) < length:
+            raise ValueError(f"{f.name} is truncated")
+        yield priority, data.decode("utf-8")
+
+
+def _partition_depth(registry, topic_name, partition):
+    total = 0
+    for client in registry.shards.clients_for_read(topic_name, partition):
+        pipe = client.pipeline(transaction=False)
+        for key in partition_queues(topic_name, partition):
+            pipe.llen(key)
+        total += sum(pipe.execute())
+    return total
+
+
+def _export_partition(registry, topic_name, partition, path, fmt, chunk_size, progress):
+    """Copy a partition to path, chunk_size messages per LRANGE; returns the messages written."""
+    if registry.shards.locate(topic_name, partition)[1]:
+        raise ValueError(f"Partition {partition} of '{topic_name}' is migrating between shards; "
+                         f"export it once the migration is done")
+    client = registry.shards.client_for(topic_name, partition)
+    written = 0
+    with open(path, "wb") as f:
+        if fmt == "binary":
+            f.write(BINARY_MAGIC)
+        # Most urgent first, so an import drains in the same order
+        for priority in range(PRIORITY_MAX, -1, -1):
+            key = partition_key(topic_name, partition, priority)
+            # Up to the length the list had when its export started, however busy its producers are
+            for start in range(0, client.llen(key), chunk_size):
+                messages = client.lrange(key, start, start + chunk_size - 1)
+                if not messages:
+                    break
+                progress.add(len(messages), _write_records(f, fmt, priority, messages))
+                written += len(messages)
+    progress.partition_done()
+    return written
+
+
+def export_topic(registry, topic_name, directory, fmt="ndjson", workers=4, chunk_size=1000):
+    """Copy every message of a Redis topic into directory, one file per partition.
+
+    Partitions are read chunk_size messages at a time and written straight to
+    the files, so memory use does not grow with the topic and Redis serves
+    other clients between chunks. Messages stay in the topic. The export is a
+    best-effort view, not a snapshot: messages consumed or produced while a
+    partition is read may be missing from its file, or be in it, so stop
+    producers and consumers of the topic when an exact copy is needed. A
+    manifest with the message count of each partition is written last, once
+    every file is complete. Returns the manifest.
+    """
+    if fmt not in TRANSFER_FORMATS:
+        raise ValueError(f"Unknown export format '{fmt}'. Use one of: {', '.join(TRANSFER_FORMATS)}")
+    if not registry.redis.sismember("topics", topic_name):
+        raise ValueError(f"Topic '{topic_name}' does not exist")
+    storage = registry.get_topic_storage(topic_name)
+    if storage != "redis":
+        raise ValueError(f"Topic '{topic_name}' uses {storage} storage; only Redis topics can be exported")
+    os.makedirs(directory, exist_ok=True)
+    if os.path.exists(os.path.join(directory, MANIFEST_FILE)):
+        raise ValueError(f"{directory} already holds an export")
+
+    num_partitions = registry.get_partition_count(topic_name)
+    total = sum(_partition_depth(registry, topic_name, p) for p in range(num_partitions))
+    print(f"[TopicTransfer] Exporting '{topic_name}' ({num_partitions} partitions, ~{total} messages) "
+          f"to {directory} as {fmt}")
+    with _Progress("Export", topic_name, num_partitions, total) as progress, \
+            ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="topic-export") as pool:
+        counts = list(pool.map(
+            lambda p: _export_partition(registry, topic_name, p, partition_file(directory, p, fmt),
+                                        fmt, chunk_size, progress),
+            range(num_partitions)))
+
+    manifest = {"topic": topic_name, "partitions": num_partitions, "format": fmt,
+                "exported_at_ms": int(time.time() * 1000), "messages": counts}
+    with open(os.path.join(directory, MANIFEST_FILE), "w") as f:
+        json.dump(manifest, f, indent=2)
+    print(f"[TopicTransfer] ✅ Exported {sum(counts)} messages of '{topic_name}' to {directory}")
+    return manifest
+
+
+def _import_partition(registry, topic_name, partition, path, fmt, chunk_size, expected, progress):
+    """Append the messages of a partition file, chunk_size messages per pipelined round trip."""
+    client = registry.shards.client_for(topic_name, partition)
+    imported = 0
+
+    def push(pending):
+        pipe = client.pipeline(transaction=False)
+        for priority, messages in pending.items():
+            pipe.rpush(partition_key(topic_name, partition, priority), *messages)
+            record_enqueued(pipe, topic_name, partition, messages)
+        pipe.execute()
+        progress.add(sum(map(len, pending.values())),
+                     sum(len(message) for messages in pending.values() for message in messages))
+
+    with open(path, "rb") as f:
+        pending = {}
+        count = 0
+        for priority, message in _read_records(f, fmt):
+            if not 0 <= priority <= PRIORITY_MAX:
+                raise ValueError(f"{path}: priority {priority} is out of range")
+            pending.setdefault(priority, []).append(message)
+            count += 1
+            if count >= chunk_size:
+                push(pending)
+                imported += count
+                pending, count = {}, 0
+        if pending:
+            push(pending)
+            imported += count
+    if imported != expected:
+        raise RuntimeError(f"Partition {partition}: the manifest lists {expected} messages, {imported} were imported")
+    progress.partition_done()
+    return imported
+
+
+def import_topic(registry, directory, topic_name=None, workers=4, chunk_size=1000):
+    """Append the messages of an export to a topic (by default the exported one).
+
+    The topic is created with the exported partition count if it does not
+    exist; an existing topic needs at least as many partitions. Each message
+    goes back to its partition and priority, in the exported order, after
+    whatever the topic already holds. Returns the messages imported per partition.
+    """
+    manifest_path = os.path.join(directory, MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        raise ValueError(f"{directory} holds no complete export ({MANIFEST_FILE} is missing)")
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    fmt = manifest["format"]
+    if fmt not in TRANSFER_FORMATS:
+        raise ValueError(f"Unknown export format '{fmt}' in {manifest_path}")
+    topic_name = topic_name or manifest["topic"]
+    num_partitions = manifest["partitions"]
+
+    if registry.redis.sismember("topics", topic_name):
+        if registry.get_topic_storage(topic_name) != "redis":
+            raise ValueError(f"Topic '{topic_name}' does not use Redis storage")
+        if registry.get_partition_count(topic_name) < num_partitions:
+            raise ValueError(f"Topic '{topic_name}' has {registry.get_partition_count(topic_name)} partitions, "
+                             f"the export needs {num_partitions}")
+    else:
+        registry.create_topic(topic_name, num_partitions)
+
+    print(f"[TopicTransfer] Importing {sum(manifest['messages'])} messages from {directory} into '{topic_name}'")
+    with _Progress("Import", topic_name, num_partitions, sum(manifest["messages"])) as progress, \
+            ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="topic-import") as pool:
+        counts = list(pool.map(
+            lambda p: _import_partition(registry, topic_name, p, partition_file(directory, p, fmt), fmt,
+                                        chunk_size, manifest["messages"][p], progress),
+            range(num_partitions)))
+    print(f"[TopicTransfer] ✅ Imported {sum(counts)} messages into '{topic_name}'")
+    return counts
@@ -0,0 +1,391 @@
+import atexit
+import contextlib
+import contextvars
+import inspect
+import json
+import os
+import queue
+import random
+import socket
+import threading
+import time
+
+import dotenv
+import grpc
+
+from .interceptors import wrap_rpc_handler
+
+dotenv.load_dotenv()
+
+# Fraction of requests traced (0 = tracing off). A trace started upstream is
+# always followed, so one sampling decision covers REST, master, instance and Redis.
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", 0))
+# "otlp": POST OTLP/JSON to TRACE_OTLP_ENDPOINT; "file": append OTLP/JSON lines to TRACE_FILE
+TRACE_EXPORTER = os.getenv("TRACE_EXPORTER", "otlp")
+TRACE_OTLP_ENDPOINT = os.getenv("TRACE_OTLP_ENDPOINT", "http://localhost:4318/v1/traces")
+TRACE_FILE = os.getenv("TRACE_FILE", "traces.jsonl")
+TRACE_SERVICE_NAME = os.getenv("TRACE_SERVICE_NAME", "")
+TRACE_EXPORT_INTERVAL_MS = int(os.getenv("TRACE_EXPORT_INTERVAL_MS", 1000))
+# Finished spans waiting for the exporter; more are dropped rather than slowing requests down
+TRACE_QUEUE_SIZE = 10000
+# W3C trace context header, carried as gRPC metadata and HTTP header alike
+TRACEPARENT = "traceparent"
+
+# OTLP span kinds and status codes
+SPAN_KIND_INTERNAL, SPAN_KIND_SERVER, SPAN_KIND_CLIENT = 1, 2, 3
+STATUS_OK, STATUS_ERROR = 1, 2
+
+_current_span = contextvars.ContextVar("mom_current_span", default=None)
+_service_name = TRACE_SERVICE_NAME or "mom"
+_exporter = None
+_exporter_lock = threading.Lock()
+
+
+def set_service_name(name):
+    """Name this process in exported traces, unless TRACE_SERVICE_NAME is set."""
+    global _service_name
+    if not TRACE_SERVICE_NAME:
+        _service_name = name
+
+
+class Span:
+    """A timed operation of a trace; only sampled spans are exported."""
+
+    __slots__ = ("trace_id", "span_id", "parent_id", "sampled", "name", "kind", "attributes",
+                 "start_ns", "end_ns", "status", "message")
+
+    def __init__(self, name, trace_id, parent_id, sampled, kind=SPAN_KIND_INTERNAL, attributes=None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.sampled = sampled
+        self.kind = kind
+        self.attributes = attributes or {}
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.status = None
+        self.message = ""
+
+    def set_attribute(self, key, value):
+        if self.sampled:
+            self.attributes[key] = value
+
+    def set_error(self, message):
+        self.status = STATUS_ERROR
+        self.message = str(message)
+
+    @property
+    def traceparent(self):
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    def end(self):
+        self.end_ns = time.time_ns()
+        if self.sampled:
+            _get_exporter().export(self)
+
+    def to_otlp(self):
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": _otlp_attributes(self.attributes),
+            "status": {"code": self.status or STATUS_OK, "message": self.message},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+
+def _otlp_attributes(attributes):
+    values = []
+    for key, value in attributes.items():
+        if isinstance(value, bool):
+            values.append({"key": key, "value": {"boolValue": value}})
+        elif isinstance(value, int):
+            values.append({"key": key, "value": {"intValue": str(value)}})
+        elif isinstance(value, float):
+            values.append({"key": key, "value": {"doubleValue": value}})
+        else:
+            values.append({"key": key, "value": {"stringValue": str(value)}})
+    return values
+
+
+def parse_traceparent(value):
+    """Return (trace_id, parent span id, sampled) from a traceparent header, or None if invalid."""
+    parts = (value or "").split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        sampled = bool(int(parts[3], 16) & 1)
+    except ValueError:
+        return None
+    return parts[1], parts[2], sampled
+
+
+def current_span():
+    return _current_span.get()
+
+
+@contextlib.contextmanager
+def span(name, kind=SPAN_KIND_INTERNAL, traceparent=None, **attributes):
+    """Time a block as a span, a child of the current one (or of traceparent).
+
+    Without a parent the trace is sampled at TRACE_SAMPLE_RATE. When tracing is
+    off this costs a context variable lookup.
+    """
+    parent = _current_span.get()
+    remote = parse_traceparent(traceparent) if traceparent else None
+    if remote:
+        trace_id, parent_id, sampled = remote
+    elif parent is not None:
+        trace_id, parent_id, sampled = parent.trace_id, parent.span_id, parent.sampled
+    elif TRACE_SAMPLE_RATE > 0:
+        trace_id, parent_id = f"{random.getrandbits(128):032x}", None
+        sampled = random.random() < TRACE_SAMPLE_RATE
+    else:
+        yield None
+        return
+
+    current = Span(name, trace_id, parent_id, sampled, kind, attributes if sampled else None)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.set_error(e)
+        raise
+    finally:
+        try:
+            _current_span.reset(token)
+        except ValueError:
+            # A streaming handler finished in another context than it started in
+            _current_span.set(parent)
+        current.end()
+
+
+@contextlib.contextmanager
+def child_span(name, **attributes):
+    """Like span, but only inside a trace in progress: background work never starts a trace."""
+    if _current_span.get() is None:
+        yield None
+        return
+    with span(name, **attributes) as current:
+        yield current
+
+
+def inject(metadata=()):
+    """Return gRPC metadata with the current trace context added."""
+    current = _current_span.get()
+    if current is None:
+        return metadata
+    return tuple(metadata or ()) + ((TRACEPARENT, current.traceparent),)
+
+
+def _incoming_traceparent(metadata):
+    for key, value in metadata or ():
+        if key == TRACEPARENT:
+            return value
+    return None
+
+
+class _Exporter:
+    """Send finished spans in batches from a background thread."""
+
+    def __init__(self, exporter=TRACE_EXPORTER, interval_ms=TRACE_EXPORT_INTERVAL_MS):
+        self.exporter = exporter
+        self.interval_ms = interval_ms
+        self.spans = queue.Queue(maxsize=TRACE_QUEUE_SIZE)
+        self.dropped = 0
+
+        def exporter_worker():
+            while True:
+                time.sleep(self.interval_ms / 1000)
+                try:
+                    self.flush()
+                except Exception as e:
+                    print(f"[Tracing] ⚠️ Could not export spans: {e}")
+
+        threading.Thread(target=exporter_worker, name="trace-exporter", daemon=True).start()
+        # Spans of the last requests before a shutdown
+        atexit.register(self._flush_at_exit)
+        print(f"[Tracing] Exporting sampled spans ({exporter}, sample rate {TRACE_SAMPLE_RATE})")
+
+    def _flush_at_exit(self):
+        try:
+            self.flush()
+        except Exception as e:
+            print(f"[Tracing] ⚠️ Could not export spans: {e}")
+
+    def export(self, span):
+        try:
+            self.spans.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self):
+        """Export the spans finished so far; returns how many were sent."""
+        spans = []
+        while True:
+            try:
+                spans.append(self.spans.get_nowait())
+            except queue.Empty:
+                break
+        if not spans:
+            return 0
+        document = {"resourceSpans": [{
+            "resource": {"attributes": _otlp_attributes({
+                "service.name": _service_name, "host.name": socket.gethostname(), "process.pid": os.getpid()})},
+            "scopeSpans": [{"scope": {"name": "mom_middleware"}, "spans": [s.to_otlp() for s in spans]}],
+        }]}
+        if self.exporter == "file":
+            with open(TRACE_FILE, "a") as f:
+                f.write(json.dumps(document) + "\n")
+        else:
+            import requests
+            requests.post(TRACE_OTLP_ENDPOINT, json=document, timeout=5).raise_for_status()
+        return len(spans)
+
+
+def _get_exporter():
+    global _exporter
+    if _exporter is None:
+        with _exporter_lock:
+            if _exporter is None:
+                _exporter = _Exporter()
+    return _exporter
+
+
+def _reset_exporter():
+    global _exporter
+    _exporter = None
+
+
+# A forked worker does not inherit the exporter thread; it starts its own
+os.register_at_fork(after_in_child=_reset_exporter)
+
+
+def flush():
+    """Export the spans finished so far (the exporter thread does this every TRACE_EXPORT_INTERVAL_MS)."""
+    return _get_exporter().flush() if _exporter is not None else 0
+
+
+def _rpc_attributes(method):
+    service, _, name = method.lstrip("/").rpartition("/")
+    return {"rpc.system": "grpc", "rpc.service": service, "rpc.method": name}
+
+
+def _record_status(current, context):
+    code = getattr(context, "code", lambda: None)()
+    if current is not None and code not in (None, grpc.StatusCode.OK):
+        current.set_error(code)
+
+
+class ServerInterceptor(grpc.ServerInterceptor):
+    """Run every RPC of a grpc.server in a span continuing the caller's trace."""
+
+    def intercept_service(self, continuation, handler_call_details):
+        handler = continuation(handler_call_details)
+        traceparent = _incoming_traceparent(handler_call_details.invocation_metadata)
+        if handler is None or (traceparent is None and TRACE_SAMPLE_RATE <= 0):
+            return handler
+        method = handler_call_details.method
+
+        def wrap_unary(behavior):
+            def traced(request, context):
+                with span(method, SPAN_KIND_SERVER, traceparent, **_rpc_attributes(method)) as current:
+                    response = behavior(request, context)
+                    _record_status(current, context)
+                    return response
+            return traced
+
+        def wrap_stream(behavior):
+            def traced(request, context):
+                with span(method, SPAN_KIND_SERVER, traceparent, **_rpc_attributes(method)) as current:
+                    yield from behavior(request, context)
+                    _record_status(current, context)
+            return traced
+
+        return wrap_rpc_handler(handler, wrap_unary, wrap_stream)
+
+
+class AioServerInterceptor(grpc.aio.ServerInterceptor):
+    """Run every RPC of a grpc.aio server in a span continuing the caller's trace."""
+
+    async def intercept_service(self, continuation, handler_call_details):
+        handler = await continuation(handler_call_details)
+        traceparent = _incoming_traceparent(handler_call_details.invocation_metadata)
+        if handler is None or (traceparent is None and TRACE_SAMPLE_RATE <= 0):
+            return handler
+        method = handler_call_details.method
+
+        def wrap_unary(behavior):
+            async def traced(request, context):
+                with span(method, SPAN_KIND_SERVER, traceparent, **_rpc_attributes(method)) as current:
+                    response = behavior(request, context)
+                    if inspect.isawaitable(response):
+                        response = await response
+                    _record_status(current, context)
+                    return response
+            return traced
+
+        def wrap_stream(behavior):
+            async def traced(request, context):
+                with span(method, SPAN_KIND_SERVER, traceparent, **_rpc_attributes(method)) as current:
+                    responses = behavior(request, context)
+                    if inspect.isasyncgen(responses):
+                        async for response in responses:
+                            yield response
+                    else:
+                        for response in (await responses if inspect.isawaitable(responses) else responses) or ():
+                            yield response
+                    _record_status(current, context)
+            return traced
+
+        return wrap_rpc_handler(handler, wrap_unary, wrap_stream)
+
+
+class _ClientCallDetails(grpc.ClientCallDetails):
+    def __init__(self, details, metadata):
+        self.method = details.method
+        self.timeout = details.timeout
+        self.metadata = metadata
+        self.credentials = details.credentials
+        self.wait_for_ready = details.wait_for_ready
+        self.compression = details.compression
+
+
+class ClientInterceptor(grpc.UnaryUnaryClientInterceptor, grpc.UnaryStreamClientInterceptor,
+                        grpc.StreamUnaryClientInterceptor, grpc.StreamStreamClientInterceptor):
+    """Time outgoing RPCs as client spans and pass the trace context in their metadata."""
+
+    def _call(self, continuation, details, request):
+        if _current_span.get() is None:
+            return continuation(details, request)
+        with span(details.method, SPAN_KIND_CLIENT, **_rpc_attributes(details.method)) as current:
+            call = continuation(_ClientCallDetails(details, inject(details.metadata)), request)
+            if isinstance(call, grpc.Future) and not call.done() and current is not None and current.sampled:
+                # Futures (SendBatch.future...) finish later; the span then covers the send only
+                current.set_attribute("rpc.async", True)
+            elif isinstance(call, grpc.Call) and call.code() not in (None, grpc.StatusCode.OK):
+                current.set_error(call.code())
+            return call
+
+    def intercept_unary_unary(self, continuation, client_call_details, request):
+        return self._call(continuation, client_call_details, request)
+
+    def intercept_unary_stream(self, continuation, client_call_details, request):
+        return self._call(continuation, client_call_details, request)
+
+    def intercept_stream_unary(self, continuation, client_call_details, request_iterator):
+        return self._call(continuation, client_call_details, request_iterator)
+
+    def intercept_stream_stream(self, continuation, client_call_details, request_iterator):
+        return self._call(continuation, client_call_details, request_iterator)
+
+
+def intercept_channel(channel):
+    """Wrap a grpc channel so RPCs made through it join the current trace."""
+    return grpc.intercept_channel(channel, ClientInterceptor())
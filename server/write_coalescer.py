@@ -0,0 +1,173 @@
+import os
+import threading
+import time
+from concurrent.futures import Future, TimeoutError
+
+import dotenv
+
+from . import deadline, tracing
+from .global_topic import partition_key
+from .topic_stats import record_enqueued
+
+dotenv.load_dotenv()
+
+# How long the first write to a partition waits for others before they are flushed together
+# (0 = flush as soon as the flusher is free; writes arriving meanwhile still share a round trip)
+WRITE_LINGER_MS = float(os.getenv("WRITE_LINGER_MS", 1))
+# A partition's pending writes are flushed right away once they reach this size
+WRITE_BATCH_BYTES = int(os.getenv("WRITE_BATCH_BYTES", 64 * 1024))
+
+
+class _PendingBatch:
+    __slots__ = ("deadline", "messages", "futures", "size")
+
+    def __init__(self, deadline):
+        self.deadline = deadline
+        self.messages = []
+        self.futures = []
+        self.size = 0
+
+
+class WriteCoalescer:
+    """Group concurrent writes to the same partition into a single RPUSH.
+
+    submit() queues a message for its partition and returns a Future that
+    resolves once Redis has stored it. A flusher thread writes a partition's
+    batch when its first message has waited linger_ms or when it reaches
+    batch_bytes, pushing every due partition of a shard in one pipeline.
+    Messages of a partition are stored in the order they were submitted.
+    Cancelling a Future before its batch is flushed withdraws the message.
+    """
+
+    def __init__(self, shards, linger_ms=WRITE_LINGER_MS, batch_bytes=WRITE_BATCH_BYTES):
+        self.shards = shards
+        self.linger_ms = linger_ms
+        self.batch_bytes = batch_bytes
+        # (topic, partition, priority) -> _PendingBatch
+        self._pending = {}
+        self._condition = threading.Condition()
+        self._flusher = None
+        # Messages stored and Redis round trips used to store them
+        self.stats = {"messages": 0, "round_trips": 0}
+
+    def submit(self, topic_name, partition, message, priority=0):
+        """Queue a message for a partition; the returned Future resolves once it is stored."""
+        future = Future()
+        with self._condition:
+            if self._flusher is None:
+                self._start()
+            key = (topic_name, int(partition), priority)
+            batch = self._pending.get(key)
+            if batch is None:
+                batch = self._pending[key] = _PendingBatch(time.monotonic() + self.linger_ms / 1000)
+                # Batches created later are due later, so only an idle flusher needs waking up
+                wake = len(self._pending) == 1
+            else:
+                wake = False
+            batch.messages.append(message)
+            batch.futures.append(future)
+            batch.size += len(message)
+            if wake or batch.size >= self.batch_bytes:
+                self._condition.notify()
+        return future
+
+    def write(self, topic_name, partition, message, timeout=None, priority=0):
+        """Queue a message and wait until it is stored (by default, as long as the request has left).
+
+        Returns True once it is stored. On timeout, a message still waiting for
+        its batch is withdrawn and TimeoutError (or DeadlineExceeded) is raised,
+        so the caller may retry it; one whose batch is already being written
+        cannot be, and False is returned: it was accepted and will be stored
+        unless Redis fails.
+        """
+        if timeout is None:
+            timeout = deadline.remaining()
+        # The pipelined write itself runs on the flusher thread, outside the caller's trace
+        with tracing.child_span("redis.coalesced_write", topic=topic_name, partition=partition):
+            future = self.submit(topic_name, partition, message, priority)
+            try:
+                future.result(timeout)
+            except TimeoutError:
+                if not future.cancel():
+                    return False
+                deadline.check()
+                raise
+            return True
+
+    def _due_batches(self):
+        """Wait for batches to flush and take them out of the pending map (holding the condition)."""
+        while True:
+            now = time.monotonic()
+            due = [key for key, batch in self._pending.items()
+                   if batch.deadline <= now or batch.size >= self.batch_bytes]
+            if due:
+                return [(key, self._withdraw_cancelled(self._pending.pop(key))) for key in due]
+            next_deadline = min((batch.deadline for batch in self._pending.values()), default=None)
+            self._condition.wait(None if next_deadline is None else next_deadline - now)
+
+    @staticmethod
+    def _withdraw_cancelled(batch):
+        """Drop the messages whose Future was cancelled; the others can no longer be."""
+        kept = [(message, future) for message, future in zip(batch.messages, batch.futures)
+                if future.set_running_or_notify_cancel()]
+        batch.messages = [message for message, _ in kept]
+        batch.futures = [future for _, future in kept]
+        return batch
+
+    def _flush(self, batches):
+        by_client = {}
+        for (topic_name, partition, priority), batch in batches:
+            if not batch.messages:
+                continue
+            try:
+                client = self.shards.client_for(topic_name, partition)
+            except Exception as e:
+                self._fail(batch, e)
+                continue
+            by_client.setdefault(id(client), (client, []))[1].append((topic_name, partition, priority, batch))
+
+        now_ms = int(time.time() * 1000)
+        for client, entries in by_client.values():
+            pipe = client.pipeline(transaction=False)
+            for topic_name, partition, priority, batch in entries:
+                pipe.rpush(partition_key(topic_name, partition, priority), *batch.messages)
+                record_enqueued(pipe, topic_name, partition, batch.messages, now_ms)
+            try:
+                # One RPUSH and three counter updates per partition; only the RPUSH results matter
+                results = pipe.execute(raise_on_error=False)[::4]
+            except Exception as e:
+                print(f"[WriteCoalescer] Error flushing {len(entries)} partitions: {e}")
+                for *_, batch in entries:
+                    self._fail(batch, e)
+                continue
+            self.stats["round_trips"] += 1
+            for (*_, batch), result in zip(entries, results):
+                if isinstance(result, Exception):
+                    self._fail(batch, result)
+                    continue
+                self.stats["messages"] += len(batch.messages)
+                for future in batch.futures:
+                    future.set_result(None)
+
+    def _fail(self, batch, error):
+        for future in batch.futures:
+            future.set_exception(error)
+
+    def _start(self):
+        def flusher_worker():
+            while True:
+                with self._condition:
+                    batches = self._due_batches()
+                try:
+                    self._flush(batches)
+                except Exception as e:
+                    print(f"[WriteCoalescer] Error flushing writes: {e}")
+                    for _, batch in batches:
+                        for future in batch.futures:
+                            if not future.done():
+                                future.set_exception(e)
+
+        self._flusher = threading.Thread(target=flusher_worker, name="write-coalescer", daemon=True)
+        self._flusher.start()
+        print(f"[WriteCoalescer] Coalescing partition writes "
+              f"(linger {self.linger_ms}ms, batch {self.batch_bytes} bytes)")
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""Measure what logging every message costs the caller, per audit log writer.
+
+Logs --messages events from --threads threads, the way gRPC workers would on
+the publish path, with the old open/append/close per event and with the
+buffered AuditLog in text and binary format. Reports the time each call
+holds the caller and how long it takes until every event is on disk.
+
+    python test/benchmark_audit_log.py --messages 200000 --threads 8 --size 100
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+# Add parent directory to import path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from server.audit_log import AuditLog
+
+
+def percentile(values, fraction):
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class OpenPerEvent:
+    """The former MasterNode.log_message: one open/append/close per event."""
+
+    def __init__(self, directory):
+        self.path = os.path.join(directory, "global_log.txt")
+
+    def log(self, action, topic, message, partition=-1):
+        with open(self.path, "a") as f:
+            f.write(f"[{action}] Topic: {topic}, Message: {message}\n")
+
+    def close(self):
+        pass
+
+
+def run(writer, args):
+    message = "x" * args.size
+    per_thread = args.messages // args.threads
+    latencies = [[] for _ in range(args.threads)]
+
+    def log_events(samples):
+        for n in range(per_thread):
+            started = time.perf_counter()
+            writer.log("SEND", "bench_audit", message, n % 8)
+            samples.append(time.perf_counter() - started)
+
+    threads = [threading.Thread(target=log_events, args=(samples,)) for samples in latencies]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    logged = time.perf_counter() - started
+    writer.close()
+    durable = time.perf_counter() - started
+    return [latency for samples in latencies for latency in samples], logged, durable
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MOM audit log benchmark")
+    parser.add_argument("--messages", type=int, default=200000, help="Events logged per writer")
+    parser.add_argument("--threads", type=int, default=8, help="Threads logging concurrently")
+    parser.add_argument("--size", type=int, default=100, help="Message size in bytes")
+    args = parser.parse_args()
+
+    results = {}
+    for name, make in (("open per event", OpenPerEvent),
+                       ("buffered text", lambda directory: AuditLog("audit", directory, "text")),
+                       ("buffered binary", lambda directory: AuditLog("audit", directory, "binary"))):
+        with tempfile.TemporaryDirectory() as directory:
+            writer = make(directory)
+            latencies, logged, durable = run(writer, args)
+            dropped = getattr(writer, "stats", {}).get("dropped", 0)
+            results[name] = (latencies, logged, durable, dropped)
+
+    print("\n===== RESULTS =====")
+    print(f"{'writer':16} {'events/s':>10} {'p50 us':>8} {'p99 us':>8} {'on disk s':>10} {'dropped':>8}")
+    for name, (latencies, logged, durable, dropped) in results.items():
+        print(f"{name:16} {len(latencies) / logged:>10.0f} {percentile(latencies, 0.5) * 1e6:>8.1f} "
+              f"{percentile(latencies, 0.99) * 1e6:>8.1f} {durable:>10.2f} {dropped:>8}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
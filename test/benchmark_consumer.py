@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""Compare one ReceiveMessage call per message with the prefetching consumer client.
+
+Needs a running Redis (REDIS_HOST/REDIS_PORT). Starts a MOM instance in a
+separate process, fills a topic, then drains it once with blocking
+ReceiveMessage calls and once with client/consumer.py, spending --work-ms on
+every message to stand in for processing. Reports throughput and how long
+each message took to arrive once the previous one was processed.
+
+    python test/benchmark_consumer.py --messages 20000 --work-ms 0.1
+"""
+
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+import grpc
+
+# Add parent directory to import path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from client.consumer import Consumer
+from server.global_topic import get_registry
+from server.grpc_server import create_server
+from server.mom_instance import MOMInstance
+from server.grpc_generated import mom_pb2, mom_pb2_grpc
+from utils.utils import find_free_port
+
+
+def serve(port, ready):
+    """Run a MOM instance server; a separate process keeps its GIL apart from the client's."""
+    instance = MOMInstance("bench-consumer", grpc_port=port, storage_dir=tempfile.mkdtemp())
+    server = create_server(instance)
+    server.add_insecure_port(f"[::]:{port}")
+    server.start()
+    ready.set()
+    server.wait_for_termination()
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def fill(registry, topic, messages):
+    for partition in range(3):
+        registry.enqueue_batch(topic, partition, [f"m{partition}-{i}" for i in range(messages // 3)])
+    return messages // 3 * 3
+
+
+def busy_wait(ms):
+    end = time.perf_counter() + ms / 1000
+    while time.perf_counter() < end:
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MOM consumer client benchmark")
+    parser.add_argument("--messages", type=int, default=20000, help="Messages consumed in each phase")
+    parser.add_argument("--work-ms", type=float, default=0.1, help="Processing time per message")
+    parser.add_argument("--max-buffered", type=int, default=500, help="Consumer buffer per partition")
+    args = parser.parse_args()
+
+    port = find_free_port()
+    ready = multiprocessing.Event()
+    server = multiprocessing.Process(target=serve, args=(port, ready), daemon=True)
+    server.start()
+    ready.wait()
+    address = f"localhost:{port}"
+
+    registry = get_registry()
+    topic = f"bench_consumer_{int(time.time())}"
+    registry.create_topic(topic, 3)
+    results = {}
+    try:
+        total = fill(registry, topic, args.messages)
+        waits = []
+        with grpc.insecure_channel(address) as channel:
+            stub = mom_pb2_grpc.MessageServiceStub(channel)
+            start = time.perf_counter()
+            for _ in range(total):
+                asked = time.perf_counter()
+                response = stub.ReceiveMessage(mom_pb2.MessageRequest(topic=topic), timeout=30)
+                waits.append(time.perf_counter() - asked)
+                if response.status != "Success":
+                    break
+                busy_wait(args.work_ms)
+            results["ReceiveMessage"] = (len(waits), time.perf_counter() - start, waits)
+
+        total = fill(registry, topic, args.messages)
+        waits = []
+        with Consumer(address, topic, max_buffered=args.max_buffered) as consumer:
+            start = time.perf_counter()
+            for _ in range(total):
+                asked = time.perf_counter()
+                if consumer.poll(30) is None:
+                    break
+                waits.append(time.perf_counter() - asked)
+                busy_wait(args.work_ms)
+            results["Consumer"] = (len(waits), time.perf_counter() - start, waits)
+
+        print("\n===== RESULTS =====")
+        print(f"{'client':16} {'msg/s':>9} {'wait p50 ms':>12} {'wait p99 ms':>12}")
+        for name, (received, elapsed, waits) in results.items():
+            print(f"{name:16} {received / elapsed:>9.0f} {percentile(waits, 0.5) * 1000:>12.3f} "
+                  f"{percentile(waits, 0.99) * 1000:>12.3f}")
+        return 0 if all(received == total for received, _, _ in results.values()) else 1
+    finally:
+        server.terminate()
+        server.join()
+        registry.delete_topic(topic)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""Kill the master node and measure how long producers cannot send, and whether messages are lost.
+
+Needs a local, disposable Redis (REDIS_HOST/REDIS_PORT): it starts a master
+and --nodes MOM instances as subprocesses, sends a message to the current
+master every --interval ms, SIGKILLs the master after --kill-after seconds
+and keeps sending through whichever node is promoted.
+
+    python test/benchmark_failover.py --nodes 2 --kill-after 5 --duration 15
+"""
+
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import grpc
+
+# Add parent directory to import path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from server.global_topic import get_registry
+from server.membership import ClusterMembership
+from server.mom_instance import MOMInstance  # noqa: F401 (sets up the grpc_generated import path)
+from server.redis_pool import get_redis
+from server.grpc_generated import mom_pb2, mom_pb2_grpc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MASTER_KEYS = ("master_node", "master_node_public", "master_node_port", "master_node_heartbeat",
+               "master_node_election")
+
+
+def start(args, log_dir, name):
+    log = open(os.path.join(log_dir, f"{name}.log"), "w")
+    return subprocess.Popen([sys.executable, "-m", *args], cwd=ROOT, stdout=log, stderr=subprocess.STDOUT)
+
+
+def wait_for(condition, timeout, what):
+    deadline = time.time() + timeout
+    while not condition():
+        if time.time() > deadline:
+            raise TimeoutError(f"Timed out waiting for {what}")
+        time.sleep(0.05)
+
+
+def produce(redis_client, topic, interval, stop, results):
+    """Send numbered messages to whichever node is the master; record acknowledgements."""
+    address, channel, stub = None, None, None
+    i = 0
+    while not stop.is_set():
+        sent_at = time.time()
+        try:
+            current = redis_client.get("master_node")
+            if current != address:
+                address = current
+                if channel:
+                    channel.close()
+                # Short reconnect backoff: measure the cluster, not the client's retry schedule
+                channel = grpc.insecure_channel(address, options=[
+                    ("grpc.initial_reconnect_backoff_ms", 50),
+                    ("grpc.max_reconnect_backoff_ms", 200),
+                    ("grpc.min_reconnect_backoff_ms", 200),
+                ]) if address else None
+                stub = mom_pb2_grpc.MessageServiceStub(channel) if channel else None
+                if address:
+                    results["masters"].append((time.time(), address))
+            if stub is None:
+                raise ConnectionError("no master registered")
+            response = stub.SendMessage(mom_pb2.MessageRequest(topic=topic, message=f"m{i}"), timeout=0.5)
+            if response.status == "Success":
+                results["acked"].append((sent_at, f"m{i}"))
+            else:
+                results["failed"].append(sent_at)
+        except Exception:
+            results["failed"].append(sent_at)
+        i += 1
+        time.sleep(interval / 1000)
+    if channel:
+        channel.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MOM master failover benchmark")
+    parser.add_argument("--nodes", type=int, default=2, help="MOM instances besides the master")
+    parser.add_argument("--kill-after", type=float, default=5.0, help="Seconds of traffic before killing the master")
+    parser.add_argument("--duration", type=float, default=15.0, help="Total seconds of traffic")
+    parser.add_argument("--interval", type=float, default=10.0, help="Milliseconds between messages")
+    args = parser.parse_args()
+
+    redis_client = get_redis()
+    if redis_client.exists("master_node"):
+        print("❌ A master node is already registered in this Redis; use a disposable Redis")
+        return 1
+    redis_client.delete(*MASTER_KEYS)
+
+    log_dir = tempfile.mkdtemp(prefix="mom-failover-")
+    processes = [start(["server.master_node_server"], log_dir, "master")]
+    master = processes[0]
+    membership = ClusterMembership(redis_client)
+    topic = f"bench_failover_{int(time.time())}"
+    registry = get_registry()
+    try:
+        wait_for(lambda: redis_client.exists("master_node_heartbeat"), 30, "the master node")
+        master_address = redis_client.get("master_node")
+        for n in range(args.nodes):
+            processes.append(start(["server.join_cluster", f"--master-url={master_address}",
+                                    f"--instance-name=bench-failover-{n}"], log_dir, f"node-{n}"))
+        wait_for(lambda: len(membership.fetch()) >= args.nodes + 1, 30, "the nodes to join")
+        registry.create_topic(topic, 3)
+        print(f"Master at {master_address}, {args.nodes} nodes joined (logs in {log_dir})")
+
+        results = {"acked": [], "failed": [], "masters": []}
+        stop = threading.Event()
+        producer = threading.Thread(target=produce, args=(redis_client, topic, args.interval, stop, results))
+        producer.start()
+        time.sleep(args.kill_after)
+        killed_at = time.time()
+        master.send_signal(signal.SIGKILL)
+        print(f"💀 Killed the master (pid {master.pid})")
+        time.sleep(max(0, args.duration - args.kill_after))
+        stop.set()
+        producer.join()
+
+        acked = [message for _, message in results["acked"]]
+        stored = set()
+        for partition in range(3):
+            stored.update(redis_client.lrange(f"{topic}:partition{partition}", 0, -1))
+        lost = [message for message in acked if message not in stored]
+        after_kill = [sent_at for sent_at, _ in results["acked"] if sent_at > killed_at]
+        new_masters = [(at, address) for at, address in results["masters"] if at > killed_at]
+
+        print("\n===== RESULTS =====")
+        if new_masters:
+            print(f"New master registered after: {(new_masters[0][0] - killed_at) * 1000:.0f} ms "
+                  f"({new_masters[0][1]})")
+        else:
+            print("New master registered after: never")
+        if after_kill:
+            print(f"Unavailability window: {(after_kill[0] - killed_at) * 1000:.0f} ms")
+        else:
+            print("Unavailability window: no message was accepted after the kill")
+        print(f"Messages acknowledged: {len(acked)}, failed sends: {len(results['failed'])}")
+        print(f"Acknowledged messages lost: {len(lost)}")
+        return 0 if after_kill and not lost else 1
+    finally:
+        for process in processes:
+            if process.poll() is None:
+                process.terminate()
+        for process in processes:
+            try:
+                process.wait(10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        registry.delete_topic(topic)
+        redis_client.delete(*MASTER_KEYS)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
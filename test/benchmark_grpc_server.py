@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""Compare the thread pool and asyncio (grpc.aio) gRPC servers of a MOM instance.
+
+Needs a running Redis (REDIS_HOST/REDIS_PORT). For each server mode it measures
+unary SendMessage/ReceiveMessage throughput and latency at several client
+concurrency levels, then holds many ReplicatePartition streams open and checks
+whether unary RPCs are still served meanwhile.
+
+    python test/benchmark_grpc_server.py --concurrency 10 100 1000 --streams 500
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+
+import grpc
+
+# Add parent directory to import path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from server.global_topic import get_registry
+from server.grpc_server import GRPC_SERVER_MODES, create_server
+from server.mom_instance import MOMInstance
+from server.grpc_generated import mom_pb2, mom_pb2_grpc
+from utils.utils import encode_batch, find_free_port
+
+
+def serve(mode, port, max_workers, ready):
+    """Run a MOM instance server; a separate process keeps the client's event loop apart."""
+    instance = MOMInstance(f"bench-{mode}", grpc_port=port, storage_dir=tempfile.mkdtemp(), server_mode=mode)
+    server = create_server(instance, mode, max_workers=max_workers)
+    server.add_insecure_port(f"[::]:{port}")
+    server.start()
+    ready.set()
+    server.wait_for_termination()
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+async def unary_phase(address, topic, concurrency, requests):
+    """Send then receive `requests` messages with `concurrency` RPCs in flight."""
+    latencies = []
+    errors = Counter()
+    limit = asyncio.Semaphore(concurrency)
+
+    async with grpc.aio.insecure_channel(address) as channel:
+        stub = mom_pb2_grpc.MessageServiceStub(channel)
+
+        async def call(method, request):
+            async with limit:
+                start = time.perf_counter()
+                try:
+                    await method(request, timeout=30)
+                    latencies.append(time.perf_counter() - start)
+                except grpc.aio.AioRpcError as e:
+                    errors[e.code().name] += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(call(stub.SendMessage, mom_pb2.MessageRequest(topic=topic, message=f"m{i}"))
+                               for i in range(requests)))
+        await asyncio.gather(*(call(stub.ReceiveMessage, mom_pb2.MessageRequest(topic=topic))
+                               for _ in range(requests)))
+        elapsed = time.perf_counter() - start
+
+    return {
+        "rps": len(latencies) / elapsed,
+        "p50": percentile(latencies, 0.5) * 1000 if latencies else 0,
+        "p99": percentile(latencies, 0.99) * 1000 if latencies else 0,
+        "errors": dict(errors),
+    }
+
+
+async def stream_phase(address, topic, streams, hold):
+    """Hold `streams` replication streams open and time a unary RPC meanwhile."""
+    async with grpc.aio.insecure_channel(address) as channel:
+        stub = mom_pb2_grpc.MessageServiceStub(channel)
+
+        async def chunks(source):
+            yield mom_pb2.PartitionChunk(topic=topic, partition=0, source=source, start_offset=0,
+                                         count=1, payload=encode_batch(["x"]))
+            await asyncio.sleep(hold)
+
+        async def replicate(i):
+            try:
+                ack = await stub.ReplicatePartition(chunks(f"bench-stream-{i}"), timeout=hold + 30)
+                return ack.status == "Success"
+            except grpc.aio.AioRpcError:
+                return False
+
+        tasks = [asyncio.ensure_future(replicate(i)) for i in range(streams)]
+        await asyncio.sleep(hold / 2)
+        start = time.perf_counter()
+        try:
+            await stub.SendMessage(mom_pb2.MessageRequest(topic=topic, message="during streams"), timeout=hold)
+            unary_ms = (time.perf_counter() - start) * 1000
+        except grpc.aio.AioRpcError as e:
+            unary_ms = f"failed ({e.code().name})"
+        completed = sum(await asyncio.gather(*tasks))
+    return {"completed": completed, "unary_ms": unary_ms}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MOM gRPC server mode benchmark")
+    parser.add_argument("--modes", nargs="+", choices=GRPC_SERVER_MODES, default=list(GRPC_SERVER_MODES))
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[10, 100, 1000])
+    parser.add_argument("--requests", type=int, default=5000, help="Messages sent and received per level")
+    parser.add_argument("--streams", type=int, default=500, help="Concurrent replication streams")
+    parser.add_argument("--hold", type=float, default=2.0, help="Seconds each stream stays open")
+    parser.add_argument("--max-workers", type=int, default=10)
+    args = parser.parse_args()
+
+    registry = get_registry()
+    results = {}
+    for mode in args.modes:
+        port = find_free_port()
+        ready = multiprocessing.Event()
+        server = multiprocessing.Process(target=serve, args=(mode, port, args.max_workers, ready), daemon=True)
+        server.start()
+        ready.wait()
+
+        topic = f"bench_grpc_{mode}_{int(time.time())}"
+        registry.create_topic(topic, 3)
+        address = f"localhost:{port}"
+        try:
+            for concurrency in args.concurrency:
+                results[(mode, concurrency)] = asyncio.run(
+                    unary_phase(address, topic, concurrency, args.requests))
+            results[(mode, "streams")] = asyncio.run(stream_phase(address, topic, args.streams, args.hold))
+        finally:
+            server.terminate()
+            server.join()
+            registry.delete_topic(topic)
+
+    print("\n===== RESULTS =====")
+    print(f"{'mode':8} {'in flight':>10} {'req/s':>10} {'p50 ms':>9} {'p99 ms':>9}  errors")
+    for mode in args.modes:
+        for concurrency in args.concurrency:
+            r = results[(mode, concurrency)]
+            print(f"{mode:8} {concurrency:>10} {r['rps']:>10.0f} {r['p50']:>9.2f} {r['p99']:>9.2f}  {r['errors'] or '-'}")
+    print()
+    for mode in args.modes:
+        r = results[(mode, "streams")]
+        unary = r["unary_ms"] if isinstance(r["unary_ms"], str) else f"{r['unary_ms']:.2f} ms"
+        print(f"{mode:8} {r['completed']}/{args.streams} streams completed, "
+              f"SendMessage while streams were open: {unary}")
+
+
+if __name__ == "__main__":
+    main()
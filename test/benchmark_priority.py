@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""Measure how long urgent messages wait behind a bulk backlog, with and without priorities.
+
+Needs a running Redis (REDIS_HOST/REDIS_PORT). Starts a MOM instance in a
+separate process and, for each phase, keeps a one-partition topic loaded with
+bulk traffic at priority 0 and a trickle of urgent messages while a consumer
+drains it with ReceiveMessage, spending --work-ms on every message. The bulk
+rate is a little above what the consumer keeps up with, so a backlog builds.
+The first phase sends the urgent messages at priority 0 like the rest, the
+second at priority 9. Reports the end-to-end latency of each class.
+
+    python test/benchmark_priority.py --seconds 10 --bulk-rate 3000 --urgent-rate 50
+"""
+
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import grpc
+
+# Add parent directory to import path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from server.global_topic import PRIORITY_MAX, get_registry
+from server.grpc_server import create_server
+from server.mom_instance import MOMInstance
+from server.grpc_generated import mom_pb2, mom_pb2_grpc
+from utils.utils import find_free_port
+
+
+def serve(port, ready):
+    """Run a MOM instance server; a separate process keeps its GIL apart from the client's."""
+    instance = MOMInstance("bench-priority", grpc_port=port, storage_dir=tempfile.mkdtemp())
+    server = create_server(instance)
+    server.add_insecure_port(f"[::]:{port}")
+    server.start()
+    ready.set()
+    server.wait_for_termination()
+
+
+def percentile(values, fraction):
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def busy_wait(ms):
+    end = time.perf_counter() + ms / 1000
+    while time.perf_counter() < end:
+        pass
+
+
+def produce(registry, topic, seconds, bulk_rate, urgent_rate, urgent_priority, stop):
+    """Send both classes every 10ms; messages are "<class>|<sent at>"."""
+    tick = 0.01
+    bulk_due = urgent_due = 0.0
+    end = time.time() + seconds
+    while time.time() < end and not stop.is_set():
+        started = time.perf_counter()
+        bulk_due += bulk_rate * tick
+        urgent_due += urgent_rate * tick
+        if int(bulk_due):
+            registry.enqueue_batch(topic, 0, [f"bulk|{time.time()}"] * int(bulk_due))
+            bulk_due -= int(bulk_due)
+        if int(urgent_due):
+            registry.enqueue_batch(topic, 0, [f"urgent|{time.time()}"] * int(urgent_due),
+                                   priority=urgent_priority)
+            urgent_due -= int(urgent_due)
+        time.sleep(max(0.0, tick - (time.perf_counter() - started)))
+
+
+def run_phase(registry, address, args, urgent_priority):
+    topic = f"bench_priority_{urgent_priority}_{int(time.time())}"
+    registry.create_topic(topic, 1)
+    latencies = {"bulk": [], "urgent": []}
+    stop = threading.Event()
+    producer = threading.Thread(
+        target=produce, args=(registry, topic, args.seconds, args.bulk_rate, args.urgent_rate,
+                              urgent_priority, stop), daemon=True)
+    try:
+        with grpc.insecure_channel(address) as channel:
+            stub = mom_pb2_grpc.MessageServiceStub(channel)
+            producer.start()
+            # Only the messages consumed while the producer runs count; the rest is backlog
+            while producer.is_alive():
+                response = stub.ReceiveMessage(mom_pb2.MessageRequest(topic=topic), timeout=30)
+                if response.status != "Success":
+                    continue
+                kind, sent_at = response.message.split("|")
+                latencies[kind].append(time.time() - float(sent_at))
+                busy_wait(args.work_ms)
+    finally:
+        stop.set()
+        producer.join()
+        registry.delete_topic(topic)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MOM message priority benchmark")
+    parser.add_argument("--seconds", type=float, default=10, help="Duration of each phase")
+    parser.add_argument("--bulk-rate", type=int, default=3000, help="Bulk messages per second (priority 0)")
+    parser.add_argument("--urgent-rate", type=int, default=50, help="Urgent messages per second")
+    parser.add_argument("--work-ms", type=float, default=0.3, help="Processing time per message")
+    args = parser.parse_args()
+
+    port = find_free_port()
+    ready = multiprocessing.Event()
+    server = multiprocessing.Process(target=serve, args=(port, ready), daemon=True)
+    server.start()
+    ready.wait()
+    address = f"localhost:{port}"
+
+    registry = get_registry()
+    results = {}
+    try:
+        results["no priorities"] = run_phase(registry, address, args, 0)
+        results[f"urgent at {PRIORITY_MAX}"] = run_phase(registry, address, args, PRIORITY_MAX)
+    finally:
+        server.terminate()
+        server.join()
+
+    print("\n===== RESULTS =====")
+    print(f"{'phase':16} {'class':8} {'received':>9} {'p50 ms':>10} {'p99 ms':>10}")
+    for name, latencies in results.items():
+        for kind, values in latencies.items():
+            print(f"{name:16} {kind:8} {len(values):>9} {percentile(values, 0.5) * 1000:>10.1f} "
+                  f"{percentile(values, 0.99) * 1000:>10.1f}")
+    return 0 if all(latencies["urgent"] for latencies in results.values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
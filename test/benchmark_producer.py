@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""Compare one-at-a-time SendMessage calls with the batching producer client.
+
+Needs a running Redis (REDIS_HOST/REDIS_PORT). Starts a MOM instance in a
+separate process, sends --messages messages through client/producer.py and a
+smaller number with blocking SendMessage calls, then checks every message the
+producer acknowledged was stored exactly once.
+
+    python test/benchmark_producer.py --messages 100000 --linger-ms 5 --batch-size 65536
+"""
+
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+import grpc
+
+# Add parent directory to import path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from client.producer import Producer
+from server.global_topic import get_registry
+from server.mom_instance import MOMInstance
+from server.grpc_server import create_server
+from server.grpc_generated import mom_pb2, mom_pb2_grpc
+from utils.utils import find_free_port
+
+
+def serve(port, ready):
+    """Run a MOM instance server; a separate process keeps its GIL apart from the client's."""
+    instance = MOMInstance("bench-producer", grpc_port=port, storage_dir=tempfile.mkdtemp())
+    server = create_server(instance)
+    server.add_insecure_port(f"[::]:{port}")
+    server.start()
+    ready.set()
+    server.wait_for_termination()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MOM producer client benchmark")
+    parser.add_argument("--messages", type=int, default=100000, help="Messages sent by the producer")
+    parser.add_argument("--unary-messages", type=int, default=2000, help="Messages sent with SendMessage")
+    parser.add_argument("--size", type=int, default=100, help="Message size in bytes")
+    parser.add_argument("--linger-ms", type=float, default=5)
+    parser.add_argument("--batch-size", type=int, default=64 * 1024)
+    parser.add_argument("--max-in-flight", type=int, default=16)
+    parser.add_argument("--no-compression", action="store_true")
+    args = parser.parse_args()
+
+    port = find_free_port()
+    ready = multiprocessing.Event()
+    server = multiprocessing.Process(target=serve, args=(port, ready), daemon=True)
+    server.start()
+    ready.wait()
+    address = f"localhost:{port}"
+
+    registry = get_registry()
+    topic = f"bench_producer_{int(time.time())}"
+    registry.create_topic(topic, 3)
+    padding = "x" * max(0, args.size - 12)
+    try:
+        with grpc.insecure_channel(address) as channel:
+            stub = mom_pb2_grpc.MessageServiceStub(channel)
+            start = time.perf_counter()
+            for i in range(args.unary_messages):
+                stub.SendMessage(mom_pb2.MessageRequest(topic=topic, message=f"u{i}-{padding}"), timeout=30)
+            unary_rate = args.unary_messages / (time.perf_counter() - start)
+
+        producer = Producer(address, linger_ms=args.linger_ms, batch_size=args.batch_size,
+                            max_in_flight=args.max_in_flight, compression=not args.no_compression)
+        start = time.perf_counter()
+        futures = [producer.send(topic, f"p{i}-{padding}") for i in range(args.messages)]
+        producer.close()
+        elapsed = time.perf_counter() - start
+        failed = sum(1 for future in futures if future.exception())
+
+        stored = []
+        for partition in range(3):
+            stored += registry.shards.client_for(topic, partition).lrange(f"{topic}:partition{partition}", 0, -1)
+        produced = [message for message in stored if message.startswith("p")]
+
+        print("\n===== RESULTS =====")
+        print(f"SendMessage, one at a time: {unary_rate:>10.0f} msg/s")
+        print(f"Producer client:            {args.messages / elapsed:>10.0f} msg/s "
+              f"(linger {args.linger_ms}ms, batch {args.batch_size} bytes)")
+        print(f"Failed sends: {failed}, stored: {len(produced)}, duplicates: {len(produced) - len(set(produced))}")
+        return 0 if not failed and len(produced) == args.messages == len(set(produced)) else 1
+    finally:
+        server.terminate()
+        server.join()
+        registry.delete_topic(topic)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
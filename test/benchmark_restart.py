@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""Measure restart time: from constructing a GlobalTopicRegistry to the first served message.
+
+Uses a dedicated Redis database (default 15) which is FLUSHED before and after the run.
+
+    python test/benchmark_restart.py --topics 10000 --partitions 3 --runs 5
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import redis
+
+# Add parent directory to import path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from server.global_topic import GlobalTopicRegistry
+from server.state_manager import CATALOG_EPOCH_KEY, StateManager
+
+
+def connect(args):
+    return redis.Redis(host=args.redis_host, port=args.redis_port, db=args.db, decode_responses=True)
+
+
+def restart(args, state_file, first_topic):
+    """Build a fresh registry and serve one message; returns (seconds, message)."""
+    start = time.perf_counter()
+    registry = GlobalTopicRegistry(redis_client=connect(args), state_manager=StateManager(state_file))
+    message = registry.dequeue_from_partitions(first_topic, range(args.partitions))
+    elapsed = time.perf_counter() - start
+    # Put the message back for the next run
+    registry.enqueue_message(first_topic, message)
+    return elapsed, message
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MOM restart recovery benchmark")
+    parser.add_argument("--redis-host", default=os.getenv("REDIS_HOST", "localhost"))
+    parser.add_argument("--redis-port", type=int, default=int(os.getenv("REDIS_PORT", 6379)))
+    parser.add_argument("--db", type=int, default=15, help="Redis database to use (flushed)")
+    parser.add_argument("--topics", type=int, default=10000)
+    parser.add_argument("--partitions", type=int, default=3)
+    parser.add_argument("--backlog", type=int, default=1000, help="Messages queued before restarting")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    client = connect(args)
+    client.flushdb()
+    state_file = os.path.join(tempfile.mkdtemp(prefix="mom-restart-"), "topics_state.json")
+    topics = [f"bench_restart_{i}" for i in range(args.topics)]
+
+    # Checkpoint written by a previous run of the cluster
+    state_manager = StateManager(state_file)
+    state_manager.state = {topic: {"partitions": args.partitions} for topic in topics}
+    state_manager.state["catalog_epoch"] = args.topics
+    state_manager.save_state()
+
+    try:
+        # Redis lost its catalog (e.g. a fresh Redis): the catalog is rebuilt from the checkpoint
+        start = time.perf_counter()
+        registry = GlobalTopicRegistry(redis_client=client, state_manager=StateManager(state_file))
+        rebuild = time.perf_counter() - start
+        print(f"Catalog rebuild for {args.topics} topics: {rebuild * 1000:.1f} ms "
+              f"(epoch {client.get(CATALOG_EPOCH_KEY)})")
+
+        registry.enqueue_message(topics[0], "first message")
+        for i in range(args.backlog):
+            registry.enqueue_message(topics[i % len(topics)], f"backlog message {i}")
+        queued = args.backlog + 1
+
+        timings = []
+        for run in range(args.runs):
+            elapsed, message = restart(args, state_file, topics[0])
+            if message is None:
+                print("❌ No message served after restart")
+                return 1
+            timings.append(elapsed)
+            print(f"Restart {run + 1}: first message served after {elapsed * 1000:.2f} ms")
+
+        remaining = sum(
+            client.llen(f"{topic}:partition{p}")
+            for topic in topics[:max(1, min(args.backlog, len(topics)))]
+            for p in range(args.partitions))
+        print("\n===== RESULTS =====")
+        print(f"Topics: {args.topics} x {args.partitions} partitions")
+        print(f"Time to first message: median {statistics.median(timings) * 1000:.2f} ms, "
+              f"min {min(timings) * 1000:.2f} ms, max {max(timings) * 1000:.2f} ms")
+        print(f"Queued messages kept across restarts: {remaining}/{queued}")
+        return 0 if remaining == queued else 1
+    finally:
+        client.flushdb()
+        os.remove(state_file)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
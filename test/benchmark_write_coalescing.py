@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""Measure how many Redis round trips concurrent partition writes take with and without coalescing.
+
+Needs a running Redis (REDIS_HOST/REDIS_PORT). --threads writers each store
+--messages messages into a 3-partition topic, first with one RPUSH per
+message, then through a WriteCoalescer for every --linger-ms value.
+
+    python test/benchmark_write_coalescing.py --threads 64 --messages 200 --linger-ms 0 1 5
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+# Add parent directory to import path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from server.global_topic import get_registry
+from server.write_coalescer import WRITE_BATCH_BYTES, WriteCoalescer
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def run(registry, topic, threads, messages, write):
+    """Write from several threads at once; returns (seconds, per-write latencies in ms)."""
+    latencies = [[] for _ in range(threads)]
+    start_barrier = threading.Barrier(threads + 1)
+
+    def writer(n):
+        start_barrier.wait()
+        for i in range(messages):
+            message = f"w{n}-m{i}"
+            started = time.perf_counter()
+            write(topic, registry.choose_partition(message, 3), message)
+            latencies[n].append((time.perf_counter() - started) * 1000)
+
+    workers = [threading.Thread(target=writer, args=(n,)) for n in range(threads)]
+    for worker in workers:
+        worker.start()
+    start_barrier.wait()
+    started = time.perf_counter()
+    for worker in workers:
+        worker.join()
+    return time.perf_counter() - started, [latency for per_thread in latencies for latency in per_thread]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MOM write coalescing benchmark")
+    parser.add_argument("--threads", type=int, default=64, help="Concurrent writers")
+    parser.add_argument("--messages", type=int, default=200, help="Messages per writer")
+    parser.add_argument("--linger-ms", type=float, nargs="+", default=[0, 1, 5], help="Linger values to compare")
+    parser.add_argument("--batch-bytes", type=int, default=WRITE_BATCH_BYTES, help="Batch size that forces a flush")
+    args = parser.parse_args()
+
+    registry = get_registry()
+    topic = f"bench_coalescing_{int(time.time())}"
+    registry.create_topic(topic, 3)
+    total = args.threads * args.messages
+
+    def direct(topic_name, partition, message):
+        registry.shards.client_for(topic_name, partition).rpush(f"{topic_name}:partition{partition}", message)
+
+    print(f"\n{'mode':>14} {'msg/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'round trips':>12} {'per msg':>8}")
+    try:
+        elapsed, latencies = run(registry, topic, args.threads, args.messages, direct)
+        print(f"{'direct':>14} {total / elapsed:>9.0f} {percentile(latencies, 0.5):>8.2f} "
+              f"{percentile(latencies, 0.99):>8.2f} {total:>12} {1:>8.3f}")
+
+        for linger_ms in args.linger_ms:
+            coalescer = WriteCoalescer(registry.shards, linger_ms=linger_ms, batch_bytes=args.batch_bytes)
+            elapsed, latencies = run(registry, topic, args.threads, args.messages, coalescer.write)
+            round_trips = coalescer.stats["round_trips"]
+            print(f"{f'linger {linger_ms}ms':>14} {total / elapsed:>9.0f} {percentile(latencies, 0.5):>8.2f} "
+                  f"{percentile(latencies, 0.99):>8.2f} {round_trips:>12} {round_trips / total:>8.3f}")
+
+        stored = sum(registry.shards.client_for(topic, p).llen(f"{topic}:partition{p}") for p in range(3))
+        expected = total * (len(args.linger_ms) + 1)
+        print(f"\nMessages stored: {stored} of {expected}")
+        return 0 if stored == expected else 1
+    finally:
+        registry.delete_topic(topic)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
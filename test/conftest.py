@@ -0,0 +1,38 @@
+import os
+import sys
+
+import fakeredis
+import pytest
+
+# Add parent directory to import path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "server", "grpc_generated"))
+
+from server import redis_pool, shard_map
+from server.global_topic import GlobalTopicRegistry
+from server.state_manager import StateManager
+
+# Partition data of the registry fixture is spread over these two shards
+SHARDS = ["localhost:6380", "localhost:6381"]
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    """Route get_redis to in-process Redis servers, one per endpoint; returns the catalog client."""
+    servers = {}
+
+    def get_redis(host=None, port=None):
+        host, port = redis_pool._endpoint(host, port)
+        return fakeredis.FakeRedis(server=servers.setdefault(port, fakeredis.FakeServer()),
+                                   host=host, port=port, decode_responses=True)
+
+    monkeypatch.setattr(shard_map, "get_redis", get_redis)
+    return get_redis()
+
+
+@pytest.fixture
+def registry(fake_redis, monkeypatch, tmp_path):
+    """A topic registry over a fake catalog and SHARDS, with a short shard map cache."""
+    monkeypatch.setenv("REDIS_SHARDS", ",".join(SHARDS))
+    monkeypatch.setattr(shard_map, "SHARD_MAP_CACHE_TTL", 0.05)
+    return GlobalTopicRegistry(redis_client=fake_redis, state_manager=StateManager(str(tmp_path / "state.json")))
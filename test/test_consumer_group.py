@@ -0,0 +1,52 @@
+import time
+
+from server.consumer_group import ConsumerGroupCoordinator
+
+
+def test_partitions_are_spread_over_members(fake_redis):
+    groups = ConsumerGroupCoordinator(fake_redis)
+    assert groups.heartbeat("orders", "billing", "a", 6) == [0, 1, 2, 3, 4, 5]
+
+    groups.heartbeat("orders", "billing", "b", 6)
+    groups.heartbeat("orders", "billing", "c", 6)
+    members = groups.describe("orders", "billing")["members"]
+    assert sorted(p for partitions in members.values() for p in partitions) == list(range(6))
+    assert all(len(partitions) == 2 for partitions in members.values())
+
+
+def test_assignment_is_sticky_across_rebalances(fake_redis):
+    groups = ConsumerGroupCoordinator(fake_redis)
+    groups.heartbeat("orders", "billing", "a", 6)
+    groups.heartbeat("orders", "billing", "b", 6)
+    before = groups.describe("orders", "billing")["members"]
+
+    groups.heartbeat("orders", "billing", "c", 6)
+    after = groups.describe("orders", "billing")["members"]
+    # Members keep what they had, minus what the newcomer needs
+    for member in ("a", "b"):
+        assert set(after[member]) <= set(before[member])
+    assert len(after["c"]) == 2
+
+
+def test_leaving_member_hands_its_partitions_over(fake_redis):
+    groups = ConsumerGroupCoordinator(fake_redis)
+    groups.heartbeat("orders", "billing", "a", 4)
+    groups.heartbeat("orders", "billing", "b", 4)
+    generation = groups.describe("orders", "billing")["generation"]
+
+    assert groups.leave("orders", "billing", "b")
+    described = groups.describe("orders", "billing")
+    assert described["generation"] > generation
+    assert described["members"] == {"a": [0, 1, 2, 3]}
+    assert not groups.leave("orders", "billing", "b")
+
+
+def test_expired_lease_is_rebalanced_away(fake_redis):
+    groups = ConsumerGroupCoordinator(fake_redis, lease_ms=100)
+    groups.heartbeat("orders", "billing", "a", 4)
+    assert len(groups.heartbeat("orders", "billing", "b", 4)) == 2
+
+    # b stops polling; its lease runs out and a takes its partitions back
+    time.sleep(0.15)
+    assert groups.heartbeat("orders", "billing", "a", 4) == [0, 1, 2, 3]
+    assert list(groups.describe("orders", "billing")["members"]) == ["a"]
@@ -0,0 +1,104 @@
+import socket
+import threading
+import time
+from concurrent import futures
+
+import grpc
+import pytest
+
+from server import deadline
+from server.grpc_generated import mom_pb2, mom_pb2_grpc
+from server.redis_pool import get_redis
+
+
+class SlowServicer(mom_pb2_grpc.MessageServiceServicer):
+    """Sends take work_s, checking the deadline before storing; requests that ask for it run out of time."""
+
+    def __init__(self, work_s):
+        self.work_s = work_s
+        self.remaining = []
+        self.stored = []
+
+    def SendMessage(self, request, context):
+        self.remaining.append(deadline.remaining())
+        if request.message == "too slow":
+            # A budget of its own, shorter than the caller's
+            with deadline.within(0.05):
+                time.sleep(0.1)
+                deadline.check()
+        time.sleep(self.work_s)
+        deadline.check()
+        self.stored.append(request.message)
+        return mom_pb2.MessageResponse(status="Success", message="Message enqueued")
+
+
+@pytest.fixture
+def serve():
+    servers = []
+
+    def start(servicer):
+        server = grpc.server(futures.ThreadPoolExecutor(max_workers=4), interceptors=[deadline.ServerInterceptor()])
+        mom_pb2_grpc.add_MessageServiceServicer_to_server(servicer, server)
+        port = server.add_insecure_port("127.0.0.1:0")
+        server.start()
+        servers.append(server)
+        return mom_pb2_grpc.MessageServiceStub(grpc.insecure_channel(f"127.0.0.1:{port}"))
+
+    yield start
+    for server in servers:
+        server.stop(None)
+
+
+def test_nested_deadline_never_outlives_its_parent():
+    assert deadline.remaining() is None and deadline.timeout(3) == 3
+    with deadline.within(1) as outer:
+        with deadline.within(5) as inner:
+            assert inner.expires_at == outer.expires_at
+        assert 0.9 < deadline.timeout(3) <= 1
+        outer.cancel()
+        with pytest.raises(deadline.DeadlineExceeded):
+            deadline.check()
+
+
+def test_rpc_runs_under_the_callers_deadline(serve):
+    servicer = SlowServicer(work_s=0)
+    stub = serve(servicer)
+    stub.SendMessage(mom_pb2.MessageRequest(topic="orders", message="m"), timeout=2)
+    stub.SendMessage(mom_pb2.MessageRequest(topic="orders", message="m"))
+    assert 0 < servicer.remaining[0] <= 2
+    assert servicer.remaining[1] is None
+
+
+def test_work_stops_once_the_caller_gave_up(serve):
+    servicer = SlowServicer(work_s=0.3)
+    stub = serve(servicer)
+    with pytest.raises(grpc.RpcError) as error:
+        stub.SendMessage(mom_pb2.MessageRequest(topic="orders", message="m"), timeout=0.1)
+    assert error.value.code() == grpc.StatusCode.DEADLINE_EXCEEDED
+    time.sleep(0.4)
+    assert servicer.stored == []
+
+
+def test_deadline_exceeded_in_a_handler_is_reported_as_such(serve):
+    stub = serve(SlowServicer(work_s=0))
+    with pytest.raises(grpc.RpcError) as error:
+        stub.SendMessage(mom_pb2.MessageRequest(topic="orders", message="too slow"), timeout=5)
+    assert error.value.code() == grpc.StatusCode.DEADLINE_EXCEEDED
+    assert "deadline exceeded" in error.value.details()
+
+
+def test_redis_reply_is_awaited_no_longer_than_the_deadline():
+    # A server that accepts connections and never answers
+    silent = socket.socket()
+    silent.bind(("127.0.0.1", 0))
+    silent.listen(10)
+    connections = []
+    threading.Thread(target=lambda: connections.append(silent.accept()), daemon=True).start()
+    client = get_redis("127.0.0.1", silent.getsockname()[1])
+
+    started = time.monotonic()
+    with pytest.raises(deadline.DeadlineExceeded):
+        with deadline.within(0.2):
+            client.get("key")
+    assert time.monotonic() - started < 1
+    silent.close()
@@ -0,0 +1,53 @@
+import pytest
+
+from server import master_node
+from server.grpc_server import create_server
+from server.master_node import MasterNode
+
+
+@pytest.fixture
+def nodes(registry, fake_redis, monkeypatch, tmp_path):
+    """The acting master, serving gRPC, and the MasterNode of a REST API process."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(master_node, "get_redis", lambda host=None, port=None: fake_redis)
+    monkeypatch.setattr(master_node, "LOG_STORAGE_DIR", str(tmp_path / "data"))
+    owner, rest = MasterNode(registry), MasterNode(registry)
+    assert owner.log_storage is None and rest.log_storage is None
+
+    # What register_master does once this process becomes the master
+    owner._open_log_storage()
+    server = create_server(owner)
+    port = server.add_insecure_port("127.0.0.1:0")
+    server.start()
+    fake_redis.set("master_node", f"127.0.0.1:{port}")
+    yield owner, rest
+    server.stop(None)
+
+
+def test_rest_process_sends_log_topics_to_the_master(nodes, registry):
+    owner, rest = nodes
+    registry.create_topic("events", 2, "log")
+    for i in range(6):
+        rest.send_message_to_topic("events", f"m{i}")
+
+    assert rest.log_storage is None
+    assert sum(owner.log_storage.backlog("events", p) for p in range(2)) == 6
+    # Reading without consuming leaves the messages in place
+    assert sorted(rest.peek_log_messages("events")) == [f"m{i}" for i in range(6)]
+    assert sorted(rest.peek_log_messages("events")) == [f"m{i}" for i in range(6)]
+
+    received = [rest.dequeue_log_message("events", [0, 1]) for _ in range(6)]
+    assert sorted(received) == [f"m{i}" for i in range(6)]
+    assert rest.dequeue_log_message("events", [0, 1]) is None
+    assert rest.peek_log_messages("events") == []
+
+
+def test_master_serves_log_topics_from_its_own_storage(nodes, registry):
+    owner, rest = nodes
+    registry.create_topic("events", 1, "log")
+    owner.log_storage.append("events", 0, ["a", "b"])
+
+    assert owner._log_owner_stub("events") is None
+    assert rest._log_owner_stub("orders") is None
+    assert rest.dequeue_log_message("events", [0]) == "a"
+    assert owner.dequeue_log_message("events", [0]) == "b"
@@ -177,6 +177,34 @@ class RestApiTester:
         print(f"Response: {response.text}")
         return response.status_code == 200
 
+    def consumer_group_poll(self, group_name="test-group"):
+        """Test reading through a consumer group with two members"""
+        print(f"\n=== Polling {self.topic_name} through group {group_name} ===")
+        assigned = []
+        for consumer_id in ("consumer-1", "consumer-2"):
+            response = requests.post(
+                f"{self.base_url}/topic/{self.topic_name}/group/{group_name}/poll",
+                data={"consumer_id": consumer_id},
+                headers={"Authorization": f"Bearer {self.token}"}
+            )
+            print(f"Status code: {response.status_code}")
+            print(f"Response: {response.text}")
+            if response.status_code != 200:
+                return False
+            assigned.append(set(response.json().get("partitions", [])))
+
+        # Re-poll the first member so it sees the rebalance caused by the second
+        response = requests.post(
+            f"{self.base_url}/topic/{self.topic_name}/group/{group_name}/poll",
+            data={"consumer_id": "consumer-1"},
+            headers={"Authorization": f"Bearer {self.token}"}
+        )
+        assigned[0] = set(response.json().get("partitions", []))
+        if assigned[0] & assigned[1]:
+            print(f"Partitions assigned to more than one member: {assigned[0] & assigned[1]}")
+            return False
+        return True
+
     def test_round_robin(self, num_messages=5):
         """Test round-robin message distribution by sending multiple messages"""
         print(f"\n=== Testing Round-Robin with {num_messages} messages ===")
@@ -215,6 +243,7 @@ class RestApiTester:
             "topic_info": self.get_topic_info(),
             "connection_info": self.get_connection_info(),
             "subscribe": self.subscribe_to_topic(),
+            "consumer_group": self.consumer_group_poll(),
             "round_robin": self.test_round_robin()
         })
         
@@ -0,0 +1,113 @@
+import time
+
+import pytest
+
+from server.delayed_delivery import DelayedDeliveryMover
+from server.shard_map import ShardMap
+
+
+def _other_shard(registry, topic_name, partition):
+    source, _ = registry.shards.locate(topic_name, partition)
+    target = next(shard for shard in registry.shards.shards if shard != source)
+    return registry.shards.client(source), registry.shards.client(target), target
+
+
+def test_migration_moves_backlog_in_order(registry):
+    registry.create_topic("orders", 2)
+    registry.enqueue_batch("orders", 0, [f"m{i}" for i in range(50)])
+    registry.enqueue_batch("orders", 0, ["urgent"], priority=9)
+    source, target, endpoint = _other_shard(registry, "orders", 0)
+
+    assert registry.shards.migrate_partition("orders", 0, endpoint, chunk_size=7) == 51
+
+    assert source.llen("orders:partition0") == 0
+    assert registry.shards.locate("orders", 0) == (endpoint, None)
+    assert registry.dequeue_batch("orders", [0], 100)[0] == ["urgent"] + [f"m{i}" for i in range(50)]
+
+
+def test_migration_moves_delayed_messages_and_producer_sequences(registry):
+    registry.create_topic("orders", 2)
+    now_ms = int(time.time() * 1000)
+    for i in range(30):
+        registry.schedule_message("orders", f"later{i}", now_ms + 100000, 0)
+    for i in range(5):
+        registry.schedule_message("orders", f"due{i}", now_ms - 1, 0)
+    assert registry.enqueue_batch("orders", 0, ["a", "b"], "producer", 7)
+    source, target, endpoint = _other_shard(registry, "orders", 0)
+
+    registry.shards.migrate_partition("orders", 0, endpoint, chunk_size=7)
+
+    assert source.zcard("orders:partition0:delayed") == 0
+    assert not source.exists("orders:partition0:producers")
+    assert target.zcard("orders:partition0:delayed") == 35
+    assert target.hget("orders:partition0:producers", "producer") == "7"
+    assert target.pttl("orders:partition0:producers") > 0
+    # A retry of the batch stored before the migration is still recognised
+    assert not registry.enqueue_batch("orders", 0, ["a", "b"], "producer", 7)
+
+    # Due messages are delivered on the shard the partition moved to
+    DelayedDeliveryMover(registry).run_once()
+    delivered = target.lrange("orders:partition0", 0, -1)
+    assert delivered[:2] == ["a", "b"] and sorted(delivered[2:]) == [f"due{i}" for i in range(5)]
+    assert registry.get_delayed_count("orders") == 30
+
+
+class Killed(Exception):
+    """Stands for the migrating process dying."""
+
+
+def _kill_after(monkeypatch, method, calls=1, before=False):
+    """Make ShardMap.method die on its calls-th call, before or after doing its work."""
+    original = getattr(ShardMap, method)
+    seen = []
+
+    def dying(self, *args, **kwargs):
+        seen.append(1)
+        if len(seen) == calls and before:
+            raise Killed()
+        result = original(self, *args, **kwargs)
+        if len(seen) == calls:
+            raise Killed()
+        return result
+
+    monkeypatch.setattr(ShardMap, method, dying)
+
+
+@pytest.mark.parametrize("method, before", [("_copy_chunk", True), ("_copy_chunk", False),
+                                            ("_trim_chunk", False)])
+def test_killed_migration_resumes_without_losing_or_repeating(registry, monkeypatch, method, before):
+    registry.create_topic("orders", 1)
+    registry.enqueue_batch("orders", 0, [f"m{i}" for i in range(40)])
+    source, target, endpoint = _other_shard(registry, "orders", 0)
+
+    with monkeypatch.context() as patch:
+        _kill_after(patch, method, calls=2, before=before)
+        with pytest.raises(Killed):
+            registry.shards.migrate_partition("orders", 0, endpoint, chunk_size=10)
+    assert registry.redis.hexists("shard_migration_chunks", "orders:0")
+
+    # Meanwhile producers write to the target and consumers drain in order
+    registry.enqueue_batch("orders", 0, ["new"])
+    assert registry.dequeue_batch("orders", [0], 5)[0] == [f"m{i}" for i in range(5)]
+
+    registry.shards.migrate_partition("orders", 0, endpoint, chunk_size=10)
+    assert not registry.redis.hexists("shard_migration_chunks", "orders:0")
+    assert registry.shards.locate("orders", 0) == (endpoint, None)
+    assert source.llen("orders:partition0") == 0
+    assert registry.dequeue_batch("orders", [0], 100)[0] == [f"m{i}" for i in range(5, 40)] + ["new"]
+
+
+def test_chunk_consumed_while_copied_is_not_delivered_twice(registry, monkeypatch):
+    registry.create_topic("orders", 1)
+    registry.enqueue_batch("orders", 0, [f"m{i}" for i in range(8)])
+    source, target, endpoint = _other_shard(registry, "orders", 0)
+    original = ShardMap._copy_chunk
+
+    def copy_while_consumed(self, *args):
+        original(self, *args)
+        # Consumers pop 3 messages of the chunk from the source before it is trimmed
+        source.lpop("orders:partition0", 3)
+
+    monkeypatch.setattr(ShardMap, "_copy_chunk", copy_while_consumed)
+    registry.shards.migrate_partition("orders", 0, endpoint, chunk_size=10)
+    assert target.lrange("orders:partition0", 0, -1) == [f"m{i}" for i in range(3, 8)]
@@ -0,0 +1,33 @@
+import time
+
+from server.consumer_group import ConsumerGroupCoordinator
+from server.topic_reclaimer import TopicReclaimer
+
+
+def _topic_keys(registry, topic_name):
+    clients = [registry.redis] + [registry.shards.client(shard) for shard in registry.shards.shards]
+    return sorted(key for client in clients for key in client.keys("*")
+                  if (f"{topic_name}:" in key or key.endswith(f":{topic_name}")) and not key.startswith("tombstone:"))
+
+
+def test_deleted_topic_is_freed_with_its_consumer_groups(registry):
+    registry.create_topic("orders", 4)
+    registry.create_topic("orders_kept", 1)
+    for partition in range(4):
+        registry.enqueue_batch("orders", partition, ["m"], "producer", 1)
+    registry.enqueue_batch("orders", 1, ["urgent"], priority=9)
+    groups = ConsumerGroupCoordinator(registry.redis)
+    for group_name in ("billing", "shipping"):
+        groups.heartbeat("orders", group_name, "a", 4)
+        groups.heartbeat("orders", group_name, "b", 4)
+    groups.heartbeat("orders_kept", "billing", "a", 1)
+
+    assert "groups:orders" in _topic_keys(registry, "orders")
+    registry.delete_topic("orders")
+    time.sleep(0.01)
+    assert TopicReclaimer(registry, interval_ms=0, batch_size=8).run_once() == 1
+
+    assert _topic_keys(registry, "orders") == []
+    assert _topic_keys(registry, "orders_kept")
+    assert registry.get_deletion_status("orders")["state"] == "done"
+    assert groups.describe("orders_kept", "billing")["members"] == {"a": [0]}
@@ -0,0 +1,90 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import TimeoutError
+
+import fakeredis
+import pytest
+
+from server import deadline
+from server.write_coalescer import WriteCoalescer
+
+
+class Shards:
+    """Every partition on one client, optionally slowing its pipelines down."""
+
+    def __init__(self, client, execute_delay_s=0):
+        self.redis = client
+        self.execute_delay_s = execute_delay_s
+
+    def client_for(self, topic_name, partition):
+        return self
+
+    def pipeline(self, **kwargs):
+        pipe = self.redis.pipeline(**kwargs)
+        execute = pipe.execute
+
+        def slow_execute(**kwargs):
+            time.sleep(self.execute_delay_s)
+            return execute(**kwargs)
+
+        pipe.execute = slow_execute
+        return pipe
+
+
+@pytest.fixture
+def client():
+    return fakeredis.FakeRedis(decode_responses=True)
+
+
+def test_concurrent_writes_share_a_round_trip(client):
+    writes = WriteCoalescer(Shards(client), linger_ms=50)
+    threads = [threading.Thread(target=writes.write, args=("orders", 0, f"m{i}", 5)) for i in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(client.lrange("orders:partition0", 0, -1)) == sorted(f"m{i}" for i in range(20))
+    assert writes.stats == {"messages": 20, "round_trips": 1}
+
+
+def test_write_timing_out_before_its_flush_is_withdrawn(client):
+    writes = WriteCoalescer(Shards(client), linger_ms=300)
+    with pytest.raises(TimeoutError):
+        writes.write("orders", 0, "first try", timeout=0.05)
+    time.sleep(0.5)
+    assert client.llen("orders:partition0") == 0
+
+    # So retrying it stores the message once
+    assert writes.write("orders", 0, "first try", timeout=5)
+    assert client.lrange("orders:partition0", 0, -1) == ["first try"]
+
+
+def test_write_running_out_of_request_deadline_is_withdrawn(client):
+    writes = WriteCoalescer(Shards(client), linger_ms=300)
+    with pytest.raises(deadline.DeadlineExceeded):
+        with deadline.within(0.05):
+            writes.write("orders", 0, "late")
+    time.sleep(0.5)
+    assert client.llen("orders:partition0") == 0
+
+
+def test_write_timing_out_while_being_stored_is_reported_accepted(client):
+    shards = Shards(client, execute_delay_s=0.3)
+    writes = WriteCoalescer(shards, linger_ms=0)
+    assert writes.write("orders", 0, "in flight", timeout=0.1) is False
+    time.sleep(0.5)
+    assert client.lrange("orders:partition0", 0, -1) == ["in flight"]
+
+
+def test_cancelled_async_write_is_withdrawn(client):
+    writes = WriteCoalescer(Shards(client), linger_ms=300)
+
+    async def send():
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(asyncio.wrap_future(writes.submit("orders", 0, "cancelled")), 0.05)
+        await asyncio.wrap_future(writes.submit("orders", 0, "kept"))
+
+    asyncio.run(send())
+    assert client.lrange("orders:partition0", 0, -1) == ["kept"]
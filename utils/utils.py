@@ -1,4 +1,7 @@
 import socket
+import struct
+import zlib
+
 import requests
 
 def find_free_port():
@@ -17,7 +20,7 @@ def get_local_ip():
 def get_public_ip():
     """Get public IP address of the machine."""
     try:
-        response = requests.get('https://api.ipify.org')
+        response = requests.get('https://api.ipify.org', timeout=2)
         if response.status_code == 200:
             return response.text
         else:
@@ -45,4 +48,41 @@ def check_port_externally_accessible(port):
                 return False
         except Exception as e:
             print(f"[⚠️] Could not verify external port accessibility: {e}")
-            return False
\ No newline at end of file
+            return False
+
+def stable_hash(value):
+    """Hash a string the same way in every process (unlike the built-in hash())."""
+    return zlib.crc32(str(value).encode("utf-8"))
+
+
+def jump_consistent_hash(key, num_buckets):
+    """Map an integer key to a bucket; growing num_buckets only moves ~1/n of the keys."""
+    bucket, j = -1, 0
+    while j < num_buckets:
+        bucket = j
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        j = int((bucket + 1) * (float(1 << 31) / float((key >> 33) + 1)))
+    return bucket
+
+
+def encode_batch(messages, compress=True):
+    """Pack messages into length-prefixed frames, zlib-compressed by default."""
+    frames = bytearray()
+    for message in messages:
+        data = message.encode("utf-8")
+        frames += struct.pack(">I", len(data))
+        frames += data
+    return zlib.compress(bytes(frames), 1) if compress else bytes(frames)
+
+
+def decode_batch(payload, compressed=True):
+    """Unpack messages packed by encode_batch."""
+    data = zlib.decompress(payload) if compressed else payload
+    messages = []
+    position = 0
+    while position < len(data):
+        (length,) = struct.unpack_from(">I", data, position)
+        position += 4
+        messages.append(data[position:position + length].decode("utf-8"))
+        position += length
+    return messages